@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from impact_records import json_default
+
+# Bump when the layout of cached entries or the analysis that produces them changes
+CACHE_VERSION = "1"
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """Combine content digests (and any option strings) into one cache key"""
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(str(part).encode())
+    return digest.hexdigest()
+
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def llm_client_id(client=None):
+    """The backend a client sends requests to; None stands for the default OpenAI client"""
+    base_url = getattr(client, "base_url", None)
+    if client is not None and base_url is None:
+        # Not the OpenAI SDK, e.g. the offline stub
+        return f"{type(client).__module__}.{type(client).__name__}"
+    return f"openai:{str(base_url or os.getenv('OPENAI_BASE_URL') or DEFAULT_OPENAI_BASE_URL).rstrip('/')}"
+
+
+def llm_request_key(request, client=None):
+    # Canonical JSON so key order and whitespace don't split the cache. The request names the
+    # model; the client id keeps answers from the stub or another endpoint from being served
+    # for the real API.
+    return cache_key("llm", llm_client_id(client), json.dumps(request, sort_keys=True, separators=(",", ":")))
+
+
+class AnalysisCache:
+    """On-disk JSON cache of analysis results, evicted least-recently-used past max_bytes.
+
+    Entries are files named after their key; a hit refreshes the file's mtime,
+    which is what eviction orders by, so the cache survives being saved and
+    restored between CI runs.
+    """
+
+    suffix = ".json"
+    binary = False
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _load(self, f):
+        return json.load(f)
+
+    def _dump(self, entry, f):
+        # Analysis results hold impact_records mappings, written as the plain objects they stand for
+        json.dump(entry, f, separators=(",", ":"), default=json_default)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb' if self.binary else 'r') as f:
+                entry = self._load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        # Write to a temp file and rename so a concurrent reader never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb' if self.binary else 'w') as f:
+                self._dump(entry, f)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+class PickleCache(AnalysisCache):
+    """Same eviction policy, but entries are pickled, for values JSON can't round-trip cheaply.
+
+    Only point this at directories the job itself writes (or restores from its
+    own CI cache): unpickling runs arbitrary code from the file.
+    """
+
+    suffix = ".pickle"
+    binary = True
+
+    def _load(self, f):
+        return pickle.load(f)
+
+    def _dump(self, entry, f):
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
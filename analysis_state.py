@@ -0,0 +1,253 @@
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from merkle_diff import subtree_hashes
+from ref_index import _iter_refs, _resolve_pointer, build_ref_index
+from spec_diff import diff_path_item, diff_schema, diff_specs
+
+# Bump when the layout of the state file or the analysis that fills it changes
+STATE_VERSION = "1"
+
+
+def _node_digest(node, hashes):
+    if isinstance(node, (dict, list)):
+        return hashes[id(node)]
+    return hashlib.blake2b(f"{type(node).__name__}:{node!r}".encode(), digest_size=16).digest()
+
+
+def unit_hashes(spec):
+    """Effective hash of every path item and component schema.
+
+    A unit's effective hash covers its own subtree plus every node it reaches
+    through local $refs, so two units with the same effective hash diff
+    identically no matter what else changed in the spec.
+    """
+    hashes = subtree_hashes(spec)
+    # ref -> (digest of the target, refs found inside the target)
+    targets = {}
+
+    def effective(node):
+        parts = []
+        seen = set()
+        pending = list(_iter_refs(node))
+        while pending:
+            ref = pending.pop()
+            if ref in seen or not ref.startswith("#/"):
+                continue
+            seen.add(ref)
+            target = targets.get(ref)
+            if target is None:
+                resolved = _resolve_pointer(spec, ref)
+                target = (_node_digest(resolved, hashes) if resolved is not None else b"",
+                          list(_iter_refs(resolved)) if resolved is not None else [])
+                targets[ref] = target
+            parts.append(ref.encode() + b"\0" + target[0])
+            pending.extend(target[1])
+        parts.sort()
+        return hashlib.blake2b(_node_digest(node, hashes) + b"\1" + b"\1".join(parts), digest_size=16).digest()
+
+    spec = spec or {}
+    paths = spec.get("paths", {}) or {}
+    schemas = (spec.get("components", {}) or {}).get("schemas", {}) or {}
+    return {
+        "paths": {path: effective(item) for path, item in paths.items()},
+        "schemas": {name: effective(schema) for name, schema in schemas.items()}
+    }
+
+
+class AnalysisState:
+    """What one analysis run leaves behind for the next, in a single gzipped pickle.
+
+    Holds the parsed specs (with per-unit effective hashes and ref index),
+    diff fragments keyed by the (old, new) effective hashes they were computed
+    from, the dependency records with their (method, path) index, and the
+    impacted-service entries per (method, path) with a fingerprint of the
+    changes that produced them. Only what the latest run used is written
+    back, so the file stays about the size of two parsed specs plus the
+    dependency list. Like PickleCache, only load files this job wrote.
+
+    With path None the state lives in memory only, for a long-running
+    process that analyzes one run after another.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.specs = {}
+        self.fragments = {}
+        self.dependencies = None
+        self.impacts = {}
+        self.stats = {"units_unchanged": 0, "units_reused": 0, "units_diffed": 0,
+                      "impacts_reused": 0, "impacts_evaluated": 0}
+        self._start_run()
+        if path is not None:
+            self.load()
+
+    def load(self):
+        try:
+            with gzip.open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return
+        if not isinstance(saved, dict) or saved.get("version") != STATE_VERSION:
+            return
+        self.specs = saved["specs"]
+        self.fragments = saved["fragments"]
+        self.dependencies = saved["dependencies"]
+        self.impacts = saved["impacts"]
+
+    def save(self):
+        pruned = (len(self._used_specs & self.specs.keys()) < len(self.specs)
+                  or len(self._used_fragments & self.fragments.keys()) < len(self.fragments)
+                  or len(self._used_impacts & self.impacts.keys()) < len(self.impacts)
+                  or self.dependencies is not None and not self._used_dependencies)
+        if not self._changed and not pruned:
+            # A repeat of the previous run: the file on disk already says all of this
+            self._start_run()
+            return
+        saved = {
+            "version": STATE_VERSION,
+            "specs": {digest: self.specs[digest] for digest in self._used_specs if digest in self.specs},
+            "fragments": {key: self.fragments[key] for key in self._used_fragments if key in self.fragments},
+            # Dropped once a run no longer reads them, e.g. after switching to a build-index file
+            "dependencies": self.dependencies if self._used_dependencies else None,
+            "impacts": {key: self.impacts[key] for key in self._used_impacts if key in self.impacts}
+        }
+        # The next run in this process starts from exactly what the file holds
+        self.specs = saved["specs"]
+        self.fragments = saved["fragments"]
+        self.impacts = saved["impacts"]
+        self.dependencies = saved["dependencies"]
+        self._start_run()
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so an interrupted run never leaves half a state file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=1) as f:
+                pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _start_run(self):
+        self._used_specs = set()
+        self._used_fragments = set()
+        self._used_impacts = set()
+        self._used_dependencies = False
+        self._changed = False
+
+    def _spec_entry(self, digest, document):
+        self._used_specs.add(digest)
+        entry = self.specs.get(digest)
+        if entry is None:
+            entry = self.specs[digest] = {"document": document}
+            self._changed = True
+        return entry
+
+    def document(self, digest, load):
+        """Parsed spec for digest, calling load() only if no earlier run stored it"""
+        entry = self.specs.get(digest)
+        if entry is not None:
+            self._used_specs.add(digest)
+            return entry["document"]
+        return self._spec_entry(digest, load())["document"]
+
+    def units(self, digest, document):
+        entry = self._spec_entry(digest, document)
+        if "units" not in entry:
+            entry["units"] = unit_hashes(document)
+            self._changed = True
+        return entry["units"]
+
+    def ref_index(self, digest, document):
+        entry = self._spec_entry(digest, document)
+        if "ref_index" not in entry:
+            entry["ref_index"] = build_ref_index(document)
+            self._changed = True
+        return entry["ref_index"]
+
+    def _fragment(self, kind, old_hash, new_hash, compute):
+        if old_hash == new_hash:
+            # Same subtree and same $ref targets on both sides: nothing to diff
+            self.stats["units_unchanged"] += 1
+            return None
+        key = (kind, old_hash, new_hash)
+        self._used_fragments.add(key)
+        if key in self.fragments:
+            self.stats["units_reused"] += 1
+            return self.fragments[key]
+        self.stats["units_diffed"] += 1
+        self._changed = True
+        fragment = self.fragments[key] = compute()
+        return fragment
+
+    def diff_specs(self, old_digest, old_spec, new_digest, new_spec):
+        """spec_diff.diff_specs, diffing only the paths and schemas whose effective hash changed"""
+        old_units = self.units(old_digest, old_spec)
+        new_units = self.units(new_digest, new_spec)
+        # Schema results shared by the paths and schemas that do get diffed; see spec_diff.diff_schema
+        memo = {}
+
+        def path_differ(path, old_item, new_item):
+            return self._fragment("path", old_units["paths"][path], new_units["paths"][path],
+                                  lambda: diff_path_item(old_spec, new_spec, old_item, new_item, memo))
+
+        def schema_differ(name, old_schema, new_schema):
+            return self._fragment("schema", old_units["schemas"][name], new_units["schemas"][name],
+                                  lambda: diff_schema(old_spec, new_spec, old_schema, new_schema, memo=memo))
+
+        return diff_specs(old_spec, new_spec, path_differ, schema_differ)
+
+    def dependency_index(self, key, routing_key, load_records, router):
+        """Index of the dependency records, {(METHOD, spec path): [positions]}, rebuilt only when needed.
+
+        key identifies the dependency file contents (and any service filter);
+        routing_key the old spec's path templates the records were routed
+        against. Records are re-read only when key changes, and re-routed
+        only when routing_key does. Records are kept as compact JSON text,
+        which pickles far faster than the decoded dicts; record(position)
+        decodes one on demand.
+        """
+        self._used_dependencies = True
+        state = self.dependencies
+        if state is None or state["key"] != key:
+            records = []
+            calls = []
+            for record in load_records():
+                external_call = record.get("externalCall", {})
+                records.append(json.dumps(record, separators=(",", ":")))
+                calls.append((external_call.get("method", "").upper(), external_call.get("path")))
+            state = self.dependencies = {"key": key, "records": records, "calls": calls, "routing_key": None}
+        if state["routing_key"] != routing_key:
+            index = {}
+            for position, (method, path) in enumerate(state["calls"]):
+                matched_path = router.resolve(path) or path
+                index.setdefault((method, matched_path), []).append(position)
+            state["index"] = index
+            state["routing_key"] = routing_key
+            self._changed = True
+        return state["index"]
+
+    def record(self, position):
+        return json.loads(self.dependencies["records"][position])
+
+    def impact_entries(self, operation, fingerprint, evaluate):
+        """Impacted-service entries for one (METHOD, path), reused while its fingerprint holds"""
+        self._used_impacts.add(operation)
+        saved = self.impacts.get(operation)
+        if saved is not None and saved[0] == fingerprint:
+            self.stats["impacts_reused"] += 1
+            return saved[1]
+        self.stats["impacts_evaluated"] += 1
+        self._changed = True
+        entries = evaluate()
+        self.impacts[operation] = (fingerprint, entries)
+        return entries
@@ -0,0 +1,229 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from impact_analysis import (
+    analyze_impact, analyze_oasdiff_changes, collect_change_events, has_breaking_impact, loaded_dependencies
+)
+from impact_records import IMPACT_BREAKING, json_default
+from path_router import PathRouter
+from ref_index import build_ref_index
+from spec_diff import diff_specs
+from spec_loader import load_document_bytes
+from tracing import count, span
+
+DEFAULT_SPEC_PATHS = ("openapi.yaml", "openapi-spec.json")
+
+
+def _git(repo, *args, input=None):
+    result = subprocess.run(["git", "-C", repo, *args], input=input, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def list_commits(repo, revision_range, first_parent=False):
+    """(sha, commit time, subject) for every commit in revision_range, oldest first"""
+    args = ["log", "--reverse", "--format=%H%x00%ct%x00%s"]
+    if first_parent:
+        args.append("--first-parent")
+    output = _git(repo, *args, revision_range, "--").decode(errors="replace")
+    commits = []
+    for line in output.splitlines():
+        sha, timestamp, subject = line.split("\0", 2)
+        commits.append((sha, int(timestamp), subject))
+    return commits
+
+
+def spec_blobs(repo, revisions, spec_paths):
+    """{revision: (spec path, blob sha)} for the first of spec_paths present at each revision.
+
+    One `git cat-file --batch-check` answers every (revision, path) lookup;
+    revisions without any of the files are left out.
+    """
+    queries = [f"{revision}:{path}" for revision in revisions for path in spec_paths]
+    output = _git(repo, "cat-file", "--batch-check=%(objectname) %(objecttype)",
+                  input="".join(query + "\n" for query in queries).encode()).decode()
+    found = {}
+    for query, line in zip(queries, output.splitlines()):
+        revision, path = query.split(":", 1)
+        parts = line.split()
+        if revision not in found and len(parts) == 2 and parts[1] == "blob":
+            found[revision] = (path, parts[0])
+    return found
+
+
+def read_blobs(repo, blobs):
+    """{blob sha: contents} for every distinct blob, through one `git cat-file --batch`"""
+    blobs = list(dict.fromkeys(blobs))
+    output = _git(repo, "cat-file", "--batch", input="".join(blob + "\n" for blob in blobs).encode())
+    contents = {}
+    position = 0
+    for blob in blobs:
+        header_end = output.index(b"\n", position)
+        sha, _, size = output[position:header_end].decode().split()
+        start = header_end + 1
+        contents[sha] = output[start:start + int(size)]
+        # Each object is followed by a newline
+        position = start + int(size) + 1
+    return contents
+
+
+_worker = {}
+
+
+def _init_worker(dependencies):
+    _worker["dependencies"] = dependencies
+
+
+def _parse(blob, data, path):
+    if blob is None:
+        return {}
+    # Keyed by blob sha, so a revision shared by two consecutive pairs is parsed once per worker
+    return load_document_bytes(blob, data, path)
+
+
+def _analyze_pair(task):
+    old_blob, old_data, new_blob, new_data, path = task
+    old_spec = _parse(old_blob, old_data, path)
+    new_spec = _parse(new_blob, new_data, path)
+    diff = diff_specs(old_spec, new_spec)
+    events = collect_change_events(diff)
+    api_changes = analyze_oasdiff_changes(diff, events)
+    impacted_services = analyze_impact(api_changes, _worker["dependencies"], PathRouter.from_spec(old_spec),
+                                       build_ref_index(old_spec))
+    return api_changes, impacted_services
+
+
+def _summary(api_changes, impacted_services):
+    endpoint_changes = api_changes["endpoint_changes"]
+    return {
+        "paths_added": sum(1 for c in endpoint_changes if c["type"] == "added"),
+        "paths_deleted": sum(1 for c in endpoint_changes if c["type"] == "deleted"),
+        "operations_modified": sum(1 for c in endpoint_changes if c["type"] == "modified"),
+        "schema_changes": len(api_changes.get("property_changes", [])),
+        "impacted_services": len({service["service"] for service in impacted_services}),
+        "impacted_calls": len(impacted_services),
+        "breaking": has_breaking_impact(impacted_services)
+    }
+
+
+def _impacted_calls(impacted_services):
+    return [
+        {
+            "service": service["service"],
+            "method": service["affected_endpoint"]["method"],
+            "path": service["affected_endpoint"]["path"],
+            "changes": sorted({detail["change_type"] for detail in service["impact_details"]}),
+            "breaking": any(detail["impact_type"] == IMPACT_BREAKING for detail in service["impact_details"])
+        }
+        for service in impacted_services
+    ]
+
+
+def build_timeline(repo, revision_range, dependencies, spec_paths=DEFAULT_SPEC_PATHS, jobs=None,
+                   first_parent=False, details=False):
+    """Impact of every spec revision in revision_range, one entry per commit, oldest first.
+
+    Each commit's spec (the first of spec_paths it has) is compared with the
+    one before it, starting from the first commit's parent; a commit that
+    deletes the spec is reported as removing every endpoint. Revisions are
+    read straight from the object store and identified by blob sha, so an
+    unchanged spec costs nothing and a given (old, new) pair of revisions is
+    diffed once however often it recurs. The pairs are analyzed against
+    dependencies in parallel across `jobs` processes.
+    """
+    with span("list_commits"):
+        commits = list_commits(repo, revision_range, first_parent)
+        if not commits:
+            return {"range": revision_range, "commits": 0, "revisions": 0, "pairs_analyzed": 0, "timeline": []}
+        base = f"{commits[0][0]}^"
+        blobs = spec_blobs(repo, [base] + [sha for sha, _, _ in commits], spec_paths)
+
+    # Walk the commits, noting which (previous blob, blob) pair each spec change makes. A commit
+    # that deletes the spec is diffed against an empty one, i.e. as the removal of every endpoint.
+    pairs = {}
+    steps = []
+    previous_path, previous = blobs.get(base, (None, None))
+    for sha, timestamp, subject in commits:
+        path, blob = blobs.get(sha, (None, None))
+        if blob != previous:
+            pairs.setdefault((previous, blob), path or previous_path)
+        steps.append((sha, timestamp, subject, path, blob, previous))
+        previous_path, previous = path, blob
+
+    with span("read_blobs"):
+        contents = read_blobs(repo, [blob for pair in pairs for blob in pair if blob is not None])
+    count("spec_revisions", len(contents))
+    count("revision_pairs", len(pairs))
+    tasks = [(old, contents.get(old), new, contents.get(new), path) for (old, new), path in pairs.items()]
+    jobs = jobs or os.cpu_count() or 1
+    with span("analyze_revisions", jobs=min(jobs, len(tasks))):
+        if jobs == 1 or len(tasks) <= 1:
+            _init_worker(dependencies)
+            results = list(map(_analyze_pair, tasks))
+        else:
+            # Each worker receives the dependency records once rather than with every task
+            with ProcessPoolExecutor(min(jobs, len(tasks)), initializer=_init_worker,
+                                     initargs=(dependencies,)) as pool:
+                results = list(pool.map(_analyze_pair, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+    analyzed = dict(zip(pairs, results))
+
+    timeline = []
+    for sha, timestamp, subject, path, blob, previous in steps:
+        entry = {
+            "commit": sha,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp)),
+            "subject": subject,
+            "spec_path": path,
+            "spec_blob": blob,
+            "spec_changed": blob != previous
+        }
+        if blob != previous:
+            api_changes, impacted_services = analyzed[(previous, blob)]
+            entry["previous_blob"] = previous
+            if blob is None:
+                entry["spec_removed"] = True
+            entry["summary"] = _summary(api_changes, impacted_services)
+            entry["impacted"] = _impacted_calls(impacted_services)
+            if details:
+                entry["api_changes"] = api_changes
+                entry["impacted_services"] = impacted_services
+        timeline.append(entry)
+
+    return {
+        "range": revision_range,
+        "commits": len(commits),
+        "revisions": len({blob for _, _, _, _, blob, _ in steps if blob is not None}),
+        "pairs_analyzed": len(pairs),
+        "timeline": timeline
+    }
+
+
+def run_history(args):
+    # args: the `history` subcommand of impact_analysis.py
+    dependencies = loaded_dependencies(args, {})
+    if not isinstance(dependencies, list):
+        dependencies = list(dependencies)
+    timeline = build_timeline(args.repo, args.range, dependencies, args.spec or DEFAULT_SPEC_PATHS, args.jobs,
+                              args.first_parent, args.details)
+    text = json.dumps(timeline, indent=2, default=json_default)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        changed = sum(1 for entry in timeline["timeline"] if entry["spec_changed"])
+        breaking = sum(1 for entry in timeline["timeline"] if entry.get("summary", {}).get("breaking"))
+        print(f"{timeline['commits']} commits, {changed} spec changes, {breaking} with breaking impact; "
+              f"timeline written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    # Usage: python batch_history.py <revision range> <dependencies.json>
+    from impact_analysis import main
+
+    sys.exit(main(["history"] + sys.argv[1:]))
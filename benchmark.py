@@ -0,0 +1,152 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import spec_loader
+from impact_analysis import analyze_impact, analyze_oasdiff_changes, collect_change_events, load_yaml, normalize_path
+from path_router import PathRouter
+from prompt_builder import build_compact_mcp_requests
+from ref_index import build_ref_index
+from spec_diff import diff_specs
+from synthetic_specs import write_dataset
+
+# name -> (paths, schemas, dependency records)
+SIZES = {
+    "small": (200, 60, 2000),
+    "medium": (1000, 250, 20000),
+    "large": (4000, 1000, 100000),
+}
+
+
+def measure(fn, repeat=3):
+    """Run fn repeat times untraced for the best wall time, then once under tracemalloc for peak memory.
+
+    Returns (last result, seconds, peak bytes allocated during the call).
+    """
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_size(name, paths, schemas, dependencies, repeat=3, ref_depth=6, seed=0):
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_dataset(directory, paths, schemas, dependencies, ref_depth, seed=seed)
+        stages = {}
+
+        def record(stage, fn):
+            result, seconds, peak = measure(fn, repeat)
+            stages[stage] = {"seconds": round(seconds, 6), "peak_mb": round(peak / 1e6, 3)}
+            print(f"  {stage:<24} {seconds * 1000:10.1f} ms {peak / 1e6:10.1f} MB")
+            return result
+
+        def load_old_spec():
+            # Skip the in-memory document cache, or every run after the first measures a dict lookup
+            spec_loader._parsed.clear()
+            return load_yaml(files["old_spec"])
+
+        print(f"{name}: {paths} paths, {schemas} schemas, {dependencies} dependencies")
+        old_spec = record("load_yaml", load_old_spec)
+        new_spec = load_yaml(files["new_spec"])
+        with open(files["dependencies"]) as f:
+            records = json.load(f)
+
+        diff = record("diff", lambda: diff_specs(old_spec, new_spec))
+        api_changes = record("analyze_oasdiff_changes", lambda: analyze_oasdiff_changes(diff))
+
+        router = PathRouter.from_spec(old_spec)
+        ref_index = build_ref_index(old_spec)
+        impacted = record("analyze_impact", lambda: analyze_impact(api_changes, records, router, ref_index))
+
+        call_paths = [r["externalCall"]["path"] for r in records] + list(old_spec["paths"])
+
+        def normalize_all():
+            normalize_path.cache_clear()
+            return [normalize_path(path) for path in call_paths]
+
+        record("normalize_path", normalize_all)
+
+        events = collect_change_events(diff)
+        requests = record("prompt_building", lambda: build_compact_mcp_requests(events, impacted))
+
+    return {
+        "name": name,
+        "paths": paths,
+        "schemas": schemas,
+        "dependencies": dependencies,
+        "counts": {
+            "change_events": len(events),
+            "endpoint_changes": len(api_changes["endpoint_changes"]),
+            "property_changes": len(api_changes["property_changes"]),
+            "impacted_services": len(impacted),
+            "prompt_requests": len(requests)
+        },
+        "stages": stages
+    }
+
+
+def compare(results, baseline, max_slowdown):
+    """Stage timings that grew more than max_slowdown times over the baseline run of the same size"""
+    previous = {size["name"]: size["stages"] for size in baseline.get("sizes", [])}
+    regressions = []
+    for size in results["sizes"]:
+        for stage, measured in size["stages"].items():
+            before = previous.get(size["name"], {}).get(stage)
+            if before and before["seconds"] > 0 and measured["seconds"] > before["seconds"] * max_slowdown:
+                regressions.append(f"{size['name']} {stage}: {before['seconds'] * 1000:.1f} ms -> "
+                                   f"{measured['seconds'] * 1000:.1f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile the analysis stages on synthetic inputs")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"],
+                        help="Input sizes to run (default: small medium)")
+    parser.add_argument("--repeat", type=int, default=3, help="Take the best of this many timed runs (default: 3)")
+    parser.add_argument("--output", default="benchmark-results.json",
+                        help="Where to write the results (default: benchmark-results.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against (skipped if it doesn't exist yet)")
+    parser.add_argument("--max-slowdown", type=float, default=1.5,
+                        help="Fail if a stage gets this many times slower than in the baseline (default: 1.5)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "repeat": args.repeat,
+        "sizes": [run_size(name, *SIZES[name], repeat=args.repeat) for name in args.sizes]
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_slowdown)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
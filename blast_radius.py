@@ -0,0 +1,235 @@
+import json
+import re
+import sys
+from collections import deque
+from functools import lru_cache
+
+from dependency_index import normalize_call_path
+from impact_records import IMPACT_BREAKING
+from path_router import PathRouter
+
+_SERVICE_NAME_RE = re.compile(r"[^a-z0-9]")
+
+
+@lru_cache(maxsize=None)
+def service_key(name):
+    """serviceName and externalCall.service spell the same service differently (ShopperAPI vs shopper-api)"""
+    return _SERVICE_NAME_RE.sub("", name.lower()) if isinstance(name, str) else None
+
+
+# Records repeat the same few thousand endpoints over and over
+@lru_cache(maxsize=65536)
+def _endpoint(service, method, path):
+    return service_key(service), str(method or "").upper(), normalize_call_path(path)
+
+
+class DependencyGraph:
+    """Which service endpoints call which, across every dependency file of the organization.
+
+    A node is a (service, METHOD, path) endpoint; an edge runs from the
+    endpoint a record's externalCall hits to each of the record's
+    originatingEndpoints, i.e. in the direction a breaking change travels,
+    and carries the internalTrace that links the two. Call paths are routed
+    onto the endpoints their service is known to expose, so /cart/123 and
+    /cart/{cartId} reach the callers of /cart/{id}. All routing happens once,
+    while the graph is built; a lookup during propagation is a dict access.
+    """
+
+    def __init__(self):
+        # node -> {caller node: internalTrace}, in the order records listed them
+        self.callers = {}
+        # node -> (service, method, path) as first spelled in the records, for reporting
+        self.labels = {}
+        # (caller service, METHOD, call path) -> the externalCall.service names it is made to
+        self.called = {}
+
+    @classmethod
+    def from_records(cls, records):
+        graph = cls()
+        exposed = {}
+        calls = []
+        for record in records:
+            call = record.get("externalCall") or {}
+            origins = []
+            for origin in record.get("originatingEndpoints") or ():
+                node = _endpoint(record.get("serviceName"), origin.get("api"), origin.get("path"))
+                if node[0] is None or node[2] is None:
+                    continue
+                graph.labels.setdefault(node, (record["serviceName"], node[1], origin["path"]))
+                exposed.setdefault(node[0], set()).add(origin["path"])
+                origins.append((node, origin.get("internalTrace") or []))
+            if origins and service_key(call.get("service")) is not None:
+                calls.append((call, origins))
+                called = graph.called.setdefault(
+                    _endpoint(record.get("serviceName"), call.get("method"), call.get("path")), [])
+                if call["service"] not in called:
+                    called.append(call["service"])
+
+        routers = {service: PathRouter(sorted(paths)) for service, paths in exposed.items()}
+        for call, origins in calls:
+            router = routers.get(service_key(call["service"]))
+            template = router.resolve(call.get("path")) if router is not None else None
+            node = _endpoint(call["service"], call.get("method"), template or call.get("path"))
+            if node[2] is None:
+                continue
+            graph.labels.setdefault(node, (call["service"], node[1], template or call["path"]))
+            callers = graph.callers.setdefault(node, {})
+            for caller, trace in origins:
+                callers.setdefault(caller, trace)
+        return graph
+
+    @property
+    def edges(self):
+        return sum(len(callers) for callers in self.callers.values())
+
+    def propagate(self, seeds, max_hops=None):
+        """Breadth-first walk from the seed endpoints to everything that transitively calls them.
+
+        seeds are (node, hops, via, trace) tuples. Returns {node: (hops, via,
+        trace)} with the fewest hops each node is reached in, via the
+        endpoint it calls on that shortest route. Every node is expanded
+        once, so cycles in the call graph end the walk instead of looping it.
+        """
+        reached = {}
+        queue = deque()
+        for node, hops, via, trace in sorted(seeds, key=lambda seed: seed[1]):
+            if node not in reached:
+                reached[node] = (hops, via, trace)
+                queue.append(node)
+        while queue:
+            node = queue.popleft()
+            hops = reached[node][0]
+            if max_hops is not None and hops >= max_hops:
+                continue
+            for caller, trace in self.callers.get(node, {}).items():
+                if caller not in reached:
+                    reached[caller] = (hops + 1, node, trace)
+                    queue.append(caller)
+        return reached
+
+    def cycles(self, nodes):
+        """Call cycles (strongly connected components) among nodes, each as a list of nodes.
+
+        Iterative Tarjan, so a long call chain can't hit the recursion limit.
+        """
+        nodes = set(nodes)
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        found = []
+        for start in nodes:
+            if start in index:
+                continue
+            work = [(start, iter(self.callers.get(start, ())))]
+            index[start] = low[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in nodes:
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.callers.get(child, ()))))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in self.callers.get(node, ()):
+                            found.append(component[::-1])
+        return found
+
+    def called_service(self, service, method, path):
+        """The externalCall.service service's method path call goes to, unless the records name several"""
+        called = self.called.get(_endpoint(service, method, path), ())
+        return called[0] if len(called) == 1 else None
+
+    def label(self, node):
+        service, method, path = self.labels.get(node, node)
+        return {"service": service, "method": method, "path": path}
+
+
+def breaking_seeds(impacted_services, provider=None, graph=None):
+    """Hop-1 propagation seeds: the originating endpoints of every breaking first-hop impact"""
+    seeds = []
+    for impacted in impacted_services:
+        if not any(detail["impact_type"] == IMPACT_BREAKING for detail in impacted["impact_details"]):
+            continue
+        affected = impacted["affected_endpoint"]
+        service = provider
+        if service is None and graph is not None:
+            # No --service: the service the graph's records say this call goes to
+            service = graph.called_service(impacted["service"], affected["method"], affected["path"])
+        via = {"service": service, "method": affected["method"].upper(), "path": affected["path"]}
+        for origin in impacted.get("originatingEndpoints") or ():
+            node = _endpoint(impacted["service"], origin.get("api"), origin.get("path"))
+            if node[0] is not None and node[2] is not None:
+                seeds.append((node, 1, via, origin.get("internalTrace") or []))
+    return seeds
+
+
+def blast_radius(graph, impacted_services, provider=None, max_hops=None):
+    """Every endpoint a breaking change reaches through the dependency graph, with its hop distance.
+
+    Hop 1 is the consumers' endpoints that call the changed API directly
+    (what analyze_impact reports); hop n+1 endpoints call a hop n one.
+    """
+    seeds = breaking_seeds(impacted_services, provider, graph)
+    reached = graph.propagate(seeds, max_hops)
+
+    endpoints = []
+    services = {}
+    for node, (hops, via, trace) in sorted(reached.items(), key=lambda item: (item[1][0], item[0])):
+        entry = graph.label(node)
+        # Seeds are reached straight from the provider's changed endpoint, already labelled
+        entry["via"] = via if isinstance(via, dict) else graph.label(via)
+        entry["hops"] = hops
+        entry["trace"] = trace
+        endpoints.append(entry)
+        services[entry["service"]] = min(services.get(entry["service"], hops), hops)
+
+    return {
+        "endpoints": endpoints,
+        "services": services,
+        "max_hops": max((hops for hops, _, _ in reached.values()), default=0),
+        "cycles": [[graph.label(node) for node in cycle] for cycle in graph.cycles(reached)]
+    }
+
+
+def load_graph(paths):
+    """DependencyGraph over dependency files (JSON, JSON Lines or build-index files)"""
+    from dependency_index import DependencyIndex, is_dependency_index
+    from dependency_stream import iter_dependencies
+
+    def records():
+        for path in paths:
+            if is_dependency_index(path):
+                with DependencyIndex(path) as dependency_index:
+                    yield from dependency_index.records()
+            else:
+                yield from iter_dependencies(path)
+
+    return DependencyGraph.from_records(records())
+
+
+if __name__ == "__main__":
+    # Usage: python blast_radius.py <impacted_services.json> <dependencies.json> [more dependency files ...]
+    with open(sys.argv[1]) as f:
+        impacted = json.load(f)
+    print(json.dumps(blast_radius(load_graph(sys.argv[2:]), impacted), indent=2))
@@ -1,7 +1,8 @@
 import json
-from deepdiff import DeepDiff
+from merkle_diff import group_changes, tree_changes
+from spec_diff import HTTP_METHODS
 
-def compare_specs(old_spec_path, new_spec_path):
+def load_spec_pair(old_spec_path, new_spec_path):
     # Load the old and new OpenAPI spec files
     with open(old_spec_path, 'r') as f:
         old_spec = json.load(f)
@@ -9,11 +10,50 @@ def compare_specs(old_spec_path, new_spec_path):
     with open(new_spec_path, 'r') as f:
         new_spec = json.load(f)
 
-    # Use DeepDiff to compare the two OpenAPI spec files
-    diff = DeepDiff(old_spec, new_spec, verbose_level=2)
+    return old_spec, new_spec
+
+def compare_spec_changes(old_spec_path, new_spec_path):
+    """Structured comparison: a list of merkle_diff.TreeChange records with tuple locations"""
+    old_spec, new_spec = load_spec_pair(old_spec_path, new_spec_path)
+    return tree_changes(old_spec, new_spec)
+
+def compare_specs(old_spec_path, new_spec_path):
+    # Compare the two OpenAPI spec files, skipping every subtree whose hash is unchanged
+    # (same added/removed/changed report DeepDiff's verbose_level=2 gave)
+    diff = group_changes(compare_spec_changes(old_spec_path, new_spec_path))
 
     return diff
 
+def index_changes(changes):
+    """Group TreeChange records by the API operation they touch.
+
+    Returns {(api path, METHOD): [changes]}. Changes to a path as a whole or
+    to its shared fields (path-level parameters, servers, ...) are filed
+    under (api path, None), since they apply to every method on it.
+    """
+    index = {}
+    for change in changes:
+        location = change.location
+        if not location or location[0] != "paths":
+            continue
+        if len(location) == 1:
+            # The whole paths object appeared or disappeared
+            paths = change.new_value if change.new_value is not None else change.old_value
+            for path in paths if isinstance(paths, dict) else ():
+                index.setdefault((path, None), []).append(change)
+            continue
+        method = location[2] if len(location) > 2 else None
+        method = method.upper() if isinstance(method, str) and method.lower() in HTTP_METHODS else None
+        index.setdefault((location[1], method), []).append(change)
+    return index
+
+def changes_for_operation(index, path, method=None):
+    """Changes affecting `method path`: the path-level ones plus those under that method"""
+    found = list(index.get((path, None), ()))
+    if method:
+        found.extend(index.get((path, method.upper()), ()))
+    return found
+
 if __name__ == "__main__":
     old_spec_path = 'base-spec.json'   # Path to the old spec (can be fetched from previous commit)
     new_spec_path = 'openapi-spec.json'   # Path to the new spec
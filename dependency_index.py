@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+from analysis_cache import file_digest
+from dependency_stream import iter_dependencies
+
+# Bump when the table layout changes; older index files are rebuilt
+INDEX_VERSION = "1"
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+PATH_PARAM_RE = re.compile(r'\{[^}]+\}')
+
+# Field order of a dependency record as the api-dependencies repo writes it. Records laid
+# out exactly like this are stored as columns only; anything else also keeps its JSON.
+RECORD_FIELDS = ["serviceName", "externalCall", "originatingEndpoints"]
+CALL_FIELDS = ["service", "path", "method"]
+ORIGIN_FIELDS = ["path", "api", "internalTrace"]
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE strings (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);
+CREATE TABLE calls (
+    position INTEGER PRIMARY KEY,
+    caller INTEGER,
+    service INTEGER,
+    method TEXT NOT NULL,
+    path INTEGER,
+    normalized INTEGER,
+    record TEXT
+);
+CREATE INDEX calls_by_key ON calls (service, normalized, method);
+CREATE INDEX calls_by_path ON calls (path, method);
+CREATE TABLE origins (
+    position INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    path INTEGER,
+    api INTEGER,
+    trace TEXT NOT NULL,
+    PRIMARY KEY (position, seq)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_call_path(path):
+    """Index key for a call path: parameter names don't matter, so /users/{id} and /users/{userId} collide"""
+    if not isinstance(path, str):
+        return None
+    return PATH_PARAM_RE.sub('{}', path).rstrip('/') or '/'
+
+
+def is_dependency_index(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def sources_digest(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def _is_canonical(record):
+    if not isinstance(record, dict) or list(record) != RECORD_FIELDS:
+        return False
+    call = record["externalCall"]
+    if not isinstance(call, dict) or list(call) != CALL_FIELDS or not all(isinstance(call[f], str) for f in CALL_FIELDS):
+        return False
+    if call["method"] != call["method"].upper():
+        return False
+    if not isinstance(record["serviceName"], str) or not isinstance(record["originatingEndpoints"], list):
+        return False
+    for origin in record["originatingEndpoints"]:
+        if not isinstance(origin, dict) or list(origin) != ORIGIN_FIELDS:
+            return False
+        if not isinstance(origin["path"], str) or not isinstance(origin["api"], str):
+            return False
+        if not isinstance(origin["internalTrace"], list) or not all(isinstance(t, str) for t in origin["internalTrace"]):
+            return False
+    return True
+
+
+def build_index(sources, output, force=False):
+    """Compile one or more dependency files into a SQLite index at output.
+
+    Returns (record count, rebuilt). An index already built from the same
+    source contents is left alone unless force is set.
+    """
+    digest = sources_digest(sources)
+    if not force and is_dependency_index(output):
+        try:
+            with DependencyIndex(output) as existing:
+                if existing.meta.get("version") == INDEX_VERSION and existing.source_digest == digest:
+                    return int(existing.meta["records"]), False
+        except sqlite3.DatabaseError:
+            pass
+
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(tmp_path)
+        connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+        strings = {}
+
+        def intern(value):
+            if not isinstance(value, str):
+                return None
+            string_id = strings.get(value)
+            if string_id is None:
+                string_id = strings[value] = len(strings) + 1
+            return string_id
+
+        count = 0
+        calls = []
+        origins = []
+
+        def flush():
+            connection.executemany("INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?)", calls)
+            connection.executemany("INSERT INTO origins VALUES (?, ?, ?, ?, ?)", origins)
+            calls.clear()
+            origins.clear()
+
+        for source in sources:
+            for record in iter_dependencies(source):
+                call = record.get("externalCall", {}) if isinstance(record, dict) else {}
+                path = call.get("path")
+                calls.append((count, intern(record.get("serviceName")), intern(call.get("service")),
+                              str(call.get("method") or "").upper(), intern(path), intern(normalize_call_path(path)),
+                              None if _is_canonical(record) else json.dumps(record, separators=(",", ":"))))
+                for seq, origin in enumerate(record.get("originatingEndpoints") or ()):
+                    if isinstance(origin, dict):
+                        trace = " ".join(str(intern(step)) for step in origin.get("internalTrace") or () if isinstance(step, str))
+                        origins.append((count, seq, intern(origin.get("path")), intern(origin.get("api")), trace))
+                count += 1
+                if len(calls) >= 10000:
+                    flush()
+        flush()
+
+        connection.executemany("INSERT INTO strings VALUES (?, ?)", ((i, v) for v, i in strings.items()))
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", INDEX_VERSION), ("source_digest", digest), ("records", str(count)),
+            ("sources", json.dumps([os.path.basename(source) for source in sources]))
+        ])
+        connection.commit()
+        connection.close()
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count, True
+
+
+class DependencyIndex:
+    """Read-only view of a build_index() file.
+
+    Opening costs the same whatever the size of the index: SQLite pages are
+    memory-mapped and only the rows a query touches are read and decoded.
+    Records come back as the same dicts the source file held.
+    """
+
+    def __init__(self, path, mmap_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.connection = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        self.connection.execute(f"PRAGMA mmap_size = {int(mmap_bytes)}")
+        self.meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        self._strings = {None: None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def source_digest(self):
+        return self.meta.get("source_digest")
+
+    def _string_id(self, value):
+        row = self.connection.execute("SELECT id FROM strings WHERE value = ?", (value,)).fetchone()
+        return row[0] if row else None
+
+    def _load_strings(self, ids):
+        missing = [i for i in set(ids) if i not in self._strings]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            self._strings.update(self.connection.execute(
+                f"SELECT id, value FROM strings WHERE id IN ({placeholders})", chunk))
+
+    def _service_filter(self, service):
+        # (sql, params) restricting calls to one externalCall.service; None if that service never appears
+        if service is None:
+            return "", ()
+        service_id = self._string_id(service)
+        if service_id is None:
+            return None
+        return " AND service = ?", (service_id,)
+
+    def _records(self, rows):
+        # rows: (position, caller, service, method, path, record json) in position order
+        rows = list(rows)
+        canonical = [row[0] for row in rows if row[5] is None]
+        origins = {}
+        for start in range(0, len(canonical), 500):
+            chunk = canonical[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for position, path, api, trace in self.connection.execute(
+                    f"SELECT position, path, api, trace FROM origins WHERE position IN ({placeholders}) "
+                    f"ORDER BY position, seq", chunk):
+                origins.setdefault(position, []).append((path, api, [int(i) for i in trace.split()]))
+        ids = [i for row in rows if row[5] is None for i in (row[1], row[2], row[4])]
+        ids += [i for entries in origins.values() for path, api, trace in entries for i in [path, api] + trace]
+        self._load_strings(ids)
+
+        strings = self._strings
+        for position, caller, service, method, path, record in rows:
+            if record is not None:
+                yield position, json.loads(record)
+                continue
+            yield position, {
+                "serviceName": strings[caller],
+                "externalCall": {"service": strings[service], "path": strings[path], "method": method},
+                "originatingEndpoints": [
+                    {"path": strings[origin_path], "api": strings[api], "internalTrace": [strings[i] for i in trace]}
+                    for origin_path, api, trace in origins.get(position, ())
+                ]
+            }
+
+    def records(self, service=None):
+        """Every record (optionally only those calling service), in source order"""
+        service_filter = self._service_filter(service)
+        if service_filter is None:
+            return
+        sql, params = service_filter
+        cursor = self.connection.execute(
+            "SELECT position, caller, service, method, path, record FROM calls WHERE 1" + sql + " ORDER BY position",
+            params)
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for position, record in self._records(rows):
+                yield record
+
+    def call_keys(self, service=None):
+        """Distinct (METHOD, call path) pairs, i.e. what needs routing against a spec"""
+        service_filter = self._service_filter(service)
+        if service_filter is None:
+            return []
+        sql, params = service_filter
+        rows = self.connection.execute("SELECT DISTINCT method, path FROM calls WHERE 1" + sql, params).fetchall()
+        self._load_strings([path for _, path in rows])
+        return [(method, self._strings[path]) for method, path in rows]
+
+    def records_for_call(self, method, path, service=None):
+        """(position, record) for every call of METHOD path, found through the (path, method) index"""
+        path_id = self._string_id(path)
+        service_filter = self._service_filter(service)
+        if path_id is None or service_filter is None:
+            return []
+        sql, params = service_filter
+        rows = self.connection.execute(
+            "SELECT position, caller, service, method, path, record FROM calls WHERE path = ? AND method = ?" + sql
+            + " ORDER BY position", (path_id, method) + params)
+        return list(self._records(rows))
+
+    def lookup(self, service, path, method=None):
+        """Records calling service at path (any parameter spelling), optionally for one method"""
+        service_id = self._string_id(service)
+        normalized_id = self._string_id(normalize_call_path(path))
+        if service_id is None or normalized_id is None:
+            return []
+        sql = "SELECT position, caller, service, method, path, record FROM calls WHERE service = ? AND normalized = ?"
+        params = (service_id, normalized_id)
+        if method is not None:
+            sql += " AND method = ?"
+            params += (method.upper(),)
+        return [record for _, record in self._records(self.connection.execute(sql + " ORDER BY position", params))]
+
+    def callers(self, service):
+        """serviceName of every record calling service, in source order (repeats included)"""
+        service_filter = self._service_filter(service)
+        if service_filter is None:
+            return []
+        sql, params = service_filter
+        rows = self.connection.execute("SELECT caller FROM calls WHERE 1" + sql + " ORDER BY position", params).fetchall()
+        self._load_strings([caller for caller, in rows])
+        return [self._strings[caller] for caller, in rows]
+
+
+if __name__ == "__main__":
+    # Usage: python dependency_index.py <output.sqlite> <dependencies.json> [more.json ...]
+    count, rebuilt = build_index(sys.argv[2:], sys.argv[1])
+    print(f"{'Indexed' if rebuilt else 'Up to date:'} {count} dependency records in {sys.argv[1]}")
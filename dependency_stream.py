@@ -0,0 +1,124 @@
+import json
+import sys
+
+CHUNK_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def _matches_service(record, services):
+    if services is None:
+        return True
+    external_call = record.get("externalCall") if isinstance(record, dict) else None
+    return isinstance(external_call, dict) and external_call.get("service") in services
+
+
+def _is_complete_json(text):
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_json_values(f, chunk_size=CHUNK_SIZE):
+    """Yield the records of a JSON array, or of concatenated / line-delimited JSON values, one at a time.
+
+    Only the record being decoded (plus one read chunk) is held in memory,
+    so a dependency export with hundreds of thousands of records streams in
+    roughly constant space.
+    """
+    buffer = ""
+    position = 0
+    eof = False
+    in_array = None
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        # Skip whitespace and, inside a top-level array, the separators between elements
+        while True:
+            while position < len(buffer) and (buffer[position] in _WHITESPACE or (in_array and buffer[position] == ",")):
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            fill()
+
+        if position >= len(buffer):
+            if in_array:
+                raise ValueError("unterminated JSON array in dependency file")
+            return
+
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        elif in_array and buffer[position] == "]":
+            return
+
+        try:
+            value, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        # A value that runs to the end of the buffer may be cut short (e.g. a number); read on to be sure
+        if end == len(buffer) and not eof:
+            fill()
+            continue
+        position = end
+        yield value
+
+
+def iter_dependencies(path, service=None, chunk_size=CHUNK_SIZE):
+    """Stream dependency records from a JSON array or JSON Lines file.
+
+    service (a name or a collection of names) keeps only records whose
+    externalCall.service matches, before anything else looks at them. For
+    JSON Lines files, lines that don't mention the service at all are
+    skipped without being decoded.
+    """
+    services = None
+    if service is not None:
+        services = {service} if isinstance(service, str) else set(service)
+
+    with open(path, 'r') as f:
+        first_line = ""
+        for line in f:
+            if line.strip():
+                first_line = line
+                break
+        f.seek(0)
+
+        if services is not None and first_line.lstrip().startswith("{") and _is_complete_json(first_line):
+            # JSON Lines: cheap substring test first, decode only the candidate lines
+            # Names can be written raw ("café") or escaped ("caf\u00e9"); look for either spelling
+            needles = {json.dumps(name, ensure_ascii=escaped) for name in services for escaped in (True, False)}
+            for line in f:
+                if not any(needle in line for needle in needles):
+                    continue
+                record = json.loads(line)
+                if _matches_service(record, services):
+                    yield record
+            return
+
+        for record in iter_json_values(f, chunk_size):
+            if _matches_service(record, services):
+                yield record
+
+
+if __name__ == "__main__":
+    # Usage: python dependency_stream.py <dependencies.json|.jsonl> [service]
+    count = 0
+    for record in iter_dependencies(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None):
+        count += 1
+    print(count)
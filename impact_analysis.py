@@ -1,40 +1,156 @@
 
-import yaml
 import json
 import sys
-from deepdiff import DeepDiff
+import re
+import argparse
+from collections import namedtuple
+from functools import lru_cache
 import subprocess  # Add this import
 import os          # Add this import
-from openai import OpenAI
+from spec_diff import diff_specs
+from path_router import PathRouter
+from ref_index import build_ref_index
+from analysis_cache import AnalysisCache, cache_key, file_digest, llm_request_key
+from spec_loader import load_document, load_document_bytes, read_document, snapshot_cache_for
+from dependency_stream import iter_dependencies
+from impact_records import (
+    AffectedEndpoint, ContentChange, EndpointChange, ImpactDetail, ImpactedService, PropertyChange, PropertyTable,
+    json_default, CHANGE_PATH_REMOVED, CHANGE_PATH_VERSIONED, CHANGE_PROPERTIES_ADDED, CHANGE_PROPERTIES_REMOVED,
+    CHANGE_REQUEST_PROPERTIES_ADDED, CHANGE_REQUEST_PROPERTIES_REMOVED, CHANGE_RESPONSE_PROPERTIES_ADDED,
+    CHANGE_RESPONSE_PROPERTIES_REMOVED, CHANGE_SCHEMA_PROPERTIES_ADDED, CHANGE_SCHEMA_PROPERTIES_REMOVED,
+    ENDPOINT_ADDED, ENDPOINT_DELETED, ENDPOINT_MODIFIED, IMPACT_BREAKING, IMPACT_NON_BREAKING,
+    SEVERITY_CRITICAL, SEVERITY_HIGH, SEVERITY_LOW
+)
+from prompt_builder import DEFAULT_TOKEN_BUDGET, build_compact_mcp_requests, request_tokens
+from tracing import count, span, start_tracing, stop_tracing, write_profile, write_trace
+
+# openai (and yaml) are imported where they are first needed, so the rule-based
+# subcommands start fast and work without an API key
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def __getattr__(name):
+    # Keeps `impact_analysis.client` working for callers written against the eager client
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def make_client(kind="openai"):
+    if kind == "stub":
+        from llm_stub import StubOpenAIClient
+        return StubOpenAIClient()
+    return get_client()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def load_yaml(path):
-    with open(path, 'r') as f:
-        return yaml.safe_load(f)
+    # Format is sniffed from the content, so this reads JSON specs just as well
+    return load_document(path)[1]
 
 def load_json(path):
-    with open(path, 'r') as f:
-        return json.load(f)
+    return load_document(path)[1]
 
 def run_oasdiff(old_spec_path, new_spec_path):
-    result = subprocess.run([
-        "docker", "run", "--rm",
-        "-v", f"{os.getcwd()}:/specs",
-        "tufin/oasdiff:latest",
-        "diff",
-        f"/specs/{old_spec_path}",
-        f"/specs/{new_spec_path}",
-        "--format", "json"  # Changed from --output-format to --format
-    ], capture_output=True, text=True)
+    with span("run_oasdiff"):
+        result = subprocess.run([
+            "docker", "run", "--rm",
+            "-v", f"{os.getcwd()}:/specs",
+            "tufin/oasdiff:latest",
+            "diff",
+            f"/specs/{old_spec_path}",
+            f"/specs/{new_spec_path}",
+            "--format", "json"  # Changed from --output-format to --format
+        ], capture_output=True, text=True)
 
     if result.returncode != 0:
         print("Error running oasdiff:", result.stderr)
         sys.exit(1)
     return json.loads(result.stdout)
 
+# Change event kinds emitted by iter_change_events
+PATH_ADDED = "path_added"
+PATH_DELETED = "path_deleted"
+PATH_MODIFIED = "path_modified"
+OPERATION_MODIFIED = "operation_modified"
+PROPERTIES_ADDED = "properties_added"
+PROPERTIES_REMOVED = "properties_removed"
+SCHEMA_MODIFIED = "schema_modified"
+SCHEMA_PROPERTIES_ADDED = "schema_properties_added"
+SCHEMA_PROPERTIES_REMOVED = "schema_properties_removed"
+
+# location is "request" or "response"; fields that don't apply to a kind stay None
+ChangeEvent = namedtuple("ChangeEvent", ["kind", "path", "method", "location", "status", "schema", "properties"],
+                         defaults=(None, None, None, None, None, None))
+
+
+def _iter_content_property_events(content, path, method, location, status=None):
+    for media_type, media_changes in content.items():
+        if "mediaTypeModified" not in media_changes:
+            continue
+        for content_type, schema_info in media_changes["mediaTypeModified"].items():
+            properties = schema_info.get("schema", {}).get("properties", {})
+            if "added" in properties:
+                yield ChangeEvent(PROPERTIES_ADDED, path, method, location, status, properties=properties["added"])
+            if "removed" in properties:
+                yield ChangeEvent(PROPERTIES_REMOVED, path, method, location, status, properties=properties["removed"])
+
+
+def iter_change_events(diff_output):
+    """Walk an oasdiff-style diff once, yielding ChangeEvents in document order"""
+    paths = diff_output.get("paths", {})
+
+    for added_path in paths.get("added", []):
+        yield ChangeEvent(PATH_ADDED, added_path)
+
+    for deleted_path in paths.get("deleted", []):
+        yield ChangeEvent(PATH_DELETED, deleted_path)
+
+    for path, path_changes in paths.get("modified", {}).items():
+        yield ChangeEvent(PATH_MODIFIED, path)
+
+        operations = path_changes.get("operations", {}).get("modified", {})
+        for method, op_changes in operations.items():
+            # Property events that follow belong to this operation until the next OPERATION_MODIFIED
+            yield ChangeEvent(OPERATION_MODIFIED, path, method)
+
+            if "requestBody" in op_changes:
+                req_content = op_changes["requestBody"].get("content", {})
+                yield from _iter_content_property_events(req_content, path, method, "request")
+
+            responses = op_changes.get("responses", {}).get("modified", {})
+            for status, resp_changes in responses.items():
+                resp_content = resp_changes.get("content", {})
+                yield from _iter_content_property_events(resp_content, path, method, "response", status)
+
+    schemas = diff_output.get("components", {}).get("schemas", {})
+    for schema_name, schema_changes in schemas.get("modified", {}).items():
+        yield ChangeEvent(SCHEMA_MODIFIED, schema=schema_name)
+
+        properties = schema_changes.get("properties", {})
+        if "added" in properties:
+            yield ChangeEvent(SCHEMA_PROPERTIES_ADDED, schema=schema_name, properties=properties["added"])
+        if "removed" in properties:
+            yield ChangeEvent(SCHEMA_PROPERTIES_REMOVED, schema=schema_name, properties=properties["removed"])
+
+
+def collect_change_events(diff_output):
+    # Materialize the event stream once so several views can share a single traversal
+    return list(iter_change_events(diff_output))
+
+
 # parse and extraxt info from oasdiff response
-def extract_major_changes(oasdiff_output):
+def extract_major_changes(oasdiff_output, events=None):
+    if events is None:
+        events = iter_change_events(oasdiff_output)
+
     summary = {
         "added_properties": set(),
         "removed_properties": set(),
@@ -42,57 +158,13 @@ def extract_major_changes(oasdiff_output):
         "breaking_changes": []
     }
 
-    # Extract path changes
-    if "paths" in oasdiff_output:
-        paths = oasdiff_output["paths"]
-
-        # Check modified paths
-        if "modified" in paths:
-            for path, details in paths["modified"].items():
-                summary["modified_endpoints"].add(path)
-
-                # Check operations
-                if "operations" in details and "modified" in details["operations"]:
-                    for method, op_changes in details["operations"]["modified"].items():
-                        # Check request changes
-                        if "requestBody" in op_changes:
-                            req_body = op_changes["requestBody"]
-                            if "content" in req_body:
-                                for media_type, content in req_body["content"].items():
-                                    if "mediaTypeModified" in content:
-                                        for _, schema_changes in content["mediaTypeModified"].items():
-                                            if "schema" in schema_changes and "properties" in schema_changes["schema"]:
-                                                props = schema_changes["schema"]["properties"]
-                                                if "added" in props:
-                                                    summary["added_properties"].update(props["added"])
-                                                if "removed" in props:
-                                                    summary["removed_properties"].update(props["removed"])
-
-                        # Check response changes
-                        if "responses" in op_changes and "modified" in op_changes["responses"]:
-                            for status, resp_changes in op_changes["responses"]["modified"].items():
-                                if "content" in resp_changes:
-                                    for media_type, content in resp_changes["content"].items():
-                                        if "mediaTypeModified" in content:
-                                            for _, schema_changes in content["mediaTypeModified"].items():
-                                                if "schema" in schema_changes and "properties" in schema_changes["schema"]:
-                                                    props = schema_changes["schema"]["properties"]
-                                                    if "added" in props:
-                                                        summary["added_properties"].update(props["added"])
-                                                    if "removed" in props:
-                                                        summary["removed_properties"].update(props["removed"])
-
-    # Check schema changes
-    if "components" in oasdiff_output and "schemas" in oasdiff_output["components"]:
-        schemas = oasdiff_output["components"]["schemas"]
-        if "modified" in schemas:
-            for schema, changes in schemas["modified"].items():
-                if "properties" in changes:
-                    props = changes["properties"]
-                    if "added" in props:
-                        summary["added_properties"].update(props["added"])
-                    if "removed" in props:
-                        summary["removed_properties"].update(props["removed"])
+    for event in events:
+        if event.kind == PATH_MODIFIED:
+            summary["modified_endpoints"].add(event.path)
+        elif event.kind in (PROPERTIES_ADDED, SCHEMA_PROPERTIES_ADDED):
+            summary["added_properties"].update(event.properties)
+        elif event.kind in (PROPERTIES_REMOVED, SCHEMA_PROPERTIES_REMOVED):
+            summary["removed_properties"].update(event.properties)
 
     # Convert sets to lists for JSON serialization
     summary["added_properties"] = list(summary["added_properties"])
@@ -102,384 +174,504 @@ def extract_major_changes(oasdiff_output):
     return summary
 
 
-def analyze_api_changes(diff_output):
+def analyze_api_changes(diff_output, events=None):
+    if events is None:
+        events = iter_change_events(diff_output)
+
     changes = {
         "path_changes": [],
         "schema_changes": []
     }
 
-    # Extract path changes
-    if "paths" in diff_output:
-        paths = diff_output["paths"]
-
-        # Handle added paths
-        if "added" in paths:
-            for path in paths["added"]:
-                changes["path_changes"].append({
-                    "change_type": "added",
-                    "path": path,
-                    "http_methods": "ALL",  # We don't have detailed method info for added paths
-                    "details": "New endpoint added"
-                })
-
-        # Handle deleted paths
-        if "deleted" in paths:
-            for path in paths["deleted"]:
-                changes["path_changes"].append({
-                    "change_type": "deleted",
-                    "path": path,
-                    "http_methods": "ALL",  # We don't have detailed method info for deleted paths
-                    "details": "Endpoint removed"
-                })
-
-        # Handle modified paths
-        if "modified" in paths:
-            for path, details in paths["modified"].items():
-                if "operations" in details and "modified" in details["operations"]:
-                    for method, op_changes in details["operations"]["modified"].items():
-                        # Extract detailed changes for this method
-                        method_changes = []
-
-                        # Check request body changes
-                        if "requestBody" in op_changes:
-                            req_body = op_changes["requestBody"]
-                            if "content" in req_body:
-                                for media_type, content in req_body["content"].items():
-                                    if "mediaTypeModified" in content:
-                                        for content_type, schema_changes in content["mediaTypeModified"].items():
-                                            if "schema" in schema_changes:
-                                                schema = schema_changes["schema"]
-                                                if "properties" in schema:
-                                                    props = schema["properties"]
-                                                    if "added" in props:
-                                                        method_changes.append(
-                                                            f"Added request properties: {', '.join(props['added'])}")
-                                                    if "removed" in props:
-                                                        method_changes.append(
-                                                            f"Removed request properties: {', '.join(props['removed'])}")
-
-                        # Check response changes
-                        if "responses" in op_changes and "modified" in op_changes["responses"]:
-                            for status, resp_changes in op_changes["responses"]["modified"].items():
-                                if "content" in resp_changes:
-                                    for media_type, content in resp_changes["content"].items():
-                                        if "mediaTypeModified" in content:
-                                            for content_type, schema_changes in content["mediaTypeModified"].items():
-                                                if "schema" in schema_changes:
-                                                    schema = schema_changes["schema"]
-                                                    if "properties" in schema:
-                                                        props = schema["properties"]
-                                                        if "added" in props:
-                                                            method_changes.append(
-                                                                f"Added response properties in {status}: {', '.join(props['added'])}")
-                                                        if "removed" in props:
-                                                            method_changes.append(
-                                                                f"Removed response properties in {status}: {', '.join(props['removed'])}")
-
-                        changes["path_changes"].append({
-                            "change_type": "modified",
-                            "path": path,
-                            "http_methods": method,
-                            "details": method_changes if method_changes else "Operation modified without property changes"
-                        })
-
-    # Extract schema changes
-    if "components" in diff_output and "schemas" in diff_output["components"]:
-        schemas = diff_output["components"]["schemas"]
-        if "modified" in schemas:
-            for schema_name, schema_changes in schemas["modified"].items():
-                schema_detail = {
-                    "schema_name": schema_name,
-                    "changes": []
-                }
-
-                if "properties" in schema_changes:
-                    props = schema_changes["properties"]
-                    if "added" in props:
-                        schema_detail["changes"].append(f"Added properties: {props['added']}")
-                    if "removed" in props:
-                        schema_detail["changes"].append(f"Removed properties: {props['removed']}")
-
-                changes["schema_changes"].append(schema_detail)
+    for event in events:
+        if event.kind == PATH_ADDED:
+            changes["path_changes"].append({
+                "change_type": "added",
+                "path": event.path,
+                "http_methods": "ALL",  # We don't have detailed method info for added paths
+                "details": "New endpoint added"
+            })
+        elif event.kind == PATH_DELETED:
+            changes["path_changes"].append({
+                "change_type": "deleted",
+                "path": event.path,
+                "http_methods": "ALL",  # We don't have detailed method info for deleted paths
+                "details": "Endpoint removed"
+            })
+        elif event.kind == OPERATION_MODIFIED:
+            # Details are filled in by the property events that follow this one
+            method_changes = []
+            changes["path_changes"].append({
+                "change_type": "modified",
+                "path": event.path,
+                "http_methods": event.method,
+                "details": method_changes
+            })
+        elif event.kind in (PROPERTIES_ADDED, PROPERTIES_REMOVED):
+            verb = "Added" if event.kind == PROPERTIES_ADDED else "Removed"
+            if event.location == "request":
+                method_changes.append(f"{verb} request properties: {', '.join(event.properties)}")
+            else:
+                method_changes.append(f"{verb} response properties in {event.status}: {', '.join(event.properties)}")
+        elif event.kind == SCHEMA_MODIFIED:
+            schema_detail = {
+                "schema_name": event.schema,
+                "changes": []
+            }
+            changes["schema_changes"].append(schema_detail)
+        elif event.kind == SCHEMA_PROPERTIES_ADDED:
+            schema_detail["changes"].append(f"Added properties: {event.properties}")
+        elif event.kind == SCHEMA_PROPERTIES_REMOVED:
+            schema_detail["changes"].append(f"Removed properties: {event.properties}")
+
+    for path_change in changes["path_changes"]:
+        if path_change["change_type"] == "modified" and not path_change["details"]:
+            path_change["details"] = "Operation modified without property changes"
 
     return changes
 
 
-def analyze_oasdiff_changes(diff_output):
+def analyze_oasdiff_changes(diff_output, events=None):
+    if events is None:
+        events = iter_change_events(diff_output)
+
     changes = {
         "endpoint_changes": [],
         "property_changes": []
     }
+    # Records are impact_records mappings; the same property list is stored once
+    properties = PropertyTable()
+
+    for event in events:
+        if event.kind in (PATH_ADDED, PATH_DELETED):
+            changes["endpoint_changes"].append(EndpointChange(
+                type=ENDPOINT_ADDED if event.kind == PATH_ADDED else ENDPOINT_DELETED,
+                path=event.path
+            ))
+        elif event.kind == OPERATION_MODIFIED:
+            endpoint_change = EndpointChange(
+                type=ENDPOINT_MODIFIED,
+                path=event.path,
+                method=event.method,
+                request_changes=[],
+                response_changes=[]
+            )
+            changes["endpoint_changes"].append(endpoint_change)
+        elif event.kind in (PROPERTIES_ADDED, PROPERTIES_REMOVED):
+            change_type = CHANGE_PROPERTIES_ADDED if event.kind == PROPERTIES_ADDED else CHANGE_PROPERTIES_REMOVED
+            if event.location == "request":
+                endpoint_change["request_changes"].append(ContentChange(
+                    type=change_type,
+                    properties=properties.shared(event.properties)
+                ))
+            else:
+                endpoint_change["response_changes"].append(ContentChange(
+                    type=change_type,
+                    status=event.status,
+                    properties=properties.shared(event.properties)
+                ))
+        elif event.kind in (SCHEMA_PROPERTIES_ADDED, SCHEMA_PROPERTIES_REMOVED):
+            changes["property_changes"].append(PropertyChange(
+                type=CHANGE_SCHEMA_PROPERTIES_ADDED if event.kind == SCHEMA_PROPERTIES_ADDED
+                else CHANGE_SCHEMA_PROPERTIES_REMOVED,
+                schema=event.schema,
+                properties=properties.shared(event.properties)
+            ))
 
-    # Extract path changes
-    if "paths" in diff_output:
-        paths = diff_output.get("paths", {})
+    return changes
 
-        # Handle path additions and deletions
-        for added_path in paths.get("added", []):
-            changes["endpoint_changes"].append({
-                "type": "added",
-                "path": added_path
-            })
 
-        for deleted_path in paths.get("deleted", []):
-            changes["endpoint_changes"].append({
-                "type": "deleted",
-                "path": deleted_path
-            })
+def _endpoint_change_impacts(change):
+    # Impact records for one endpoint change, in the order analyze_impact reports them
+    impacts = []
+
+    # Check request changes
+    for req_change in change.get("request_changes", []):
+        if req_change["type"] == CHANGE_PROPERTIES_ADDED:
+            impacts.append(ImpactDetail(
+                impact_type=IMPACT_NON_BREAKING,
+                change_type=CHANGE_REQUEST_PROPERTIES_ADDED,
+                description=f"Request properties added: {', '.join(req_change['properties'])}",
+                properties=req_change['properties'],
+                severity=SEVERITY_LOW
+            ))
+        elif req_change["type"] == CHANGE_PROPERTIES_REMOVED:
+            impacts.append(ImpactDetail(
+                impact_type=IMPACT_BREAKING,
+                change_type=CHANGE_REQUEST_PROPERTIES_REMOVED,
+                description=f"Request properties removed: {', '.join(req_change['properties'])}",
+                properties=req_change['properties'],
+                severity=SEVERITY_HIGH
+            ))
+
+    # Check response changes
+    for resp_change in change.get("response_changes", []):
+        if resp_change["type"] == CHANGE_PROPERTIES_ADDED:
+            impacts.append(ImpactDetail(
+                impact_type=IMPACT_NON_BREAKING,
+                change_type=CHANGE_RESPONSE_PROPERTIES_ADDED,
+                description=f"Response properties added in status {resp_change['status']}: {', '.join(resp_change['properties'])}",
+                properties=resp_change['properties'],
+                status=resp_change['status'],
+                severity=SEVERITY_LOW
+            ))
+        elif resp_change["type"] == CHANGE_PROPERTIES_REMOVED:
+            impacts.append(ImpactDetail(
+                impact_type=IMPACT_BREAKING,
+                change_type=CHANGE_RESPONSE_PROPERTIES_REMOVED,
+                description=f"Response properties removed in status {resp_change['status']}: {', '.join(resp_change['properties'])}",
+                properties=resp_change['properties'],
+                status=resp_change['status'],
+                severity=SEVERITY_HIGH
+            ))
+
+    return impacts
+
+
+def _schema_change_impacts(property_changes):
+    impacts = []
+    for schema_change in property_changes:
+        if schema_change["type"] == CHANGE_SCHEMA_PROPERTIES_ADDED:
+            impacts.append(ImpactDetail(
+                impact_type=IMPACT_NON_BREAKING,
+                change_type=CHANGE_SCHEMA_PROPERTIES_ADDED,
+                description=f"Properties added to {schema_change['schema']} schema: {', '.join(schema_change['properties'])}",
+                schema=schema_change['schema'],
+                properties=schema_change['properties'],
+                severity=SEVERITY_LOW
+            ))
+        elif schema_change["type"] == CHANGE_SCHEMA_PROPERTIES_REMOVED:
+            impacts.append(ImpactDetail(
+                impact_type=IMPACT_BREAKING,
+                change_type=CHANGE_SCHEMA_PROPERTIES_REMOVED,
+                description=f"Properties removed from {schema_change['schema']} schema: {', '.join(schema_change['properties'])}",
+                schema=schema_change['schema'],
+                properties=schema_change['properties'],
+                severity=SEVERITY_HIGH
+            ))
+    return impacts
+
+
+def _path_deleted_impact(dependent_path, replacements):
+    if replacements and len(replacements) == 1:
+        return ImpactDetail(
+            impact_type=IMPACT_BREAKING,
+            change_type=CHANGE_PATH_VERSIONED,
+            description=f"Endpoint moved from {dependent_path} to {replacements[0]}",
+            before=dependent_path,
+            after=replacements[0],
+            severity=SEVERITY_HIGH
+        )
+    if replacements:
+        # Several added paths look like the new home of this one; list them all
+        return ImpactDetail(
+            impact_type=IMPACT_BREAKING,
+            change_type=CHANGE_PATH_VERSIONED,
+            description=f"Endpoint moved from {dependent_path} to one of {', '.join(replacements)}",
+            before=dependent_path,
+            after=replacements[0],
+            candidates=replacements,
+            severity=SEVERITY_HIGH
+        )
+    return ImpactDetail(
+        impact_type=IMPACT_BREAKING,
+        change_type=CHANGE_PATH_REMOVED,
+        description=f"Endpoint {dependent_path} was completely removed",
+        before=dependent_path,
+        after="None",
+        severity=SEVERITY_CRITICAL
+    )
+
+
+def analyze_impact(api_changes, dependencies, router=None, ref_index=None):
+    # router is an optional PathRouter built from the old spec; with it, concrete or
+    # differently-parameterized call paths (/users/123, /users/{userId}) are matched
+    # against the spec template they hit instead of by exact string equality.
+    # ref_index is an optional ref_index.build_ref_index() result for the old spec;
+    # with it, schema changes are attached only to operations whose request or
+    # responses actually reach the changed schema.
+    match_dependency = make_impact_matcher(api_changes, router, ref_index)
+    impacted_services = []
 
-        # Handle modified paths
-        modified_paths = paths.get("modified", {})
-        for path, path_changes in modified_paths.items():
-            operations = path_changes.get("operations", {}).get("modified", {})
-
-            for method, op_changes in operations.items():
-                endpoint_change = {
-                    "type": "modified",
-                    "path": path,
-                    "method": method,
-                    "request_changes": [],
-                    "response_changes": []
-                }
-
-                # Check request body changes
-                if "requestBody" in op_changes:
-                    req_content = op_changes.get("requestBody", {}).get("content", {})
-                    for media_type, media_changes in req_content.items():
-                        if "mediaTypeModified" in media_changes:
-                            for content_type, schema_info in media_changes.get("mediaTypeModified", {}).items():
-                                schema = schema_info.get("schema", {})
-                                properties = schema.get("properties", {})
-
-                                if "added" in properties:
-                                    endpoint_change["request_changes"].append({
-                                        "type": "properties_added",
-                                        "properties": properties.get("added", [])
-                                    })
-
-                                if "removed" in properties:
-                                    endpoint_change["request_changes"].append({
-                                        "type": "properties_removed",
-                                        "properties": properties.get("removed", [])
-                                    })
-
-                # Check response changes
-                if "responses" in op_changes:
-                    responses = op_changes.get("responses", {}).get("modified", {})
-                    for status, resp_changes in responses.items():
-                        if "content" in resp_changes:
-                            for media_type, media_changes in resp_changes.get("content", {}).items():
-                                if "mediaTypeModified" in media_changes:
-                                    for content_type, schema_info in media_changes.get("mediaTypeModified", {}).items():
-                                        schema = schema_info.get("schema", {})
-                                        properties = schema.get("properties", {})
-
-                                        if "added" in properties:
-                                            endpoint_change["response_changes"].append({
-                                                "type": "properties_added",
-                                                "status": status,
-                                                "properties": properties.get("added", [])
-                                            })
-
-                                        if "removed" in properties:
-                                            endpoint_change["response_changes"].append({
-                                                "type": "properties_removed",
-                                                "status": status,
-                                                "properties": properties.get("removed", [])
-                                            })
-
-                changes["endpoint_changes"].append(endpoint_change)
-
-    # Extract schema changes
-    if "components" in diff_output and "schemas" in diff_output.get("components", {}):
-        schemas = diff_output.get("components", {}).get("schemas", {})
-        modified_schemas = schemas.get("modified", {})
-
-        for schema_name, schema_changes in modified_schemas.items():
-            if "properties" in schema_changes:
-                properties = schema_changes.get("properties", {})
-
-                if "added" in properties:
-                    changes["property_changes"].append({
-                        "type": "schema_properties_added",
-                        "schema": schema_name,
-                        "properties": properties.get("added", [])
-                    })
-
-                if "removed" in properties:
-                    changes["property_changes"].append({
-                        "type": "schema_properties_removed",
-                        "schema": schema_name,
-                        "properties": properties.get("removed", [])
-                    })
+    # Analyze each dependency; if we found any impacts, add this service to the results
+    scanned = 0
+    for dependency in dependencies:
+        scanned += 1
+        impacted = match_dependency(dependency)
+        if impacted:
+            impacted_services.append(impacted)
 
-    return changes
+    count("dependencies_scanned", scanned)
+    return impacted_services
 
 
-def analyze_impact(api_changes, dependencies):
-    impacted_services = []
+def make_impact_matcher(api_changes, router=None, ref_index=None):
+    """Return a function mapping one dependency record to its impacted-service entry (or None).
 
-    # Create lookup maps for faster matching
-    endpoint_changes_by_path = {}
+    All the work that depends only on api_changes happens once here, so the
+    matcher can be applied to any subset of the dependencies.
+    """
+    # Impact records depend only on the API changes, so they are built once here and
+    # shared (never copied) by every dependency that hits them. Changes are grouped by path, each
+    # tagged with its upper-cased method (None means it applies to every method).
+    endpoint_impacts_by_path = {}
     for change in api_changes["endpoint_changes"]:
-        path = change["path"]
-        if path not in endpoint_changes_by_path:
-            endpoint_changes_by_path[path] = []
-        endpoint_changes_by_path[path].append(change)
+        method = change.get("method")
+        endpoint_impacts_by_path.setdefault(change["path"], []).append(
+            (method.upper() if method else None, _endpoint_change_impacts(change)))
 
     # Map of deleted paths to their potential replacements
-    path_replacements = {}
-    deleted_paths = [c["path"] for c in api_changes["endpoint_changes"] if c["type"] == "deleted"]
-    added_paths = [c["path"] for c in api_changes["endpoint_changes"] if c["type"] == "added"]
+    # (versioned moves, e.g., /users/{id} → /users/v1/{id})
+    deleted_paths = [c["path"] for c in api_changes["endpoint_changes"] if c["type"] == ENDPOINT_DELETED]
+    added_paths = [c["path"] for c in api_changes["endpoint_changes"] if c["type"] == ENDPOINT_ADDED]
+    path_replacements = detect_path_moves(deleted_paths, added_paths)
 
-    for deleted in deleted_paths:
-        for added in added_paths:
-            # Check if this looks like a versioned replacement (e.g., /users/{id} → /users/v1/{id})
-            if normalize_path(deleted) == normalize_path(added):
-                path_replacements[deleted] = added
+    deleted_impacts = {path: _path_deleted_impact(path, path_replacements.get(path)) for path in deleted_paths}
 
-    # Analyze each dependency
-    for dependency in dependencies:
+    # Look for schema changes that might affect a dependency
+    # Without a ref index this is a heuristic since we don't know which schemas an endpoint uses
+    schema_impacts = _schema_change_impacts(api_changes.get("property_changes", []))
+
+    # (method, path) -> endpoint / schema impact records, filled on first lookup
+    impacts_by_operation = {}
+    schema_impacts_by_operation = {}
+
+    def match_dependency(dependency):
         service_name = dependency.get("serviceName")
         external_call = dependency.get("externalCall", {})
         dependent_path = external_call.get("path")
         dependent_method = external_call.get("method", "").upper()
+        matched_path = dependent_path
+        if router is not None:
+            matched_path = router.resolve(dependent_path) or dependent_path
 
         impact_details = []
 
         # Check if the dependent path was deleted
-        if dependent_path in deleted_paths:
-            replacement = path_replacements.get(dependent_path)
-            if replacement:
-                impact_details.append({
-                    "impact_type": "breaking",
-                    "change_type": "path_versioned",
-                    "description": f"Endpoint moved from {dependent_path} to {replacement}",
-                    "before": dependent_path,
-                    "after": replacement,
-                    "severity": "high"
-                })
-            else:
-                impact_details.append({
-                    "impact_type": "breaking",
-                    "change_type": "path_removed",
-                    "description": f"Endpoint {dependent_path} was completely removed",
-                    "before": dependent_path,
-                    "after": "None",
-                    "severity": "critical"
-                })
+        deleted_impact = deleted_impacts.get(matched_path)
+        if deleted_impact:
+            impact_details.append(deleted_impact)
 
         # Check if the dependent path was modified
-        if dependent_path in endpoint_changes_by_path:
-            for change in endpoint_changes_by_path[dependent_path]:
+        operation_key = (dependent_method, matched_path)
+        operation_impacts = impacts_by_operation.get(operation_key)
+        if operation_impacts is None:
+            operation_impacts = []
+            for method, change_impacts in endpoint_impacts_by_path.get(matched_path, ()):
                 # Skip if this is not the method we're interested in
-                if change.get("method") and change.get("method").upper() != dependent_method:
-                    continue
-
-                # Check request changes
-                for req_change in change.get("request_changes", []):
-                    if req_change["type"] == "properties_added":
-                        impact_details.append({
-                            "impact_type": "non-breaking",
-                            "change_type": "request_properties_added",
-                            "description": f"Request properties added: {', '.join(req_change['properties'])}",
-                            "properties": req_change['properties'],
-                            "severity": "low"
-                        })
-                    elif req_change["type"] == "properties_removed":
-                        impact_details.append({
-                            "impact_type": "breaking",
-                            "change_type": "request_properties_removed",
-                            "description": f"Request properties removed: {', '.join(req_change['properties'])}",
-                            "properties": req_change['properties'],
-                            "severity": "high"
-                        })
-
-                # Check response changes
-                for resp_change in change.get("response_changes", []):
-                    if resp_change["type"] == "properties_added":
-                        impact_details.append({
-                            "impact_type": "non-breaking",
-                            "change_type": "response_properties_added",
-                            "description": f"Response properties added in status {resp_change['status']}: {', '.join(resp_change['properties'])}",
-                            "properties": resp_change['properties'],
-                            "status": resp_change['status'],
-                            "severity": "low"
-                        })
-                    elif resp_change["type"] == "properties_removed":
-                        impact_details.append({
-                            "impact_type": "breaking",
-                            "change_type": "response_properties_removed",
-                            "description": f"Response properties removed in status {resp_change['status']}: {', '.join(resp_change['properties'])}",
-                            "properties": resp_change['properties'],
-                            "status": resp_change['status'],
-                            "severity": "high"
-                        })
-
-        # Look for schema changes that might affect this dependency
-        # This is more of a heuristic since we don't know exactly which schemas this endpoint uses
-        schema_impacts = []
-        for schema_change in api_changes.get("property_changes", []):
-            if schema_change["type"] == "schema_properties_added":
-                schema_impacts.append({
-                    "impact_type": "non-breaking",
-                    "change_type": "schema_properties_added",
-                    "description": f"Properties added to {schema_change['schema']} schema: {', '.join(schema_change['properties'])}",
-                    "schema": schema_change['schema'],
-                    "properties": schema_change['properties'],
-                    "severity": "low"
-                })
-            elif schema_change["type"] == "schema_properties_removed":
-                schema_impacts.append({
-                    "impact_type": "breaking",
-                    "change_type": "schema_properties_removed",
-                    "description": f"Properties removed from {schema_change['schema']} schema: {', '.join(schema_change['properties'])}",
-                    "schema": schema_change['schema'],
-                    "properties": schema_change['properties'],
-                    "severity": "high"
-                })
-
-        # Add schema impacts only if we found other impacts
-        # (to avoid noise from unrelated schema changes)
-        if impact_details and schema_impacts:
+                if method is None or method == dependent_method:
+                    operation_impacts.extend(change_impacts)
+            impacts_by_operation[operation_key] = operation_impacts
+        impact_details.extend(operation_impacts)
+
+        if ref_index is not None:
+            # Add schema impacts for the schemas this operation reaches through $ref
+            operation_schema_impacts = schema_impacts_by_operation.get(operation_key)
+            if operation_schema_impacts is None:
+                reachable = ref_index.get(operation_key, frozenset())
+                operation_schema_impacts = [i for i in schema_impacts if i["schema"] in reachable]
+                schema_impacts_by_operation[operation_key] = operation_schema_impacts
+            impact_details.extend(operation_schema_impacts)
+        elif impact_details and schema_impacts:
+            # Add schema impacts only if we found other impacts
+            # (to avoid noise from unrelated schema changes)
             impact_details.extend(schema_impacts)
 
         # If we found any impacts, add this service to the results
         if impact_details:
-            impacted_services.append({
-                "service": service_name,
-                "affected_endpoint": {
-                    "path": dependent_path,
-                    "method": dependent_method
-                },
-                "originatingEndpoints": dependency.get("originatingEndpoints", []),
-                "impact_details": impact_details
-            })
+            affected_endpoint = AffectedEndpoint(
+                path=dependent_path,
+                method=dependent_method
+            )
+            if matched_path != dependent_path:
+                affected_endpoint.spec_path = matched_path
+            return ImpactedService(
+                service=service_name,
+                affected_endpoint=affected_endpoint,
+                originatingEndpoints=dependency.get("originatingEndpoints", []),
+                impact_details=impact_details
+            )
+        return None
+
+    return match_dependency
+
+
+
+def touched_operations(api_changes, operations, ref_index=None):
+    """The (METHOD, spec path) keys in operations that can pick up an impact from api_changes.
+
+    That is anything under a changed path, plus (with a ref index) the
+    operations reaching a changed schema. Without one, schema impacts only
+    ride along with other impacts on a changed path.
+    """
+    changed_paths = {c["path"] for c in api_changes["endpoint_changes"]}
+    touched = [operation for operation in operations if operation[1] in changed_paths]
+    if ref_index is not None:
+        changed_schemas = {c["schema"] for c in api_changes.get("property_changes", [])}
+        if changed_schemas:
+            touched += [operation for operation in operations
+                        if operation[1] not in changed_paths and ref_index.get(operation, frozenset()) & changed_schemas]
+    return touched
+
+
+def analyze_impact_indexed(api_changes, dependency_index, router, ref_index=None, service=None):
+    """analyze_impact over a dependency_index.DependencyIndex, reading only the records it needs.
+
+    Only the distinct (method, call path) pairs are routed against the spec;
+    full records are fetched just for the operations the changes touch.
+    """
+    calls_by_operation = {}
+    for method, path in dependency_index.call_keys(service):
+        matched_path = router.resolve(path) or path
+        calls_by_operation.setdefault((method, matched_path), []).append(path)
+
+    touched = touched_operations(api_changes, calls_by_operation, ref_index)
+    if not touched:
+        return []
+
+    match_dependency = make_impact_matcher(api_changes, router, ref_index)
+    entries = []
+    for operation in touched:
+        method = operation[0]
+        for path in calls_by_operation[operation]:
+            for position, record in dependency_index.records_for_call(method, path, service):
+                count("dependencies_scanned")
+                impacted = match_dependency(record)
+                if impacted:
+                    entries.append((position, impacted))
+
+    # Same order analyze_impact gives: the order of the dependency file
+    entries.sort(key=lambda entry: entry[0])
+    return [impacted for _, impacted in entries]
+
+
+def analyze_impact_incremental(api_changes, state, dependencies_key, load_dependencies, router, routing_key,
+                               ref_index=None):
+    """analyze_impact, re-evaluating only the operations the changes touch.
+
+    The dependency records and their (method, path) index come from state
+    (an analysis_state.AnalysisState), so an unchanged dependency file is not
+    read again. Only dependencies calling an operation that is deleted,
+    modified or reaches a changed schema are looked at, and an operation
+    whose relevant changes match the previous run reuses its entries.
+    routing_key identifies the path templates router was built from.
+    """
+    index = state.dependency_index(dependencies_key, routing_key, load_dependencies, router)
+
+    endpoint_changes = api_changes["endpoint_changes"]
+    property_changes = api_changes.get("property_changes", [])
+    deleted_paths = [c["path"] for c in endpoint_changes if c["type"] == ENDPOINT_DELETED]
+    added_paths = [c["path"] for c in endpoint_changes if c["type"] == ENDPOINT_ADDED]
+    path_replacements = detect_path_moves(deleted_paths, added_paths)
+
+    touched = touched_operations(api_changes, index, ref_index)
+
+    # Changes by path and by schema (with their position, to keep report order), so each
+    # operation only looks at its own instead of scanning every change
+    endpoint_changes_by_path = {}
+    for change in endpoint_changes:
+        endpoint_changes_by_path.setdefault(change["path"], []).append(change)
+    property_changes_by_schema = {}
+    for position, change in enumerate(property_changes):
+        property_changes_by_schema.setdefault(change["schema"], []).append((position, change))
+    deleted = set(deleted_paths)
+
+    match_dependency = None
+    entries = []
+    for operation in touched:
+        method, path = operation
+        if ref_index is not None:
+            reachable = ref_index.get(operation, frozenset())
+            schema_changes = [change for _, change in sorted(
+                (entry for schema in reachable for entry in property_changes_by_schema.get(schema, ())),
+                key=lambda entry: entry[0])]
+        else:
+            schema_changes = property_changes
+        relevant = [
+            [c for c in endpoint_changes_by_path.get(path, ()) if not c.get("method") or c["method"].upper() == method],
+            path_replacements.get(path) if path in deleted else None,
+            schema_changes
+        ]
+        fingerprint = cache_key(dependencies_key, routing_key, json.dumps(relevant, sort_keys=True, default=json_default))
+
+        def evaluate():
+            nonlocal match_dependency
+            if match_dependency is None:
+                match_dependency = make_impact_matcher(api_changes, router, ref_index)
+            found = []
+            count("dependencies_scanned", len(index[operation]))
+            for position in index[operation]:
+                impacted = match_dependency(state.record(position))
+                if impacted:
+                    found.append((position, impacted))
+            return found
+
+        entries.extend(state.impact_entries(operation, fingerprint, evaluate))
+
+    # Same order analyze_impact gives: the order of the dependency file
+    entries.sort(key=lambda entry: entry[0])
+    return [impacted for _, impacted in entries]
 
-    return impacted_services
 
+VERSION_SEGMENT_RE = re.compile(r'/v\d+/')
+PATH_PARAM_RE = re.compile(r'\{[^}]+\}')
 
+
+@lru_cache(maxsize=65536)
 def normalize_path(path):
     """Normalize API paths to handle version differences and parameter names"""
-    import re
-
     # Remove version segments (e.g., /v1/, /v2/)
-    normalized = re.sub(r'/v\d+/', '/', path)
+    normalized = VERSION_SEGMENT_RE.sub('/', path)
 
     # Replace all parameter placeholders with a generic {param}
-    normalized = re.sub(r'\{[^}]+\}', '{param}', normalized)
+    normalized = PATH_PARAM_RE.sub('{param}', normalized)
 
     return normalized
 
-def extract_changed_paths(diff):
-    changed = set()
-    for category in ['values_changed', 'dictionary_item_added', 'dictionary_item_removed']:
-        for path in diff.get(category, {}):
-            if path.startswith("root['paths']"):
-                parts = path.split("'")
-                if len(parts) >= 4:
-                    changed.add(parts[3])
-    return changed
+
+def detect_path_moves(deleted_paths, added_paths):
+    """Map each deleted path to the added paths that normalize to the same key.
+
+    Candidates are sorted, so a path that could have moved to several places
+    (e.g. /users/{id} -> /v1/users/{id} and /v2/users/{id}) is reported the
+    same way regardless of the order the diff listed them in.
+    """
+    added_by_key = {}
+    for added in added_paths:
+        added_by_key.setdefault(normalize_path(added), set()).add(added)
+
+    moves = {}
+    for deleted in deleted_paths:
+        candidates = added_by_key.get(normalize_path(deleted))
+        if candidates:
+            moves[deleted] = sorted(candidates)
+    return moves
+
+# root['paths'][<key>] at the start of a DeepDiff-style path string; the key is a Python string literal
+DEEPDIFF_PATH_RE = re.compile(r"""root\['paths'\]\[('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")\]""")
+
+
+def extract_changed_paths(changes):
+    # changes is any of:
+    # - compare_openapi_specs.compare_specs() output, the DeepDiff-style dict of
+    #   report category -> root[...] path strings
+    # - compare_spec_changes() TreeChange records
+    # - the {(path, method): [changes]} index index_changes() builds from those
+    if isinstance(changes, dict) and not all(isinstance(key, tuple) for key in changes):
+        import ast
+
+        changed = set()
+        for entries in changes.values():
+            for location in entries:
+                match = DEEPDIFF_PATH_RE.match(location) if isinstance(location, str) else None
+                if match:
+                    changed.add(ast.literal_eval(match.group(1)))
+        return changed
+    if not isinstance(changes, dict):
+        from compare_openapi_specs import index_changes
+
+        changes = index_changes(changes)
+    return {path for path, _ in changes}
 
 # def analyze_impact(changed_paths, dependencies):
 #     impacted = []
@@ -556,7 +748,36 @@ def build_llm_prompt(oasdiff_output, dependencies):
     return prompt
 
 
-def call_openai_with_mcp(oasdiff_output, dependencies):
+def has_breaking_impact(impacted_services):
+    return any(detail.get("impact_type") == IMPACT_BREAKING
+               for service in impacted_services
+               for detail in service.get("impact_details", []))
+
+
+def build_rule_based_findings(impacted_services):
+    lines = []
+    for service in impacted_services:
+        endpoint = service["affected_endpoint"]
+        for detail in service["impact_details"]:
+            lines.append(f"- **{service['service']}** `{endpoint['method']} {endpoint['path']}`: "
+                         f"{detail['description']} ({detail['severity']})")
+    return "\n".join(lines) + "\n" if lines else "No dependent services are affected.\n"
+
+
+def build_rule_based_report(impacted_services):
+    # Written instead of an LLM analysis when nothing breaking was found
+    lines = [
+        "## API Impact Analysis",
+        "",
+        "No breaking changes affect dependent services, so LLM analysis was skipped.",
+    ]
+    if impacted_services:
+        lines += ["", "Non-breaking impacts:", build_rule_based_findings(impacted_services)]
+        return "\n".join(lines)
+    return "\n".join(lines) + "\n"
+
+
+def build_mcp_request(oasdiff_output, dependencies):
 
     # Structure the request using supported MCP format
     mcp_request = {
@@ -602,18 +823,60 @@ def call_openai_with_mcp(oasdiff_output, dependencies):
         ]
     }
 
+    return mcp_request
+
+
+def complete_chat(request, llm_client=None, cache=None):
+    key = None
+    if cache is not None:
+        key = llm_request_key(request, llm_client)
+        entry = cache.get(key)
+        if entry is not None:
+            count("llm_cache_hits")
+            return entry["content"]
+
+    count("llm_requests")
+    count("prompt_tokens", request_tokens(request))
     try:
-        response = client.chat.completions.create(**mcp_request)
-        return response.choices[0].message.content
+        with span("llm_request"):
+            response = (llm_client or get_client()).chat.completions.create(**request)
+        content = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        if getattr(usage, "completion_tokens", None):
+            count("completion_tokens", usage.completion_tokens)
     except Exception as e:
         print(f"Error calling OpenAI API with MCP: {e}")
         return None
 
+    if cache is not None and content is not None:
+        cache.put(key, {"content": content})
+    return content
+
+
+def call_openai_with_mcp(oasdiff_output, dependencies, llm_client=None, cache=None):
+    with span("call_openai_with_mcp"):
+        with span("build_prompt", prompt="full"):
+            request = build_mcp_request(oasdiff_output, dependencies)
+        return complete_chat(request, llm_client, cache)
+
+
+def call_openai_compact(events, impacted_services, llm_client=None, cache=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    # Sends only change events and matched dependencies, split into budget-sized parts
+    with span("build_prompt", prompt="compact"):
+        requests = build_compact_mcp_requests(events, impacted_services, token_budget)
+    count("prompt_requests", len(requests))
+    with span("call_openai_compact"):
+        answers = [complete_chat(request, llm_client, cache) for request in requests]
+    if len(answers) == 1:
+        return answers[0]
+    parts = [f"### Part {i} of {len(answers)}\n\n{answer}" for i, answer in enumerate(answers, start=1) if answer is not None]
+    return "\n\n".join(parts) if parts else None
+
 
 def call_openai(prompt):
 
     try:
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="gpt-4",
             messages=[
                 {"role": "system",
@@ -635,42 +898,458 @@ def call_openai(prompt):
 #     )
 #     return response.choices[0].message.content
 
-def main():
-    old_spec = load_yaml(sys.argv[1])
-    new_spec = load_yaml(sys.argv[2])
-    dependencies = load_json(sys.argv[3])
+COMMANDS = ("diff", "impact", "llm", "all", "build-index", "serve", "history", "org-impact")
+
+
+def parse_args(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # `impact_analysis.py old new deps` (no subcommand) keeps meaning the full pipeline
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv.insert(0, "all")
+
+    specs = argparse.ArgumentParser(add_help=False)
+    specs.add_argument("old_spec", help="Path to the base OpenAPI spec (YAML or JSON)")
+    specs.add_argument("new_spec", help="Path to the revised OpenAPI spec (YAML or JSON)")
+    specs.add_argument("--differ", choices=["python", "oasdiff"], default="python",
+                       help="Diff specs in-process (default) or with the tufin/oasdiff Docker image")
+
+    impact = argparse.ArgumentParser(add_help=False)
+    impact.add_argument("dependencies", help="Path to the service dependencies JSON file, or a build-index file")
+    impact.add_argument("--cache-dir", default=os.getenv("IMPACT_CACHE_DIR"),
+                        help="Reuse diff and impact results for previously analyzed inputs from this directory")
+    impact.add_argument("--cache-max-mb", type=int, default=256,
+                        help="Evict least-recently-used cache entries beyond this size (default: 256)")
+    impact.add_argument("--state", default=os.getenv("IMPACT_STATE_FILE"),
+                        help="Carry parsed specs, the dependency index and per-operation results in this file "
+                             "between runs, and only re-analyze what changed")
+    impact.add_argument("--stream-dependencies", action="store_true",
+                        help="Read the dependency file (JSON array or JSON Lines) record by record instead of all at once")
+    impact.add_argument("--service",
+                        help="Only consider dependency records whose externalCall.service is this name")
+    impact.add_argument("--server", default=os.getenv("IMPACT_SERVER"),
+                        help="Ask a running `serve` daemon (host:port or unix:/path) instead of analyzing in-process")
+    impact.add_argument("--transitive", action="store_true",
+                        help="Also follow breaking changes through the consumers' own callers, with hop distances")
+    impact.add_argument("--graph", action="append", metavar="FILE",
+                        help="Dependency file to build the service call graph from with --transitive; repeat for "
+                             "every service's file (default: the dependencies file)")
+    impact.add_argument("--max-hops", type=int, help="Stop following breaking changes after this many hops")
+
+    instrument = argparse.ArgumentParser(add_help=False)
+    instrument.add_argument("--trace", metavar="FILE",
+                            help="Write per-stage timings, peak memory and counters as JSON to FILE (- for stderr)")
+    instrument.add_argument("--trace-memory", action="store_true",
+                            help="Also record the peak Python allocation of every traced stage (slows the run down)")
+    instrument.add_argument("--profile", metavar="FILE",
+                            help="Run under cProfile, save the stats to FILE and print the hottest functions to stderr")
+    instrument.add_argument("--profile-limit", type=int, default=30,
+                            help="Functions to print with --profile (default: 30)")
+
+    llm = argparse.ArgumentParser(add_help=False)
+    llm.add_argument("--always-llm", action="store_true",
+                     help="Ask the LLM even when the rule-based analysis finds nothing breaking")
+    llm.add_argument("--llm-client", choices=["openai", "stub"], default=os.getenv("IMPACT_LLM_CLIENT", "openai"),
+                     help="Use the OpenAI API (default) or the offline stub client")
+    llm.add_argument("--prompt", choices=["compact", "full"], default="compact",
+                     help="Send only change events and matched dependencies (default) or the full diff and dependency file")
+    llm.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+                     help=f"Upper bound on tokens per compact prompt; larger inputs are split (default: {DEFAULT_TOKEN_BUDGET})")
+    llm.add_argument("--llm-mode", choices=["single", "fanout"], default="single",
+                     help="One request for all services (default) or one concurrent request per impacted service")
+    llm.add_argument("--concurrency", type=int, default=4,
+                     help="Maximum in-flight LLM requests in fanout mode (default: 4)")
+    llm.add_argument("--requests-per-minute", type=int, default=60,
+                     help="Rate limit for LLM requests in fanout mode (default: 60)")
+    llm.add_argument("--tokens-per-minute", type=int, default=None,
+                     help="Optional prompt-token rate limit in fanout mode")
+    llm.add_argument("--llm-timeout", type=float, default=120.0,
+                     help="Seconds before an LLM request is abandoned and retried (default: 120)")
+    llm.add_argument("--llm-retries", type=int, default=4,
+                     help="Retries per LLM request in fanout mode, with exponential backoff (default: 4)")
+    llm.add_argument("--stream", action="store_true",
+                     help="Stream the LLM answer to stdout and the report file as it arrives")
+    llm.add_argument("--report", default="llm_analysis.txt",
+                     help="Where to write the analysis for the PR comment (default: llm_analysis.txt)")
+    llm.add_argument("--llm-metrics",
+                     help="Write streaming latency and token metrics to this JSON file")
+
+    parser = argparse.ArgumentParser(description="Analyze the impact of OpenAPI spec changes on dependent services")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("diff", parents=[specs, instrument], help="Print the spec diff as JSON")
+    commands.add_parser("impact", parents=[specs, impact, instrument], help="Print the rule-based impacted services as JSON")
+    commands.add_parser("llm", parents=[specs, impact, llm, instrument], help="Write the LLM impact report")
+    commands.add_parser("all", parents=[specs, impact, llm, instrument],
+                        help="Print the diff and rule-based impact, then write the LLM report (default)")
+    build_index = commands.add_parser("build-index", parents=[instrument],
+                                      help="Compile dependency files into a SQLite index for fast lookups")
+    build_index.add_argument("sources", nargs="+", help="Dependency JSON / JSON Lines files to index")
+    build_index.add_argument("-o", "--output", default="dependencies.index.sqlite",
+                             help="Index file to write (default: dependencies.index.sqlite)")
+    build_index.add_argument("--force", action="store_true",
+                             help="Rebuild even if the index already matches the sources")
+    serve = commands.add_parser("serve", parents=[instrument],
+                                help="Keep specs and dependency indexes warm and answer impact queries over HTTP")
+    serve.add_argument("--listen", default="127.0.0.1:8765",
+                       help="host:port or unix:/path/to.sock to listen on (default: 127.0.0.1:8765)")
+    serve.add_argument("--max-contexts", type=int, default=16,
+                       help="Spec pair / dependency file combinations kept warm at once (default: 16)")
+    history = commands.add_parser("history", parents=[instrument],
+                                  help="Analyze every spec revision in a git commit range into an impact timeline")
+    history.add_argument("range", help="Commits to analyze, e.g. main..HEAD or v1.0..v2.0")
+    history.add_argument("dependencies", help="Path to the service dependencies JSON file, or a build-index file")
+    history.add_argument("--repo", default=".", help="Git repository to read the spec from (default: .)")
+    history.add_argument("--spec", action="append",
+                         help="Spec path within the repository; repeat to try several in order "
+                              "(default: openapi.yaml, then openapi-spec.json)")
+    history.add_argument("--jobs", type=int, help="Processes to diff revisions with (default: CPU count)")
+    history.add_argument("--first-parent", action="store_true",
+                         help="Follow only the first parent of merge commits")
+    history.add_argument("--details", action="store_true",
+                         help="Include the full API changes and impacted services of every revision")
+    history.add_argument("--stream-dependencies", action="store_true",
+                         help="Read the dependency file (JSON array or JSON Lines) record by record instead of all at once")
+    history.add_argument("--service",
+                         help="Only consider dependency records whose externalCall.service is this name")
+    history.add_argument("-o", "--output", help="Write the timeline JSON here instead of stdout")
+    org_impact = commands.add_parser("org-impact", parents=[instrument],
+                                     help="Analyze many provider specs against many dependency files into one report")
+    org_impact.add_argument("manifest", help="JSON or YAML file listing providers (service, old_spec, new_spec) "
+                                             "and consumer dependency files")
+    org_impact.add_argument("--index-dir", default=".impact-indexes",
+                            help="Where consumer dependency files are compiled into indexes (default: .impact-indexes)")
+    org_impact.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    org_impact.add_argument("--transitive", action="store_true",
+                            help="Also follow each provider's breaking changes through the consumers' own callers")
+    org_impact.add_argument("--max-hops", type=int, help="Stop following breaking changes after this many hops")
+    org_impact.add_argument("-o", "--output", help="Write the report JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def diff_spec_files(old_spec_path, new_spec_path, old_spec, new_spec, differ="python"):
+    if differ == "oasdiff":
+        return run_oasdiff(old_spec_path, new_spec_path)
+    return diff_specs(old_spec, new_spec)
+
+
+def make_async_client(kind="openai"):
+    if kind == "stub":
+        from llm_stub import AsyncStubOpenAIClient
+        return AsyncStubOpenAIClient()
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def run_analysis(old_spec_path, new_spec_path, dependencies_path, differ="python", cache=None,
+                 stream_dependencies=False, service=None, state=None):
+    """Diff two spec files and match the changes against a dependency file.
+
+    Returns the raw diff, its change events, the analyze_oasdiff_changes result
+    and the impacted services. With a cache, an (old spec, new spec,
+    dependencies) triple seen before is answered from its content hashes
+    without parsing or diffing anything. stream_dependencies reads the
+    dependency file record by record instead of parsing it whole, and service
+    keeps only the records calling that service. With a state
+    (analysis_state.AnalysisState), only the parts that changed since the
+    previous run are diffed and matched, and the state is saved afterwards.
+    """
+    from dependency_index import DependencyIndex, is_dependency_index
+
+    with span("read_inputs"):
+        # Each input is read once; the bytes feed both the cache key and the parser
+        inputs = [(path, *read_document(path)) for path in (old_spec_path, new_spec_path)]
+        dependency_index = None
+        if is_dependency_index(dependencies_path):
+            # A build-index file knows the digest of the sources it was built from
+            dependency_index = DependencyIndex(dependencies_path)
+            dependencies_digest, dependencies_data = dependency_index.source_digest, None
+        elif stream_dependencies:
+            dependencies_digest, dependencies_data = file_digest(dependencies_path), None
+        else:
+            dependencies_digest, dependencies_data = read_document(dependencies_path)
+
+    key = None
+    if cache is not None:
+        key = cache_key(inputs[0][1], inputs[1][1], dependencies_digest, f"differ={differ}", f"service={service}")
+        entry = cache.get(key)
+        if entry is not None:
+            count("analysis_cache_hits")
+            if dependency_index is not None:
+                dependency_index.close()
+            entry["events"] = [ChangeEvent(*row) for row in entry["events"]]
+            return entry
+
+    snapshots = snapshot_cache_for(cache)
+    with span("load_yaml"):
+        if state is not None:
+            old_spec, new_spec = (state.document(digest, lambda: load_document_bytes(digest, data, path, snapshots))
+                                  for path, digest, data in inputs)
+        else:
+            old_spec, new_spec = (load_document_bytes(digest, data, path, snapshots) for path, digest, data in inputs)
+
+    def load_dependencies():
+        if dependency_index is not None:
+            return dependency_index.records(service)
+        if stream_dependencies:
+            return iter_dependencies(dependencies_path, service)
+        records = load_document_bytes(dependencies_digest, dependencies_data, dependencies_path, snapshots)
+        if service is not None:
+            records = [record for record in records if record.get("externalCall", {}).get("service") == service]
+        return records
+
+    with span("diff", differ=differ, incremental=state is not None):
+        if state is not None and differ == "python":
+            oasdiff_result = state.diff_specs(inputs[0][1], old_spec, inputs[1][1], new_spec)
+        else:
+            oasdiff_result = diff_spec_files(old_spec_path, new_spec_path, old_spec, new_spec, differ)
+    with span("analyze_oasdiff_changes"):
+        events = collect_change_events(oasdiff_result)
+        api_changes = analyze_oasdiff_changes(oasdiff_result, events)
+    count("change_events", len(events))
+
+    dependencies = None
+    mode = "index" if dependency_index is not None else "state" if state is not None else "full"
+    with span("analyze_impact", mode=mode):
+        router = PathRouter.from_spec(old_spec)
+        ref_index = state.ref_index(inputs[0][1], old_spec) if state is not None else build_ref_index(old_spec)
+        if dependency_index is not None:
+            # The index already looks records up by call; copying them all into the state would
+            # decode every one of them on each change of the dependency file
+            impacted_services = analyze_impact_indexed(api_changes, dependency_index, router, ref_index=ref_index,
+                                                       service=service)
+        elif state is not None:
+            routing_key = cache_key(*((old_spec or {}).get("paths", {}) or {}))
+            impacted_services = analyze_impact_incremental(api_changes, state,
+                                                           cache_key(dependencies_digest, f"service={service}"),
+                                                           load_dependencies, router, routing_key,
+                                                           ref_index=ref_index)
+        else:
+            dependencies = load_dependencies()
+            impacted_services = analyze_impact(api_changes, dependencies, router=router, ref_index=ref_index)
+    count("impacted_services", len(impacted_services))
+    if state is not None:
+        with span("save_state"):
+            state.save()
+        for name, value in state.stats.items():
+            count(f"state_{name}", value)
+    if dependency_index is not None:
+        dependency_index.close()
+
+    result = {
+        "diff": oasdiff_result,
+        "events": events,
+        "api_changes": api_changes,
+        "impacted_services": impacted_services
+    }
+    if cache is not None:
+        cache.put(key, dict(result, events=[list(event) for event in events]))
+    # Parsed inputs ride along for later stages but are never written to the cache;
+    # streamed or indexed dependencies were never loaded whole and are re-read on demand
+    result["inputs"] = {"old_spec": old_spec, "new_spec": new_spec, "dependencies": dependencies}
+    return result
+
+
+def make_state(args):
+    if not args.state:
+        return None
+    from analysis_state import AnalysisState
+
+    return AnalysisState(args.state)
+
+
+def make_cache(args):
+    return AnalysisCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+
 
-    # Add this before your main run_oasdiff function call
-    # to debug and see available options
-    help_result = subprocess.run([
-        "docker", "run", "--rm", "tufin/oasdiff:latest", "diff", "--help"
-    ], capture_output=True, text=True)
-    print("Available options:")
-    print(help_result.stdout)
+def loaded_dependencies(args, result):
+    # Reuse the dependencies run_analysis already parsed; only a cache hit has to load them
+    inputs = result.get("inputs")
+    if inputs and inputs["dependencies"] is not None:
+        return inputs["dependencies"]
+    from dependency_index import DependencyIndex, is_dependency_index
 
-    oasdiff_result = run_oasdiff(sys.argv[1], sys.argv[2])
+    if is_dependency_index(args.dependencies):
+        with DependencyIndex(args.dependencies) as dependency_index:
+            return list(dependency_index.records(args.service))
+    if args.stream_dependencies or args.service:
+        return list(iter_dependencies(args.dependencies, args.service))
+    return load_json(args.dependencies)
 
-    print(oasdiff_result)
 
+def write_llm_report(args, result, cache):
     # After running oasdiff and loading dependencies
     # prompt = build_llm_prompt(oasdiff_result, dependencies)
     # print(prompt)
     # analysis = call_openai(prompt)
 
-    # After running oasdiff and loading dependencies
-    analysis = call_openai_with_mcp(oasdiff_result, dependencies)
-
-    print("\n📋 MCP-Enhanced LLM Analysis:")
-    print(analysis)
+    needs_llm = args.always_llm or has_breaking_impact(result["impacted_services"])
+    llm_client = None
+    if needs_llm:
+        try:
+            if args.llm_mode == "fanout":
+                llm_client = make_async_client(args.llm_client)
+            else:
+                llm_client = make_client(args.llm_client)
+        except Exception as e:
+            # e.g. no API key; the rule-based findings are still worth posting
+            print(f"Error creating OpenAI client: {e}")
+
+    if not needs_llm:
+        analysis = build_rule_based_report(result["impacted_services"])
+    elif llm_client is None:
+        analysis = None
+    elif args.stream and args.llm_mode == "single":
+        from llm_stream import stream_requests
+
+        with span("build_prompt", prompt=args.prompt):
+            if args.prompt == "compact":
+                requests = build_compact_mcp_requests(result["events"], result["impacted_services"], args.token_budget)
+            else:
+                requests = [build_mcp_request(result["diff"], loaded_dependencies(args, result))]
+        count("prompt_requests", len(requests))
+
+        print("\n📋 LLM Impact Analysis:")
+        with span("stream_requests"):
+            analysis, metrics = stream_requests(requests, args.report, llm_client, timeout=args.llm_timeout,
+                                                cache=cache,
+                                                fallback=build_rule_based_findings(result["impacted_services"]))
+        count("prompt_tokens", metrics["prompt_tokens"])
+        count("completion_tokens", metrics["completion_tokens"])
+
+        ttft = metrics["time_to_first_token"]
+        print(f"\n⏱️ time to first token: {f'{ttft:.2f}s' if ttft is not None else 'n/a'}, "
+              f"total: {metrics['total_latency']:.2f}s, "
+              f"tokens: {metrics['prompt_tokens']} prompt / {metrics['completion_tokens']} completion"
+              f"{'' if metrics['completed'] else ' (incomplete)'}")
+        if args.llm_metrics:
+            with open(args.llm_metrics, "w") as f:
+                json.dump(metrics, f, indent=2)
+        return analysis
+    elif args.llm_mode == "fanout":
+        from llm_fanout import run_fanout
+
+        with span("run_fanout", concurrency=args.concurrency):
+            analysis = run_fanout(result["events"], result["impacted_services"], llm_client,
+                                  cache=cache, concurrency=args.concurrency,
+                                  requests_per_minute=args.requests_per_minute,
+                                  tokens_per_minute=args.tokens_per_minute, timeout=args.llm_timeout,
+                                  max_retries=args.llm_retries, token_budget=args.token_budget)
+    else:
+        if args.prompt == "compact":
+            analysis = call_openai_compact(result["events"], result["impacted_services"],
+                                           llm_client=llm_client, cache=cache, token_budget=args.token_budget)
+        else:
+            analysis = call_openai_with_mcp(result["diff"], loaded_dependencies(args, result),
+                                            llm_client=llm_client, cache=cache)
+
+    if analysis is None:
+        # Still leave something for the PR comment step to post
+        analysis = ("LLM analysis is unavailable for this run; the rule-based findings follow.\n\n"
+                    + build_rule_based_findings(result["impacted_services"]))
 
     print("\n📋 LLM Impact Analysis:")
     print(analysis)
 
-    # Analyze API changes in detail
-
     # ✍️ Write analysis to file for GitHub Actions to read
-    with open("llm_analysis.txt", "w") as f:
+    with open(args.report, "w") as f:
         f.write(analysis)
+    return analysis
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tracer = start_tracing(args.trace_memory) if args.trace else None
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with span(args.command):
+            run_command(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            write_profile(profiler, args.profile, args.profile_limit)
+        if tracer is not None:
+            stop_tracing()
+            write_trace(tracer, args.trace)
+
+
+def run_command(args):
+    if args.command == "build-index":
+        from dependency_index import build_index
+
+        records, rebuilt = build_index(args.sources, args.output, args.force)
+        count("dependencies_indexed", records)
+        print(f"{'Indexed' if rebuilt else 'Up to date:'} {records} dependency records in {args.output}")
+        return
+
+    if args.command == "serve":
+        from impact_server import serve
+
+        serve(args.listen, args.max_contexts)
+        return
+
+    if args.command == "history":
+        from batch_history import run_history
+
+        run_history(args)
+        return
+
+    if args.command == "org-impact":
+        from org_impact import run_org_impact
+
+        run_org_impact(args)
+        return
+
+    if args.command == "diff":
+        with span("load_yaml"):
+            old_spec = load_yaml(args.old_spec)
+            new_spec = load_yaml(args.new_spec)
+        with span("diff", differ=args.differ):
+            diff = diff_spec_files(args.old_spec, args.new_spec, old_spec, new_spec, args.differ)
+        print(json.dumps(diff, indent=2))
+        return
+
+    cache = make_cache(args)
+    if args.server:
+        from impact_server import remote_analysis
+
+        with span("remote_analysis"):
+            result = remote_analysis(args.server, args.old_spec, args.new_spec, args.dependencies, args.service,
+                                     args.differ)
+    else:
+        result = run_analysis(args.old_spec, args.new_spec, args.dependencies, args.differ, cache,
+                              args.stream_dependencies, args.service, make_state(args))
+
+    if args.transitive:
+        from blast_radius import blast_radius, load_graph
+
+        with span("blast_radius"):
+            graph = load_graph(args.graph or [args.dependencies])
+            count("graph_edges", graph.edges)
+            result["blast_radius"] = blast_radius(graph, result["impacted_services"], args.service, args.max_hops)
+
+    if args.command == "impact":
+        if args.transitive:
+            print(json.dumps({"impacted_services": result["impacted_services"],
+                              "blast_radius": result["blast_radius"]}, indent=2, default=json_default))
+            return
+        print(json.dumps(result["impacted_services"], indent=2, default=json_default))
+        return
+
+    if args.command == "all":
+        print(result["diff"])
+
+        print("\n🔎 Rule-based Impact Analysis:")
+        print(json.dumps(result["impacted_services"], indent=2, default=json_default))
+        if args.transitive:
+            print("\n🌐 Transitive Blast Radius:")
+            print(json.dumps(result["blast_radius"], indent=2))
+
+    write_llm_report(args, result, cache)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,105 @@
+from collections.abc import Mapping
+
+# Values of the enum-like fields. Records only ever hold these module-level
+# (interned) strings, so a million records share one copy of each.
+ENDPOINT_ADDED = "added"
+ENDPOINT_DELETED = "deleted"
+ENDPOINT_MODIFIED = "modified"
+
+CHANGE_PROPERTIES_ADDED = "properties_added"
+CHANGE_PROPERTIES_REMOVED = "properties_removed"
+CHANGE_SCHEMA_PROPERTIES_ADDED = "schema_properties_added"
+CHANGE_SCHEMA_PROPERTIES_REMOVED = "schema_properties_removed"
+CHANGE_REQUEST_PROPERTIES_ADDED = "request_properties_added"
+CHANGE_REQUEST_PROPERTIES_REMOVED = "request_properties_removed"
+CHANGE_RESPONSE_PROPERTIES_ADDED = "response_properties_added"
+CHANGE_RESPONSE_PROPERTIES_REMOVED = "response_properties_removed"
+CHANGE_PATH_VERSIONED = "path_versioned"
+CHANGE_PATH_REMOVED = "path_removed"
+
+IMPACT_BREAKING = "breaking"
+IMPACT_NON_BREAKING = "non-breaking"
+
+SEVERITY_CRITICAL = "critical"
+SEVERITY_HIGH = "high"
+SEVERITY_MEDIUM = "medium"
+SEVERITY_LOW = "low"
+
+
+class Record(Mapping):
+    """Read-only mapping over __slots__, standing in for the dicts the analysis used to build.
+
+    Keys are the slot names in declaration order, skipping slots that were
+    never set, so iterating (and serializing through json_default) gives the
+    same keys in the same order as the dict literal it replaces. Records are
+    shared between every result that refers to them, so never modify one.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        for name in self.__slots__:
+            if hasattr(self, name):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class EndpointChange(Record):
+    __slots__ = ("type", "path", "method", "request_changes", "response_changes")
+
+
+class ContentChange(Record):
+    # A request (no status) or response property change of one operation
+    __slots__ = ("type", "status", "properties")
+
+
+class PropertyChange(Record):
+    __slots__ = ("type", "schema", "properties")
+
+
+class ImpactDetail(Record):
+    __slots__ = ("impact_type", "change_type", "description", "before", "after", "candidates",
+                 "schema", "properties", "status", "severity")
+
+
+class AffectedEndpoint(Record):
+    __slots__ = ("path", "method", "spec_path")
+
+
+class ImpactedService(Record):
+    __slots__ = ("service", "affected_endpoint", "originatingEndpoints", "impact_details")
+
+
+def json_default(value):
+    """default= hook for json.dump(s) that writes records as the objects they replace"""
+    if isinstance(value, Record):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class PropertyTable:
+    """Hands out one shared tuple per distinct property list"""
+
+    def __init__(self):
+        self.tuples = {}
+
+    def shared(self, properties):
+        properties = tuple(properties)
+        return self.tuples.setdefault(properties, properties)
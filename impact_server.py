@@ -0,0 +1,210 @@
+import http.client
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from analysis_state import AnalysisState
+from impact_analysis import ChangeEvent, has_breaking_impact, run_analysis
+from impact_records import json_default
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# Analysis contexts (spec pair + dependency file) kept warm; the least recently queried is dropped first
+DEFAULT_MAX_CONTEXTS = 16
+
+
+def parse_address(address):
+    """("unix", socket path) for unix:/path, else ("tcp", (host, port)) for host:port"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+class AnalysisServer:
+    """The warm part of the daemon: one in-memory AnalysisState per analysis context.
+
+    A context is an (old spec, new spec, dependencies, service) combination,
+    typically one repository's CI job. Its state keeps the parsed specs with
+    their unit hashes and ref index, diff fragments, the dependency records
+    routed by (method, path) and per-operation impact entries. Inputs are
+    re-hashed on every query, so a file that changed on disk is reloaded and
+    only the parts of it that changed are re-analyzed; an unchanged one costs
+    a hash. Parsed documents are shared between contexts through
+    spec_loader's in-memory cache, and normalized paths through
+    normalize_path's.
+    """
+
+    def __init__(self, max_contexts=DEFAULT_MAX_CONTEXTS):
+        self.max_contexts = max_contexts
+        self.contexts = OrderedDict()
+        self.started = time.time()
+        self.queries = 0
+
+    def _state(self, key):
+        state = self.contexts.pop(key, None)
+        if state is None:
+            state = AnalysisState()
+        self.contexts[key] = state
+        while len(self.contexts) > self.max_contexts:
+            self.contexts.popitem(last=False)
+        return state
+
+    def analyze(self, query):
+        for field in ("old_spec", "new_spec", "dependencies"):
+            if not query.get(field):
+                raise ValueError(f"missing {field!r}")
+        if query.get("differ", "python") != "python":
+            raise ValueError("only the python differ is available in server mode")
+        old_spec, new_spec, dependencies = (os.path.abspath(query[field])
+                                            for field in ("old_spec", "new_spec", "dependencies"))
+        service = query.get("service")
+
+        state = self._state((old_spec, new_spec, dependencies, service))
+        state.stats = dict.fromkeys(state.stats, 0)
+        start = time.perf_counter()
+        # Streaming keeps a JSON dependency file from being parsed at all unless its digest changed
+        result = run_analysis(old_spec, new_spec, dependencies, stream_dependencies=True, service=service,
+                              state=state)
+        self.queries += 1
+        return {
+            "diff": result["diff"],
+            "events": [list(event) for event in result["events"]],
+            "api_changes": result["api_changes"],
+            "impacted_services": result["impacted_services"],
+            "breaking": has_breaking_impact(result["impacted_services"]),
+            "stats": dict(state.stats),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+    def health(self):
+        return {"status": "ok", "uptime_s": round(time.time() - self.started, 1),
+                "queries": self.queries, "contexts": len(self.contexts)}
+
+
+def make_handler(analysis_server):
+    class ImpactRequestHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, default=json_default).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/health":
+                self._reply(404, {"error": f"no such endpoint: {self.path}"})
+                return
+            self._reply(200, analysis_server.health())
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/analyze":
+                self._reply(404, {"error": f"no such endpoint: {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                query = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(query, dict):
+                    raise ValueError("expected a JSON object")
+                self._reply(200, analysis_server.analyze(query))
+            except (ValueError, OSError) as e:
+                self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+            except Exception as e:
+                self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ImpactRequestHandler
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    # BaseHTTPRequestHandler only needs these two from HTTPServer
+    server_name = "localhost"
+    server_port = 0
+
+
+def make_server(address, max_contexts=DEFAULT_MAX_CONTEXTS):
+    """HTTP server answering /analyze and /health on host:port or unix:/path.
+
+    Requests are handled one at a time: they share the warm state, and each
+    one is short once the state is warm.
+    """
+    handler = make_handler(AnalysisServer(max_contexts))
+    kind, target = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(target):
+            # Left behind by a server that didn't shut down cleanly
+            os.remove(target)
+        return UnixHTTPServer(target, handler)
+    return HTTPServer(target, handler)
+
+
+def serve(address=DEFAULT_ADDRESS, max_contexts=DEFAULT_MAX_CONTEXTS):
+    server = make_server(address, max_contexts)
+    kind, target = parse_address(address)
+    where = f"unix:{target}" if kind == "unix" else f"http://{target[0]}:{server.server_address[1]}"
+    print(f"Impact analysis server listening on {where}", flush=True)
+    # Stop cleanly (and remove the socket file) when a service manager sends SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if kind == "unix" and os.path.exists(target):
+            os.remove(target)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def query_server(address, query, timeout=300.0):
+    """POST query to a running server's /analyze and return its JSON answer"""
+    kind, target = parse_address(address)
+    if kind == "unix":
+        connection = _UnixHTTPConnection(target, timeout)
+    else:
+        connection = http.client.HTTPConnection(*target, timeout=timeout)
+    try:
+        connection.request("POST", "/analyze", json.dumps(query).encode(), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        answer = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"impact server error ({response.status}): {answer.get('error')}")
+    return answer
+
+
+def remote_analysis(address, old_spec_path, new_spec_path, dependencies_path, service=None, differ="python"):
+    """run_analysis() answered by a server, in the shape a cache hit has"""
+    answer = query_server(address, {
+        "old_spec": os.path.abspath(old_spec_path),
+        "new_spec": os.path.abspath(new_spec_path),
+        "dependencies": os.path.abspath(dependencies_path),
+        "service": service,
+        "differ": differ
+    })
+    answer["events"] = [ChangeEvent(*row) for row in answer["events"]]
+    return answer
+
+
+if __name__ == "__main__":
+    # Usage: python impact_server.py [host:port | unix:/path/to.sock]
+    serve(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_ADDRESS)
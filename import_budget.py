@@ -0,0 +1,65 @@
+import argparse
+import subprocess
+import sys
+
+# Modules the rule-based subcommands must not pull in at import time
+FORBIDDEN_MODULES = ("openai", "deepdiff", "httpx")
+
+DEFAULT_MODULES = ("impact_analysis",)
+DEFAULT_BUDGET_MS = 150
+
+
+def measure_import_ms(module, runs=5):
+    """Best-of-N cumulative import time of module in a fresh interpreter, in milliseconds"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                cumulative_ms = int(parts[1]) / 1000.0
+                best = cumulative_ms if best is None else min(best, cumulative_ms)
+    return best
+
+
+def forbidden_imports(module):
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {FORBIDDEN_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if the CLI modules import too slowly or eagerly load heavy dependencies")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Maximum cumulative import time per module (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--runs", type=int, default=5, help="Take the best of this many fresh imports (default: 5)")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for module in args.modules:
+        elapsed = measure_import_ms(module, args.runs)
+        loaded = forbidden_imports(module)
+        if elapsed is None:
+            failures.append(f"{module} did not show up in -X importtime output")
+            continue
+        print(f"{module}: {elapsed:.1f} ms (budget {args.budget_ms:g} ms)")
+        if elapsed > args.budget_ms:
+            failures.append(f"{module} took {elapsed:.1f} ms to import")
+        if loaded:
+            failures.append(f"{module} eagerly imports {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
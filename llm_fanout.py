@@ -0,0 +1,151 @@
+import asyncio
+import random
+import sys
+import time
+
+from analysis_cache import llm_request_key
+from prompt_builder import DEFAULT_TOKEN_BUDGET, build_compact_mcp_requests, request_tokens
+from tracing import count
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second refill, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        # A request bigger than the bucket would never fit; let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def group_by_service(impacted_services):
+    grouped = {}
+    for service in impacted_services:
+        grouped.setdefault(service["service"], []).append(service)
+    return grouped
+
+
+def is_retryable(error):
+    """Timeouts, rate limiting (429) and server errors (5xx) may pass on a retry; anything else won't"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # openai.APIStatusError and friends carry the HTTP status
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    # Only an SDK client raises the SDK's errors, so there is nothing to check if it isn't loaded
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APITimeoutError)
+
+
+async def complete_with_retries(client, request, semaphore, request_bucket=None, token_bucket=None,
+                                timeout=120.0, max_retries=4, base_delay=1.0):
+    """Send one chat request under the concurrency and rate limits, retrying transient errors with backoff"""
+    last_error = None
+    for attempt in range(max_retries + 1):
+        if request_bucket is not None:
+            await request_bucket.acquire()
+        if token_bucket is not None:
+            await token_bucket.acquire(request_tokens(request))
+        try:
+            async with semaphore:
+                response = await asyncio.wait_for(client.chat.completions.create(**request), timeout)
+            return response.choices[0].message.content
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            last_error = e
+            if attempt == max_retries:
+                break
+            # Full jitter keeps retried requests from lining up behind each other
+            await asyncio.sleep(base_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+    raise last_error
+
+
+async def analyze_services_concurrently(events, impacted_services, client, cache=None, concurrency=4,
+                                        requests_per_minute=60, tokens_per_minute=None, timeout=120.0,
+                                        max_retries=4, base_delay=1.0, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Map step: one LLM analysis per impacted service, run concurrently.
+
+    Returns {service name: analysis text or None} in the order services first
+    appear in impacted_services, plus {service name: error message} for the
+    ones that failed after all retries.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    request_bucket = TokenBucket(requests_per_minute / 60.0, capacity=concurrency) if requests_per_minute else None
+    token_bucket = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute) if tokens_per_minute else None
+
+    async def analyze(service_impacts):
+        # The service's own events only; the rest of the diff is every other request's business
+        requests = build_compact_mcp_requests(events, service_impacts, token_budget, include_unclaimed=False)
+        answers = []
+        for request in requests:
+            key = llm_request_key(request, client) if cache is not None else None
+            entry = cache.get(key) if cache is not None else None
+            if entry is not None:
+                count("llm_cache_hits")
+                answers.append(entry["content"])
+                continue
+            count("llm_requests")
+            count("prompt_tokens", request_tokens(request))
+            content = await complete_with_retries(client, request, semaphore, request_bucket, token_bucket,
+                                                  timeout, max_retries, base_delay)
+            if cache is not None and content is not None:
+                cache.put(key, {"content": content})
+            answers.append(content)
+        return "\n\n".join(answer for answer in answers if answer)
+
+    grouped = group_by_service(impacted_services)
+    outcomes = await asyncio.gather(*(analyze(impacts) for impacts in grouped.values()), return_exceptions=True)
+
+    analyses = {}
+    errors = {}
+    for name, outcome in zip(grouped, outcomes):
+        if isinstance(outcome, BaseException):
+            analyses[name] = None
+            errors[name] = f"{type(outcome).__name__}: {outcome}"
+        else:
+            analyses[name] = outcome
+    return analyses, errors
+
+
+def merge_service_analyses(analyses, errors, impacted_services):
+    """Reduce step: one report with a section per service, failures called out instead of dropped"""
+    grouped = group_by_service(impacted_services)
+    lines = ["## API Impact Analysis", ""]
+    for name, analysis in analyses.items():
+        endpoints = sorted({f"{s['affected_endpoint']['method']} {s['affected_endpoint']['path']}" for s in grouped[name]})
+        lines.append(f"### **{name}**")
+        lines.append("")
+        lines.append("Affected calls: " + ", ".join(f"`{endpoint}`" for endpoint in endpoints))
+        lines.append("")
+        if analysis is None:
+            lines.append(f"_LLM analysis unavailable ({errors.get(name, 'no response')})._")
+        else:
+            lines.append(analysis.strip())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def run_fanout(events, impacted_services, client, **options):
+    """Analyze each impacted service concurrently and merge the answers into one report"""
+    analyses, errors = asyncio.run(analyze_services_concurrently(events, impacted_services, client, **options))
+    for name, error in errors.items():
+        print(f"Error analyzing {name} with OpenAI API: {error}")
+    if not analyses:
+        return None
+    return merge_service_analyses(analyses, errors, impacted_services)
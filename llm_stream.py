@@ -0,0 +1,126 @@
+import sys
+import time
+
+from analysis_cache import llm_request_key
+from prompt_builder import estimate_tokens, request_tokens
+
+
+class _Tee:
+    # Writes every piece to stdout and the report as soon as it arrives
+    def __init__(self, report, out):
+        self.report = report
+        self.out = out
+
+    def write(self, text):
+        self.out.write(text)
+        self.out.flush()
+        self.report.write(text)
+        self.report.flush()
+
+
+def stream_request(request, tee, llm_client, timeout=120.0, cache=None):
+    """Stream one chat completion through tee, returning (text, metrics).
+
+    Metrics cover time to first token, total latency and prompt/completion
+    token counts (from the API's usage block when it sends one, estimated
+    otherwise). A timeout or API error ends the stream early; whatever was
+    already written stays in the report and the error is recorded.
+    """
+    metrics = {
+        "time_to_first_token": None,
+        "total_latency": None,
+        "prompt_tokens": request_tokens(request),
+        "completion_tokens": 0,
+        "cached": False,
+        "completed": False,
+        "error": None
+    }
+    start = time.monotonic()
+
+    key = llm_request_key(request, llm_client) if cache is not None else None
+    entry = cache.get(key) if cache is not None else None
+    if entry is not None:
+        tee.write(entry["content"])
+        elapsed = time.monotonic() - start
+        metrics.update(time_to_first_token=elapsed, total_latency=elapsed, cached=True, completed=True,
+                       completion_tokens=estimate_tokens(entry["content"]))
+        return entry["content"], metrics
+
+    pieces = []
+    usage = None
+    deadline = start + timeout
+    try:
+        streamed = dict(request, stream=True)
+        if getattr(llm_client, "base_url", None) is not None:
+            # The OpenAI SDK only sends a usage block when asked for one
+            streamed["stream_options"] = {"include_usage": True}
+        # timeout bounds each wait on the connection; the deadline below bounds the whole stream
+        stream = llm_client.chat.completions.create(**streamed, timeout=timeout)
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if metrics["time_to_first_token"] is None:
+                    metrics["time_to_first_token"] = time.monotonic() - start
+                pieces.append(delta)
+                tee.write(delta)
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"LLM stream exceeded {timeout:g}s")
+        metrics["completed"] = True
+    except Exception as e:
+        metrics["error"] = f"{type(e).__name__}: {e}"
+        tee.write(f"\n\n_Analysis truncated: {metrics['error']}_\n")
+
+    text = "".join(pieces)
+    metrics["total_latency"] = time.monotonic() - start
+    if usage is not None and getattr(usage, "completion_tokens", None):
+        metrics["completion_tokens"] = usage.completion_tokens
+        if getattr(usage, "prompt_tokens", None):
+            metrics["prompt_tokens"] = usage.prompt_tokens
+    else:
+        metrics["completion_tokens"] = estimate_tokens(text) if text else 0
+
+    if cache is not None and metrics["completed"] and text:
+        cache.put(key, {"content": text})
+    return text, metrics
+
+
+def stream_requests(requests, report_path, llm_client, timeout=120.0, cache=None, out=None, fallback=None):
+    """Stream one or more chat requests into report_path (and stdout) as tokens arrive.
+
+    Multi-part prompts get a "### Part i of n" heading per part. Returns the
+    full text and a metrics dict with per-part entries and totals. If a part
+    fails before its first token, fallback (e.g. the rule-based findings) is
+    appended once at the end, so the report never comes out empty.
+    """
+    out = out or sys.stdout
+    parts = []
+    texts = []
+    start = time.monotonic()
+    with open(report_path, "w") as report:
+        tee = _Tee(report, out)
+        for number, request in enumerate(requests, start=1):
+            if len(requests) > 1:
+                heading = ("\n\n" if number > 1 else "") + f"### Part {number} of {len(requests)}\n\n"
+                tee.write(heading)
+                texts.append(heading)
+            text, metrics = stream_request(request, tee, llm_client, timeout, cache)
+            texts.append(text)
+            parts.append(metrics)
+        if fallback and any(m["error"] and m["time_to_first_token"] is None for m in parts):
+            note = "\n\nLLM analysis did not complete; the rule-based findings follow.\n\n" + fallback
+            tee.write(note)
+            texts.append(note)
+        tee.write("\n")
+
+    first_tokens = [m["time_to_first_token"] for m in parts if m["time_to_first_token"] is not None]
+    summary = {
+        "time_to_first_token": first_tokens[0] if first_tokens else None,
+        "total_latency": time.monotonic() - start,
+        "prompt_tokens": sum(m["prompt_tokens"] for m in parts),
+        "completion_tokens": sum(m["completion_tokens"] for m in parts),
+        "completed": all(m["completed"] for m in parts),
+        "parts": parts
+    }
+    return "".join(texts), summary
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+
+def _stream_pieces(content):
+    # Word-sized deltas, whitespace kept, so joined deltas reproduce the content exactly
+    return re.findall(r"\S+\s*|\s+", content)
+
+
+def _stream_chunk(delta, usage=None):
+    choices = [SimpleNamespace(index=0, delta=SimpleNamespace(content=delta))] if delta is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def _default_response(request):
+    digest = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    return (f"Stub analysis for {request.get('model')} "
+            f"({len(request.get('messages', []))} messages, request {digest})")
+
+
+class StubAPIError(Exception):
+    """An HTTP error from the API, carrying status_code like openai.APIStatusError does"""
+
+    def __init__(self, status_code, message="stub failure"):
+        super().__init__(f"{message} (HTTP {status_code})")
+        self.status_code = status_code
+
+
+class StubChatCompletions:
+    def __init__(self, responder=None):
+        self.responder = responder or _default_response
+        self.calls = []
+
+    def create(self, **request):
+        self.calls.append(request)
+        content = self.responder(request)
+        if request.get("stream"):
+            return self._stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def _stream(self, content):
+        pieces = _stream_pieces(content)
+        for piece in pieces:
+            yield _stream_chunk(piece)
+        yield _stream_chunk(None, SimpleNamespace(prompt_tokens=0, completion_tokens=len(pieces)))
+
+
+class StubOpenAIClient:
+    """Offline stand-in for openai.OpenAI covering client.chat.completions.create.
+
+    Returns a deterministic answer derived from the request (or whatever
+    responder(request) returns) and records every request in
+    client.chat.completions.calls.
+    """
+
+    def __init__(self, responder=None):
+        self.chat = SimpleNamespace(completions=StubChatCompletions(responder))
+
+
+class AsyncStubChatCompletions(StubChatCompletions):
+    def __init__(self, responder=None, delay=0.0, failures=0, failure_status=503):
+        super().__init__(responder)
+        self.delay = delay
+        self.failures = failures
+        self.failure_status = failure_status
+
+    async def create(self, **request):
+        self.calls.append(request)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures > 0:
+            self.failures -= 1
+            raise StubAPIError(self.failure_status)
+        content = self.responder(request)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class AsyncStubOpenAIClient:
+    """Offline stand-in for openai.AsyncOpenAI.
+
+    delay simulates per-request latency and the first `failures` calls raise
+    an HTTP failure_status error, which is enough to exercise concurrency
+    limits and retries.
+    """
+
+    def __init__(self, responder=None, delay=0.0, failures=0, failure_status=503):
+        self.chat = SimpleNamespace(completions=AsyncStubChatCompletions(responder, delay, failures, failure_status))
+
+
+def make_fake_openai_handler(responder=None, delay=0.0):
+    responder = responder or _default_response
+
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                self._respond()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on the request, e.g. it timed out
+                pass
+
+        def _respond(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if delay and not request.get("stream"):
+                time.sleep(delay)
+            content = responder(request)
+            if request.get("stream"):
+                self._stream(request, content)
+                return
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, request, content):
+            # Server-sent events in the shape of OpenAI's streaming chat completions
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            pieces = _stream_pieces(content)
+            for piece in pieces:
+                event = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                if delay:
+                    time.sleep(delay / max(len(pieces), 1))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                # Like the API: one last chunk without choices, carrying the usage block
+                prompt_tokens = sum(len(str(message.get("content", "")).split())
+                                    for message in request.get("messages", []))
+                event = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                              "total_tokens": prompt_tokens + len(pieces)}
+                }
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOpenAIHandler
+
+
+def serve_fake_openai(host="127.0.0.1", port=0, responder=None, delay=0.0):
+    """Start a local server answering /v1/chat/completions in a background thread.
+
+    Point a real client at it with base_url=f"http://{host}:{server.server_port}/v1".
+    Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer((host, port), make_fake_openai_handler(responder, delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Usage: python llm_stub.py [port]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    httpd = ThreadingHTTPServer(("127.0.0.1", port), make_fake_openai_handler())
+    print(f"Fake OpenAI API listening on http://127.0.0.1:{port}/v1")
+    httpd.serve_forever()
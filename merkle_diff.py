@@ -0,0 +1,161 @@
+import difflib
+import hashlib
+import json
+import sys
+from collections import namedtuple
+from itertools import zip_longest
+
+DIGEST_SIZE = 16
+
+# kind is one of DeepDiff's report categories (values_changed, dictionary_item_added, ...);
+# location is the tuple of keys / list indexes from the document root
+TreeChange = namedtuple("TreeChange", ["kind", "location", "old_value", "new_value"])
+
+
+def _scalar_token(value):
+    # The type name keeps 1, 1.0, True and "1" apart, like DeepDiff's type_changes does
+    return f"{type(value).__name__}:{value!r}".encode()
+
+
+def _token(node, hashes):
+    if isinstance(node, (dict, list)):
+        return b"#" + hashes[id(node)]
+    return _scalar_token(node)
+
+
+def _hash_node(node, hashes):
+    digest = hashes.get(id(node))
+    if digest is not None:
+        return digest
+
+    # Scalar tokens are reprs, which never contain raw control characters, and
+    # container tokens are a fixed-length digest, so joining on \x00 / \x01 is unambiguous
+    if isinstance(node, dict):
+        entries = []
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                value_token = b"#" + _hash_node(value, hashes)
+            else:
+                value_token = _scalar_token(value)
+            entries.append(_scalar_token(key) + b"\x00" + value_token)
+        # Mappings are unordered, so entries are hashed in a canonical order
+        entries.sort()
+        data = b"{" + b"\x01".join(entries)
+    else:
+        data = b"[" + b"\x01".join(b"#" + _hash_node(item, hashes) if isinstance(item, (dict, list))
+                                    else _scalar_token(item) for item in node)
+
+    digest = hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+    hashes[id(node)] = digest
+    return digest
+
+
+def subtree_hashes(tree, hashes=None):
+    """Hash every dict and list in tree bottom-up, returning {id(node): digest}.
+
+    Two subtrees with the same digest are equal, so a diff can skip them
+    without looking inside. Node ids are only meaningful while tree is alive.
+    """
+    hashes = {} if hashes is None else hashes
+    if isinstance(tree, (dict, list)):
+        _hash_node(tree, hashes)
+    return hashes
+
+
+def _diff_lists(old, new, location, old_hashes, new_hashes, changes):
+    # Align the items by content hash the way DeepDiff aligns them with difflib, then
+    # only descend into the replaced stretches
+    old_tokens = [_token(item, old_hashes) for item in old]
+    new_tokens = [_token(item, new_hashes) for item in new]
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        pairs = zip_longest(range(i1, i2), range(j1, j2))
+        for i, j in pairs:
+            if j is None:
+                changes.append(TreeChange("iterable_item_removed", location + (i,), old[i], None))
+            elif i is None:
+                changes.append(TreeChange("iterable_item_added", location + (j,), None, new[j]))
+            else:
+                _diff_nodes(old[i], new[j], location + (i,), old_hashes, new_hashes, changes)
+
+
+def _diff_nodes(old, new, location, old_hashes, new_hashes, changes):
+    if type(old) is not type(new):
+        changes.append(TreeChange("type_changes", location, old, new))
+        return
+
+    if isinstance(old, dict):
+        if old_hashes[id(old)] == new_hashes[id(new)]:
+            return
+        for key, value in old.items():
+            if key not in new:
+                changes.append(TreeChange("dictionary_item_removed", location + (key,), value, None))
+        for key, value in new.items():
+            if key not in old:
+                changes.append(TreeChange("dictionary_item_added", location + (key,), None, value))
+            else:
+                _diff_nodes(old[key], value, location + (key,), old_hashes, new_hashes, changes)
+    elif isinstance(old, list):
+        if old_hashes[id(old)] == new_hashes[id(new)]:
+            return
+        _diff_lists(old, new, location, old_hashes, new_hashes, changes)
+    elif old != new:
+        changes.append(TreeChange("values_changed", location, old, new))
+
+
+def tree_changes(old, new, old_hashes=None, new_hashes=None):
+    """Structural diff of two parsed documents as a list of TreeChange records.
+
+    Each record's location is the tuple of keys and list indexes leading to
+    it from the document root. Subtrees whose hashes match are skipped, so
+    past the hashing pass the work grows with the size of the change rather
+    than the size of the documents. Precomputed subtree_hashes() results can
+    be passed in to skip that pass too.
+    """
+    old_hashes = subtree_hashes(old, old_hashes)
+    new_hashes = subtree_hashes(new, new_hashes)
+    changes = []
+    _diff_nodes(old, new, (), old_hashes, new_hashes, changes)
+    return changes
+
+
+def format_location(location):
+    return "root" + "".join(f"[{part!r}]" for part in location)
+
+
+def group_changes(changes):
+    """DeepDiff verbose_level=2 view of tree_changes() records, keyed by root[...] path strings"""
+    result = {}
+    for change in changes:
+        if change.kind == "values_changed":
+            value = {"new_value": change.new_value, "old_value": change.old_value}
+        elif change.kind == "type_changes":
+            value = {"old_type": type(change.old_value), "new_type": type(change.new_value),
+                     "old_value": change.old_value, "new_value": change.new_value}
+        elif change.kind.endswith("_added"):
+            value = change.new_value
+        else:
+            value = change.old_value
+        result.setdefault(change.kind, {})[format_location(change.location)] = value
+    return result
+
+
+def diff_trees(old, new, old_hashes=None, new_hashes=None):
+    """Structural diff of two parsed documents in DeepDiff's verbose_level=2 shape.
+
+    Returns a dict with any of dictionary_item_added/removed,
+    iterable_item_added/removed, values_changed and type_changes, keyed by
+    paths like root['paths']['/users']['get'].
+    """
+    return group_changes(tree_changes(old, new, old_hashes, new_hashes))
+
+
+if __name__ == "__main__":
+    # Usage: python merkle_diff.py <old.json> <new.json>
+    with open(sys.argv[1], 'r') as f:
+        old_document = json.load(f)
+    with open(sys.argv[2], 'r') as f:
+        new_document = json.load(f)
+    print(diff_trees(old_document, new_document))
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from dependency_index import DependencyIndex, build_index, is_dependency_index
+from impact_analysis import (
+    analyze_impact_indexed, analyze_oasdiff_changes, collect_change_events, has_breaking_impact, load_yaml
+)
+from impact_records import IMPACT_BREAKING, json_default
+from path_router import PathRouter
+from ref_index import build_ref_index
+from spec_diff import diff_specs
+from spec_loader import load_document
+from tracing import count, span
+
+DEFAULT_INDEX_DIR = ".impact-indexes"
+
+
+def load_manifest(path):
+    """Providers and consumer dependency files listed in a JSON or YAML manifest.
+
+    providers:
+      - service: userdataapi          # externalCall.service the consumers use
+        old_spec: specs/userdata/base.yaml
+        new_spec: specs/userdata/openapi.yaml
+    consumers:
+      - api-dependencies/shopper-api-dependencies.json
+
+    Relative paths are taken from the manifest's directory.
+    """
+    _, manifest = load_document(path)
+    if not isinstance(manifest, dict):
+        raise ValueError(f"{path}: expected a mapping with providers and consumers")
+    base = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value):
+        return os.path.normpath(os.path.join(base, value))
+
+    providers = []
+    for i, provider in enumerate(manifest.get("providers") or ()):
+        missing = [field for field in ("service", "old_spec", "new_spec") if not provider.get(field)]
+        if missing:
+            raise ValueError(f"{path}: provider {i} is missing {', '.join(missing)}")
+        providers.append({"service": provider["service"], "old_spec": resolve(provider["old_spec"]),
+                          "new_spec": resolve(provider["new_spec"])})
+    consumers = list(dict.fromkeys(resolve(consumer) for consumer in manifest.get("consumers") or ()))
+    if not providers or not consumers:
+        raise ValueError(f"{path}: needs at least one provider and one consumer")
+    return providers, consumers
+
+
+def index_path(index_dir, consumer):
+    # One index per consumer file, named after it; build_index() skips rebuilding an up-to-date one
+    name = os.path.splitext(os.path.basename(consumer))[0]
+    digest = hashlib.sha256(os.path.abspath(consumer).encode()).hexdigest()[:12]
+    return os.path.join(index_dir, f"{name}-{digest}.sqlite")
+
+
+def _prepare_consumer(task):
+    consumer, output = task
+    if is_dependency_index(consumer):
+        return consumer
+    build_index([consumer], output)
+    return output
+
+
+def _prepare_provider(provider):
+    """Diff one provider's specs; (api_changes, router, ref_index) is what matching needs from them"""
+    old_spec = load_yaml(provider["old_spec"])
+    new_spec = load_yaml(provider["new_spec"])
+    diff = diff_specs(old_spec, new_spec)
+    api_changes = analyze_oasdiff_changes(diff, collect_change_events(diff))
+    return api_changes, PathRouter.from_spec(old_spec), build_ref_index(old_spec)
+
+
+def _prepare(task):
+    kind, value = task
+    return _prepare_consumer(value) if kind == "consumer" else _prepare_provider(value)
+
+
+_worker = {}
+
+
+def _init_worker(providers):
+    _worker["providers"] = providers
+    _worker["indexes"] = {}
+
+
+def _match(task):
+    service, index = task
+    api_changes, router, ref_index = _worker["providers"][service]
+    dependency_index = _worker["indexes"].get(index)
+    if dependency_index is None:
+        # Opened once per worker and kept; the index file is read-only and memory-mapped
+        dependency_index = _worker["indexes"][index] = DependencyIndex(index)
+    return analyze_impact_indexed(api_changes, dependency_index, router, ref_index, service=service)
+
+
+def _map(fn, tasks, jobs, initializer=None, initargs=()):
+    if jobs == 1 or len(tasks) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return list(map(fn, tasks))
+    with ProcessPoolExecutor(min(jobs, len(tasks)), initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(fn, tasks))
+
+
+def analyze_organization(providers, consumers, index_dir=DEFAULT_INDEX_DIR, jobs=None, transitive=False,
+                         max_hops=None):
+    """Impact of every provider's spec change on every consumer dependency file, as one report.
+
+    Runs in two process-pool passes: consumer files are compiled into
+    dependency indexes and provider spec pairs are diffed (in parallel with
+    each other), then every (provider, consumer) pair with changes to check
+    is matched. The matching workers receive the diffed providers once, when
+    they start, and open each index they are handed a single time; the
+    indexes are read-only SQLite files, so the workers share them through
+    the page cache instead of each holding its own copy of the dependencies.
+    With transitive, every provider's breaking changes are also followed
+    through one call graph built from all the consumer files.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    services = [provider["service"] for provider in providers]
+    if len(set(services)) != len(services):
+        raise ValueError("each provider service can only be listed once")
+    os.makedirs(index_dir, exist_ok=True)
+
+    with span("prepare", providers=len(providers), consumers=len(consumers)):
+        tasks = [("consumer", (consumer, index_path(index_dir, consumer))) for consumer in consumers]
+        tasks += [("provider", provider) for provider in providers]
+        prepared = _map(_prepare, tasks, jobs)
+    indexes = prepared[:len(consumers)]
+    analyses = dict(zip(services, prepared[len(consumers):]))
+
+    # A provider whose spec didn't change can't impact anyone
+    changed = [service for service in services
+               if analyses[service][0]["endpoint_changes"] or analyses[service][0].get("property_changes")]
+    pairs = [(service, index) for service in changed for index in indexes]
+    count("provider_consumer_pairs", len(pairs))
+    with span("match", pairs=len(pairs)):
+        results = _map(_match, pairs, jobs, _init_worker, ({service: analyses[service] for service in changed},))
+
+    report = merge_report(providers, consumers, indexes, analyses, dict(zip(pairs, results)))
+    if transitive:
+        from blast_radius import blast_radius, load_graph
+
+        with span("blast_radius"):
+            graph = load_graph(indexes)
+            count("graph_edges", graph.edges)
+            for entry in report["providers"]:
+                impacted = [impact for impact in report["impacts"] if impact["provider"] == entry["service"]]
+                entry["blast_radius"] = blast_radius(graph, impacted, entry["service"], max_hops)
+    return report
+
+
+def merge_report(providers, consumers, indexes, analyses, results):
+    """One organization-wide report from the per-(provider service, consumer index) impacted services"""
+    consumer_of_index = dict(zip(indexes, consumers))
+    provider_entries = []
+    impacts = []
+    consumer_services = {}
+    results_by_provider = {}
+    for (service, index), impacted_services in results.items():
+        results_by_provider.setdefault(service, []).append((index, impacted_services))
+    for provider in providers:
+        service = provider["service"]
+        api_changes = analyses[service][0]
+        impacted_consumers = set()
+        breaking = False
+        for index, impacted_services in results_by_provider.get(service, ()):
+            for impacted in impacted_services:
+                is_breaking = any(detail["impact_type"] == IMPACT_BREAKING for detail in impacted["impact_details"])
+                breaking = breaking or is_breaking
+                impacted_consumers.add(impacted["service"])
+                impacts.append({"provider": service, "dependencies": consumer_of_index[index], **impacted})
+
+                entry = consumer_services.setdefault(impacted["service"], {"providers": set(), "calls": 0,
+                                                                          "breaking_calls": 0})
+                entry["providers"].add(service)
+                entry["calls"] += 1
+                entry["breaking_calls"] += is_breaking
+        provider_entries.append({
+            "service": service,
+            "old_spec": provider["old_spec"],
+            "new_spec": provider["new_spec"],
+            "endpoint_changes": len(api_changes["endpoint_changes"]),
+            "schema_changes": len(api_changes.get("property_changes", [])),
+            "impacted_services": sorted(impacted_consumers),
+            "breaking": breaking
+        })
+
+    return {
+        "summary": {
+            "providers": len(providers),
+            "providers_changed": sum(1 for entry in provider_entries
+                                     if entry["endpoint_changes"] or entry["schema_changes"]),
+            "providers_breaking": sum(1 for entry in provider_entries if entry["breaking"]),
+            "dependency_files": len(consumers),
+            "impacted_services": len(consumer_services),
+            "impacted_calls": len(impacts),
+            "breaking": has_breaking_impact(impacts)
+        },
+        "providers": provider_entries,
+        "consumers": {
+            name: {"providers": sorted(entry["providers"]), "calls": entry["calls"],
+                   "breaking_calls": entry["breaking_calls"]}
+            for name, entry in sorted(consumer_services.items())
+        },
+        "impacts": impacts
+    }
+
+
+def run_org_impact(args):
+    # args: the `org-impact` subcommand of impact_analysis.py
+    providers, consumers = load_manifest(args.manifest)
+    report = analyze_organization(providers, consumers, args.index_dir, args.jobs, args.transitive, args.max_hops)
+    text = json.dumps(report, indent=2, default=json_default)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        summary = report["summary"]
+        print(f"{summary['providers_changed']} of {summary['providers']} providers changed, "
+              f"{summary['providers_breaking']} breaking; {summary['impacted_services']} services impacted "
+              f"({summary['impacted_calls']} calls); report written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    # Usage: python org_impact.py <manifest.yaml>
+    from impact_analysis import main
+
+    sys.exit(main(["org-impact"] + sys.argv[1:]))
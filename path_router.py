@@ -0,0 +1,125 @@
+import json
+import sys
+from collections import OrderedDict
+
+from spec_diff import HTTP_METHODS
+
+
+class _Node:
+    __slots__ = ("static", "param", "template", "methods")
+
+    def __init__(self):
+        self.static = {}
+        self.param = None
+        self.template = None
+        self.methods = ()
+
+
+# Call paths carry concrete ids (/users/123, /users/124, ...), so remember only the most recent ones
+DEFAULT_CACHE_SIZE = 65536
+
+
+def _is_param(segment):
+    return "{" in segment and "}" in segment
+
+
+def split_path(path):
+    # Query strings and trailing slashes are not part of the template
+    path = path.split("?", 1)[0].strip("/")
+    return path.split("/") if path else []
+
+
+class PathRouter:
+    """Segment-level radix tree over a spec's path templates.
+
+    Literal segments are matched exactly and every {param} segment shares a
+    single wildcard edge, so /users/123, /users/{userId} and /users/{id} all
+    resolve to the /users/{id} template. Lookup cost depends on the number of
+    segments in the path, not on how many paths the spec has.
+    """
+
+    def __init__(self, paths=(), cache_size=DEFAULT_CACHE_SIZE):
+        self._root = _Node()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        for template in paths:
+            self.add(template, paths[template] if isinstance(paths, dict) else None)
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls((spec or {}).get("paths", {}) or {})
+
+    def add(self, template, path_item=None):
+        node = self._root
+        for segment in split_path(template):
+            if _is_param(segment):
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                node = node.static.setdefault(segment, _Node())
+        node.template = template
+        if isinstance(path_item, dict):
+            node.methods = tuple(m.upper() for m in HTTP_METHODS if m in path_item)
+        self._cache.clear()
+
+    def _match(self, node, segments, index):
+        if index == len(segments):
+            return node if node.template is not None else None
+        segment = segments[index]
+        # Literal edges win over the wildcard; fall back to it if the literal branch dead-ends
+        if not _is_param(segment):
+            child = node.static.get(segment)
+            if child is not None:
+                found = self._match(child, segments, index + 1)
+                if found is not None:
+                    return found
+        if node.param is not None:
+            return self._match(node.param, segments, index + 1)
+        return None
+
+    def resolve(self, path, method=None):
+        """Return the spec template a recorded call path maps to, or None.
+
+        When a method is given, templates that don't declare that operation
+        are treated as no match.
+        """
+        if not isinstance(path, str):
+            return None
+        try:
+            node = self._cache[path]
+            self._cache.move_to_end(path)
+        except KeyError:
+            node = self._match(self._root, split_path(path), 0)
+            self._cache[path] = node
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        if node is None:
+            return None
+        if method and node.methods and method.upper() not in node.methods:
+            return None
+        return node.template
+
+    def resolve_many(self, calls):
+        """Resolve (method, path) pairs in bulk, returning templates in input order"""
+        return [self.resolve(path, method) for method, path in calls]
+
+    def resolve_dependencies(self, dependencies):
+        calls = []
+        for dependency in dependencies:
+            external_call = dependency.get("externalCall", {})
+            calls.append((external_call.get("method"), external_call.get("path")))
+        return self.resolve_many(calls)
+
+
+if __name__ == "__main__":
+    import yaml
+
+    # Usage: python path_router.py <spec> <dependencies.json>
+    with open(sys.argv[1], 'r') as f:
+        router = PathRouter.from_spec(yaml.safe_load(f))
+    with open(sys.argv[2], 'r') as f:
+        dependencies = json.load(f)
+    for dependency, template in zip(dependencies, router.resolve_dependencies(dependencies)):
+        external_call = dependency.get("externalCall", {})
+        print(f"{external_call.get('method')} {external_call.get('path')} -> {template}")
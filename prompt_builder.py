@@ -0,0 +1,250 @@
+import json
+
+DEFAULT_TOKEN_BUDGET = 6000
+DEFAULT_MODEL = "gpt-4"
+
+SYSTEM_MESSAGE = "You are an expert API architect specializing in API versioning, compatibility, and change management."
+
+ENCODING_NOTE = """
+The payload below is compact JSON. Every integer inside "changes" and "impacts" that stands
+for a path, schema, property or trace frame is an index into "strings".
+"changes" rows are [kind, path, method, location, status, schema, properties].
+"impacts" entries list a dependent service, the call it makes, where that call originates
+("origins": [api, path, internal trace]) and the rule-based findings for it.
+"""
+
+INSTRUCTIONS = """
+In your analysis:
+1. Identify all breaking and non-breaking changes.
+2. For each impacted service, highlight the affected internal code paths using the internal trace information
+3. Provide specific recommendations for updating each affected component
+4. Prioritize changes based on severity
+
+Format your response with clear sections:
+- Summary of API Changes. First show them in a list, then explain them
+- Impacted Services and Code Paths. Highlight serviceName in BOLD at top. Then first show its impacted areas in a list, then explain them
+- Required Updates (with code examples)
+- Recommended Testing Strategy
+"""
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Count tokens with tiktoken when it is installed, otherwise assume ~4 characters per token"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def request_tokens(request):
+    """Estimated prompt tokens of a chat request, whether message content is a string or a list of parts"""
+    return sum(estimate_tokens(part["text"]) if isinstance(part, dict) else estimate_tokens(str(part))
+               for message in request["messages"]
+               for part in (message["content"] if isinstance(message["content"], list) else [message["content"]]))
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def ref(self, value):
+        if value is None:
+            return None
+        position = self.index.get(value)
+        if position is None:
+            position = len(self.strings)
+            self.index[value] = position
+            self.strings.append(value)
+        return position
+
+    def refs(self, values):
+        return [self.ref(value) for value in values or []]
+
+    def mark(self):
+        return len(self.strings)
+
+    def rollback(self, mark):
+        for value in self.strings[mark:]:
+            del self.index[value]
+        del self.strings[mark:]
+
+    def tokens_since(self, mark):
+        return sum(estimate_tokens(compact_json(value)) + 1 for value in self.strings[mark:])
+
+
+def _encode_event(event, table):
+    row = [event.kind, table.ref(event.path), event.method, event.location, event.status,
+           table.ref(event.schema), table.refs(event.properties) if event.properties is not None else None]
+    # Trailing Nones carry no information
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def _encode_impact(service, table):
+    endpoint = service["affected_endpoint"]
+    record = {
+        "service": service["service"],
+        "call": [endpoint["method"], table.ref(endpoint["path"])],
+        "origins": [
+            [origin.get("api"), table.ref(origin.get("path")), table.refs(origin.get("internalTrace"))]
+            for origin in service.get("originatingEndpoints", [])
+        ],
+        "findings": [],
+    }
+    if "spec_path" in endpoint:
+        record["spec_path"] = table.ref(endpoint["spec_path"])
+    for detail in service["impact_details"]:
+        finding = {"change": detail["change_type"], "severity": detail["severity"]}
+        if "schema" in detail:
+            finding["schema"] = table.ref(detail["schema"])
+        if "properties" in detail:
+            finding["properties"] = table.refs(detail["properties"])
+        if "status" in detail:
+            finding["status"] = detail["status"]
+        if "before" in detail:
+            finding["before"] = table.ref(detail["before"])
+            finding["after"] = table.ref(detail["after"])
+        record["findings"].append(finding)
+    return record
+
+
+def _relevant_events(service, events_by_operation, events_by_path, events_by_schema):
+    endpoint = service["affected_endpoint"]
+    path = endpoint.get("spec_path", endpoint["path"])
+    relevant = list(events_by_path.get(path, ()))
+    relevant += events_by_operation.get((endpoint["method"], path), ())
+    for detail in service["impact_details"]:
+        if "schema" in detail:
+            relevant += events_by_schema.get(detail["schema"], ())
+    return relevant
+
+
+class _Chunk:
+    def __init__(self):
+        self.table = _StringTable()
+        self.event_rows = {}
+        self.impacts = []
+        self.tokens = 0
+
+    def payload(self):
+        return {
+            "strings": self.table.strings,
+            "changes": [row for _, row in sorted(self.event_rows.items())],
+            "impacts": self.impacts,
+        }
+
+
+def build_prompt_chunks(events, impacted_services, token_budget=DEFAULT_TOKEN_BUDGET, include_unclaimed=True):
+    """Pack change events and matched dependencies into compact payloads of at most token_budget tokens.
+
+    Each impacted service travels with the change events that concern it
+    (its operation, its path and the schemas in its findings); events no
+    service touches are packed after them, unless include_unclaimed is off.
+    A single unit that is larger than the budget on its own still gets a
+    chunk of its own rather than failing.
+    """
+    events = list(events)
+    events_by_operation = {}
+    events_by_path = {}
+    events_by_schema = {}
+    for position, event in enumerate(events):
+        if event.method is not None:
+            events_by_operation.setdefault((str(event.method).upper(), event.path), []).append(position)
+        elif event.path is not None:
+            events_by_path.setdefault(event.path, []).append(position)
+        if event.schema is not None:
+            events_by_schema.setdefault(event.schema, []).append(position)
+
+    units = []
+    claimed = set()
+    for service in impacted_services:
+        positions = _relevant_events(service, events_by_operation, events_by_path, events_by_schema)
+        claimed.update(positions)
+        units.append((positions, service))
+    if include_unclaimed:
+        units += [([position], None) for position in range(len(events)) if position not in claimed]
+
+    chunks = []
+    chunk = _Chunk()
+    for positions, service in units:
+        mark = chunk.table.mark()
+        new_rows = {}
+        for position in positions:
+            if position not in chunk.event_rows and position not in new_rows:
+                new_rows[position] = _encode_event(events[position], chunk.table)
+        impact = _encode_impact(service, chunk.table) if service is not None else None
+
+        cost = sum(estimate_tokens(compact_json(row)) + 1 for row in new_rows.values())
+        if impact is not None:
+            cost += estimate_tokens(compact_json(impact)) + 1
+        cost += chunk.table.tokens_since(mark)
+
+        if chunk.tokens + cost > token_budget and (chunk.event_rows or chunk.impacts):
+            chunk.table.rollback(mark)
+            chunks.append(chunk)
+            chunk = _Chunk()
+            # Re-encode against the fresh chunk's string table
+            new_rows = {position: _encode_event(events[position], chunk.table) for position in dict.fromkeys(positions)}
+            impact = _encode_impact(service, chunk.table) if service is not None else None
+            cost = sum(estimate_tokens(compact_json(row)) + 1 for row in new_rows.values())
+            if impact is not None:
+                cost += estimate_tokens(compact_json(impact)) + 1
+            cost += chunk.table.tokens_since(0)
+
+        chunk.event_rows.update(new_rows)
+        if impact is not None:
+            chunk.impacts.append(impact)
+        chunk.tokens += cost
+
+    if chunk.event_rows or chunk.impacts or not chunks:
+        chunks.append(chunk)
+    return [c.payload() for c in chunks]
+
+
+def prompt_overhead_tokens():
+    return estimate_tokens(SYSTEM_MESSAGE) + estimate_tokens(ENCODING_NOTE) + estimate_tokens(INSTRUCTIONS) + 64
+
+
+def build_compact_mcp_requests(events, impacted_services, token_budget=DEFAULT_TOKEN_BUDGET, model=DEFAULT_MODEL,
+                               include_unclaimed=True):
+    """Chat requests covering every change event and impacted service, each within token_budget.
+
+    With include_unclaimed off, only the events that concern impacted_services are sent.
+    """
+    payload_budget = max(token_budget - prompt_overhead_tokens(), 1)
+    payloads = build_prompt_chunks(events, impacted_services, payload_budget, include_unclaimed)
+    requests = []
+    for part, payload in enumerate(payloads, start=1):
+        intro = "Analyze the impact of these API changes on the dependent services."
+        if len(payloads) > 1:
+            intro += f" This is part {part} of {len(payloads)}; analyze only what this part contains."
+        requests.append({
+            "model": model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": intro},
+                        {"type": "text", "text": ENCODING_NOTE},
+                        {"type": "text", "text": f"Changes and impacted services: {compact_json(payload)}"},
+                        {"type": "text", "text": INSTRUCTIONS},
+                    ]
+                }
+            ]
+        })
+    return requests
@@ -0,0 +1,167 @@
+import json
+import sys
+
+from spec_diff import HTTP_METHODS
+
+SCHEMA_REF_PREFIX = "#/components/schemas/"
+
+
+def _unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _resolve_pointer(spec, ref):
+    target = spec
+    for part in ref[2:].split("/"):
+        part = _unescape(part)
+        if not isinstance(target, dict) or part not in target:
+            return None
+        target = target[part]
+    return target
+
+
+def _iter_refs(node):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            ref = current.get("$ref")
+            if isinstance(ref, str):
+                yield ref
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+
+
+def direct_schema_refs(spec, node):
+    """Names of the components.schemas referenced directly from node.
+
+    Refs to other components (requestBodies, responses, parameters, ...) are
+    followed, since they are just indirection on the way to a schema.
+    """
+    found = set()
+    followed = set()
+    pending = [node]
+    while pending:
+        for ref in _iter_refs(pending.pop()):
+            if ref.startswith(SCHEMA_REF_PREFIX):
+                found.add(_unescape(ref[len(SCHEMA_REF_PREFIX):]))
+            elif ref.startswith("#/components/") and ref not in followed:
+                followed.add(ref)
+                target = _resolve_pointer(spec, ref)
+                if target is not None:
+                    pending.append(target)
+    return found
+
+
+def schema_closures(spec):
+    """Map each schema name to the frozenset of schemas it reaches through $ref, itself included.
+
+    Uses an iterative Tarjan SCC pass, so reference cycles (a schema that
+    points back at itself through its children) share one closure and deep
+    chains don't hit the recursion limit.
+    """
+    schemas = ((spec or {}).get("components", {}) or {}).get("schemas", {}) or {}
+    graph = {name: sorted(direct_schema_refs(spec, body) & schemas.keys()) for name, body in schemas.items()}
+
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    closures = {}
+    counter = 0
+
+    for root in graph:
+        if root in index:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph[root]))]
+
+        while work:
+            node, children = work[-1]
+            descended = False
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph[child])))
+                    descended = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+
+            if low[node] == index[node]:
+                # node is the root of a strongly connected component; its successors
+                # outside the component already have their closures computed
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == node:
+                        break
+                reach = set(component)
+                for member in component:
+                    for child in graph[member]:
+                        if child not in component:
+                            reach |= closures[child]
+                reach = frozenset(reach)
+                for member in component:
+                    closures[member] = reach
+
+    return closures
+
+
+def build_ref_index(spec):
+    """Map (METHOD, path) for every operation to the frozenset of schemas its request and responses reach"""
+    closures = schema_closures(spec)
+    ref_index = {}
+    for path, path_item in ((spec or {}).get("paths", {}) or {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        shared_parameters = path_item.get("parameters")
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            direct = direct_schema_refs(spec, [
+                shared_parameters,
+                operation.get("parameters"),
+                operation.get("requestBody"),
+                operation.get("responses"),
+            ])
+            reach = set()
+            for name in direct:
+                reach |= closures.get(name, frozenset((name,)))
+            ref_index[(method.upper(), path)] = frozenset(reach)
+    return ref_index
+
+
+def operations_by_schema(ref_index):
+    """Invert a ref index: schema name -> sorted list of (METHOD, path) that reach it"""
+    operations = {}
+    for operation, schemas in ref_index.items():
+        for name in schemas:
+            operations.setdefault(name, []).append(operation)
+    return {name: sorted(ops) for name, ops in operations.items()}
+
+
+if __name__ == "__main__":
+    import yaml
+
+    with open(sys.argv[1], 'r') as f:
+        spec = yaml.safe_load(f)
+    usage = operations_by_schema(build_ref_index(spec))
+    print(json.dumps({name: [f"{method} {path}" for method, path in ops] for name, ops in usage.items()}, indent=2))
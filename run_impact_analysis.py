@@ -1,26 +1,31 @@
-import json
 import sys
 
-def analyze_impact(dependencies_file):
-    # Read the dependencies JSON file
-    with open(dependencies_file, 'r') as file:
-        dependencies = json.load(file)
-    
+from dependency_index import DependencyIndex, is_dependency_index
+from dependency_stream import iter_dependencies
+
+# externalCall.service of the API whose spec lives in this repository
+DEFAULT_SERVICE = 'userdataapi'
+
+def analyze_impact(dependencies_file, service=DEFAULT_SERVICE):
     impacted_services = []
 
-    # Iterate through each dependency record
-    for record in dependencies:
-        service_name = record['serviceName']
-        external_call = record['externalCall']
-        originating_endpoints = record['originatingEndpoints']
+    if is_dependency_index(dependencies_file):
+        # A build-index file answers straight from its (service, path, method) index
+        with DependencyIndex(dependencies_file) as index:
+            impacted_services = index.callers(service)
+    else:
+        # Stream the dependency records; only calls to the service tracked for changes
+        # come back, so the file is never held in memory all at once
+        for record in iter_dependencies(dependencies_file, service=service):
+            service_name = record['serviceName']
+            external_call = record['externalCall']
+            originating_endpoints = record['originatingEndpoints']
 
-        # Check if the external call is to userdata-api (assuming that's the service to track for changes)
-        if external_call['service'] == 'userdataapi':
             impacted_services.append(service_name)
-            # for originating_endpoint in originating_endpoints:
-            #     # Check if any originating endpoint is using the userdata-api
-            #     if 'userdataapi' in external_call['service']:
-            #         impacted_services.append(external_call['service'])
+                # for originating_endpoint in originating_endpoints:
+                #     # Check if any originating endpoint is using the userdata-api
+                #     if 'userdataapi' in external_call['service']:
+                #         impacted_services.append(external_call['service'])
     
     # Output the impacted services based on changes
     if impacted_services:
@@ -29,6 +34,6 @@ def analyze_impact(dependencies_file):
         print("No impact detected.")
 
 if __name__ == "__main__":
-    # Pass the dependencies file as a command-line argument
+    # Pass the dependencies file (and optionally the provider service name) as command-line arguments
     dependencies_file = sys.argv[1]
-    analyze_impact(dependencies_file)
+    analyze_impact(dependencies_file, sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SERVICE)
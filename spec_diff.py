@@ -0,0 +1,311 @@
+import json
+import sys
+
+from tracing import count
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+# Operation fields reported as {"from": ..., "to": ...} when they change, like oasdiff does
+OPERATION_FIELDS = ("summary", "description", "operationId", "deprecated")
+
+
+def resolve_ref(spec, node, seen=()):
+    """Follow local $ref pointers (#/components/...) until a concrete node is reached"""
+    while isinstance(node, dict) and "$ref" in node:
+        ref = node["$ref"]
+        if ref in seen or not ref.startswith("#/"):
+            break
+        seen = seen + (ref,)
+        target = spec
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(target, dict) or part not in target:
+                return node, seen
+            target = target[part]
+        node = target
+    return node, seen
+
+
+def diff_schema(old_spec, new_spec, old_schema, new_schema, seen=(), memo=None):
+    """Diff two schemas, following $refs on both sides.
+
+    memo (a dict, one per pair of specs) keeps the result of every
+    ($ref, $ref, seen) pair already diffed, so a component schema used by
+    many operations, and everything it reaches, is only walked once.
+    """
+    key = None
+    if memo is not None and isinstance(old_schema, dict) and isinstance(new_schema, dict) \
+            and "$ref" in old_schema and "$ref" in new_schema:
+        key = (old_schema["$ref"], new_schema["$ref"], seen)
+        if key in memo:
+            return memo[key]
+    result = _diff_schema(old_spec, new_spec, old_schema, new_schema, seen, memo)
+    if key is not None:
+        memo[key] = result
+    return result
+
+
+def _diff_schema(old_spec, new_spec, old_schema, new_schema, seen, memo):
+    old_schema, old_seen = resolve_ref(old_spec, old_schema or {}, seen)
+    new_schema, new_seen = resolve_ref(new_spec, new_schema or {}, seen)
+
+    # Unresolvable or cyclic $ref on either side: compare the pointers themselves
+    if "$ref" in old_schema or "$ref" in new_schema:
+        if old_schema.get("$ref") == new_schema.get("$ref"):
+            return None
+        return {"$ref": {"from": old_schema.get("$ref"), "to": new_schema.get("$ref")}}
+    seen = tuple(dict.fromkeys(old_seen + new_seen))
+
+    changes = {}
+    for field in ("type", "format", "nullable", "enum"):
+        if old_schema.get(field) != new_schema.get(field):
+            changes[field] = {"from": old_schema.get(field), "to": new_schema.get(field)}
+
+    old_props = old_schema.get("properties", {}) or {}
+    new_props = new_schema.get("properties", {}) or {}
+    properties = {}
+    added = [name for name in new_props if name not in old_props]
+    removed = [name for name in old_props if name not in new_props]
+    if added:
+        properties["added"] = added
+    if removed:
+        properties["removed"] = removed
+    modified = {}
+    for name in old_props:
+        if name in new_props:
+            prop_diff = diff_schema(old_spec, new_spec, old_props[name], new_props[name], seen, memo)
+            if prop_diff:
+                modified[name] = prop_diff
+    if modified:
+        properties["modified"] = modified
+    if properties:
+        changes["properties"] = properties
+
+    old_required = set(old_schema.get("required", []) or [])
+    new_required = set(new_schema.get("required", []) or [])
+    if old_required != new_required:
+        required = {}
+        if new_required - old_required:
+            required["added"] = sorted(new_required - old_required)
+        if old_required - new_required:
+            required["deleted"] = sorted(old_required - new_required)
+        changes["required"] = required
+
+    if "items" in old_schema or "items" in new_schema:
+        items_diff = diff_schema(old_spec, new_spec, old_schema.get("items"), new_schema.get("items"), seen, memo)
+        if items_diff:
+            changes["items"] = items_diff
+
+    return changes or None
+
+
+def diff_content(old_spec, new_spec, old_content, new_content, memo=None):
+    # Laid out the way analyze_oasdiff_changes and friends walk it:
+    # content -> <media type> -> mediaTypeModified -> <media type> -> schema
+    old_content = old_content or {}
+    new_content = new_content or {}
+    changes = {}
+
+    added = [mt for mt in new_content if mt not in old_content]
+    deleted = [mt for mt in old_content if mt not in new_content]
+    if added:
+        changes["mediaTypeAdded"] = added
+    if deleted:
+        changes["mediaTypeDeleted"] = deleted
+
+    for media_type, old_media in old_content.items():
+        if media_type not in new_content:
+            continue
+        schema_diff = diff_schema(old_spec, new_spec,
+                                  (old_media or {}).get("schema"),
+                                  (new_content[media_type] or {}).get("schema"), memo=memo)
+        if schema_diff:
+            changes[media_type] = {"mediaTypeModified": {media_type: {"schema": schema_diff}}}
+
+    return changes or None
+
+
+def diff_parameters(old_spec, new_spec, old_params, new_params, memo=None):
+    def by_location(params, spec):
+        grouped = {}
+        for param in params or []:
+            param, _ = resolve_ref(spec, param)
+            grouped.setdefault(param.get("in"), {})[param.get("name")] = param
+        return grouped
+
+    old_grouped = by_location(old_params, old_spec)
+    new_grouped = by_location(new_params, new_spec)
+    changes = {}
+    for location in sorted(set(old_grouped) | set(new_grouped), key=str):
+        old_named = old_grouped.get(location, {})
+        new_named = new_grouped.get(location, {})
+        added = [name for name in new_named if name not in old_named]
+        deleted = [name for name in old_named if name not in new_named]
+        if added:
+            changes.setdefault("added", {})[location] = added
+        if deleted:
+            changes.setdefault("deleted", {})[location] = deleted
+        for name, old_param in old_named.items():
+            if name not in new_named:
+                continue
+            new_param = new_named[name]
+            param_changes = {}
+            if bool(old_param.get("required")) != bool(new_param.get("required")):
+                param_changes["required"] = {"from": bool(old_param.get("required")),
+                                             "to": bool(new_param.get("required"))}
+            schema_diff = diff_schema(old_spec, new_spec, old_param.get("schema"), new_param.get("schema"), memo=memo)
+            if schema_diff:
+                param_changes["schema"] = schema_diff
+            if param_changes:
+                changes.setdefault("modified", {}).setdefault(location, {})[name] = param_changes
+    return changes or None
+
+
+def diff_operation(old_spec, new_spec, old_op, new_op, memo=None):
+    changes = {}
+    for field in OPERATION_FIELDS:
+        if old_op.get(field) != new_op.get(field):
+            changes[field] = {"from": old_op.get(field), "to": new_op.get(field)}
+
+    params_diff = diff_parameters(old_spec, new_spec, old_op.get("parameters"), new_op.get("parameters"), memo)
+    if params_diff:
+        changes["parameters"] = params_diff
+
+    old_body, _ = resolve_ref(old_spec, old_op.get("requestBody") or {})
+    new_body, _ = resolve_ref(new_spec, new_op.get("requestBody") or {})
+    body_changes = {}
+    content_diff = diff_content(old_spec, new_spec, old_body.get("content"), new_body.get("content"), memo)
+    if content_diff:
+        body_changes["content"] = content_diff
+    if bool(old_body.get("required")) != bool(new_body.get("required")):
+        body_changes["required"] = {"from": bool(old_body.get("required")), "to": bool(new_body.get("required"))}
+    if body_changes:
+        changes["requestBody"] = body_changes
+
+    old_responses = old_op.get("responses", {}) or {}
+    new_responses = new_op.get("responses", {}) or {}
+    response_changes = {}
+    added = [status for status in new_responses if status not in old_responses]
+    deleted = [status for status in old_responses if status not in new_responses]
+    if added:
+        response_changes["added"] = added
+    if deleted:
+        response_changes["deleted"] = deleted
+    modified = {}
+    for status, old_resp in old_responses.items():
+        if status not in new_responses:
+            continue
+        old_resp, _ = resolve_ref(old_spec, old_resp or {})
+        new_resp, _ = resolve_ref(new_spec, new_responses[status] or {})
+        resp_changes = {}
+        if old_resp.get("description") != new_resp.get("description"):
+            resp_changes["description"] = {"from": old_resp.get("description"), "to": new_resp.get("description")}
+        content_diff = diff_content(old_spec, new_spec, old_resp.get("content"), new_resp.get("content"), memo)
+        if content_diff:
+            resp_changes["content"] = content_diff
+        if resp_changes:
+            modified[status] = resp_changes
+    if modified:
+        response_changes["modified"] = modified
+    if response_changes:
+        changes["responses"] = response_changes
+
+    return changes or None
+
+
+def diff_path_item(old_spec, new_spec, old_item, new_item, memo=None):
+    old_item = old_item or {}
+    new_item = new_item or {}
+    operations = {}
+    added = [m.upper() for m in HTTP_METHODS if m in new_item and m not in old_item]
+    deleted = [m.upper() for m in HTTP_METHODS if m in old_item and m not in new_item]
+    if added:
+        operations["added"] = added
+    if deleted:
+        operations["deleted"] = deleted
+    modified = {}
+    for method in HTTP_METHODS:
+        if method in old_item and method in new_item:
+            # Path-level parameters apply to every operation under the path
+            old_op = dict(old_item[method] or {})
+            new_op = dict(new_item[method] or {})
+            old_op["parameters"] = (old_item.get("parameters") or []) + (old_op.get("parameters") or [])
+            new_op["parameters"] = (new_item.get("parameters") or []) + (new_op.get("parameters") or [])
+            op_diff = diff_operation(old_spec, new_spec, old_op, new_op, memo)
+            count("operations_diffed")
+            if op_diff:
+                modified[method.upper()] = op_diff
+    if modified:
+        operations["modified"] = modified
+    return {"operations": operations} if operations else None
+
+
+def diff_specs(old_spec, new_spec, path_differ=None, schema_differ=None):
+    """Pure-Python stand-in for `oasdiff diff --format json` over two parsed specs.
+
+    path_differ(path, old_item, new_item) and schema_differ(name, old, new)
+    stand in for the per-path and per-schema diffs of items present on both
+    sides, e.g. to reuse results from an earlier run.
+    """
+    # Shared by every path and schema of this spec pair; see diff_schema
+    memo = {}
+    if path_differ is None:
+        path_differ = lambda path, old_item, new_item: diff_path_item(old_spec, new_spec, old_item, new_item, memo)
+    if schema_differ is None:
+        schema_differ = lambda name, old_schema, new_schema: diff_schema(old_spec, new_spec, old_schema, new_schema,
+                                                                         memo=memo)
+    old_spec = old_spec or {}
+    new_spec = new_spec or {}
+    result = {}
+
+    old_paths = old_spec.get("paths", {}) or {}
+    new_paths = new_spec.get("paths", {}) or {}
+    paths = {}
+    added = [path for path in new_paths if path not in old_paths]
+    deleted = [path for path in old_paths if path not in new_paths]
+    if added:
+        paths["added"] = added
+    if deleted:
+        paths["deleted"] = deleted
+    modified = {}
+    for path, old_item in old_paths.items():
+        if path in new_paths:
+            item_diff = path_differ(path, old_item, new_paths[path])
+            if item_diff:
+                modified[path] = item_diff
+    if modified:
+        paths["modified"] = modified
+    if paths:
+        result["paths"] = paths
+
+    old_schemas = (old_spec.get("components", {}) or {}).get("schemas", {}) or {}
+    new_schemas = (new_spec.get("components", {}) or {}).get("schemas", {}) or {}
+    schemas = {}
+    added = [name for name in new_schemas if name not in old_schemas]
+    deleted = [name for name in old_schemas if name not in new_schemas]
+    if added:
+        schemas["added"] = added
+    if deleted:
+        schemas["deleted"] = deleted
+    modified = {}
+    for name, old_schema in old_schemas.items():
+        if name in new_schemas:
+            schema_diff = schema_differ(name, old_schema, new_schemas[name])
+            if schema_diff:
+                modified[name] = schema_diff
+    if modified:
+        schemas["modified"] = modified
+    if schemas:
+        result["components"] = {"schemas": schemas}
+
+    return result
+
+
+if __name__ == "__main__":
+    import yaml
+
+    with open(sys.argv[1], 'r') as f:
+        old = yaml.safe_load(f)
+    with open(sys.argv[2], 'r') as f:
+        new = yaml.safe_load(f)
+    print(json.dumps(diff_specs(old, new), indent=2))
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+# Parsed documents kept in memory by content digest, for callers that load the same file repeatedly
+MEMORY_CACHE_SIZE = 16
+_parsed = OrderedDict()
+
+
+def read_document(path):
+    """Read a file once, returning (sha256 hex digest, raw bytes)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def detect_format(data, path=None):
+    # JSON is a subset of YAML, but the json module parses it far faster
+    stripped = data.lstrip()
+    if stripped[:1] in (b"{", b"["):
+        return "json"
+    if path and path.endswith(".json"):
+        return "json"
+    return "yaml"
+
+
+def parse_document(data, path=None):
+    if detect_format(data, path) == "json":
+        try:
+            return json.loads(data)
+        except ValueError:
+            # Flow-style YAML can start with { too
+            pass
+
+    import yaml
+
+    # The libyaml-backed loader is several times faster when PyYAML was built with it
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(data, Loader=loader)
+
+
+def load_document(path, snapshot_cache=None):
+    """Load a YAML or JSON document, returning (digest, parsed object).
+
+    Parsed results are reused by content digest: first from an in-memory LRU,
+    then from snapshot_cache (an analysis_cache.PickleCache) if given, and
+    only then by parsing. The returned object may be shared with other
+    callers, so treat it as read-only.
+    """
+    digest, data = read_document(path)
+    return digest, load_document_bytes(digest, data, path, snapshot_cache)
+
+
+def load_document_bytes(digest, data, path=None, snapshot_cache=None):
+    document = _parsed.get(digest)
+    if document is not None:
+        _parsed.move_to_end(digest)
+        return document
+
+    if snapshot_cache is not None:
+        document = snapshot_cache.get(digest)
+    if document is None:
+        document = parse_document(data, path)
+        if snapshot_cache is not None:
+            snapshot_cache.put(digest, document)
+
+    _parsed[digest] = document
+    if len(_parsed) > MEMORY_CACHE_SIZE:
+        _parsed.popitem(last=False)
+    return document
+
+
+def snapshot_cache_for(cache):
+    """Spec snapshot store living next to an AnalysisCache's entries"""
+    if cache is None:
+        return None
+    from analysis_cache import PickleCache
+
+    return PickleCache(os.path.join(cache.directory, "specs"), cache.max_bytes)
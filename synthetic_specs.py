@@ -0,0 +1,210 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+
+# Nouns for resource names; combined with a counter so any number of paths stays unique
+NOUNS = ("users", "orders", "items", "carts", "payments", "addresses", "invoices", "products", "reviews", "shipments")
+SCALAR_TYPES = ("string", "integer", "number", "boolean")
+
+
+def _schema_name(i):
+    return f"Model{i}"
+
+
+def _ref(i):
+    return {"$ref": f"#/components/schemas/{_schema_name(i)}"}
+
+
+def generate_spec(paths=1000, schemas=200, ref_depth=6, seed=0):
+    """A synthetic OpenAPI 3 document with roughly `paths` path items and `schemas` component schemas.
+
+    Schemas are split into ref_depth levels and each one references one or
+    two schemas of the next level (as a property or as array items), so a
+    schema at level 0 reaches a $ref chain ref_depth deep. Operations
+    reference level-0 schemas for their bodies, with the odd inline schema.
+    """
+    rng = random.Random(seed)
+    schemas = max(schemas, ref_depth)
+    levels = [[] for _ in range(ref_depth)]
+    for i in range(schemas):
+        levels[i * ref_depth // schemas].append(i)
+
+    components = {}
+    for level, members in enumerate(levels):
+        below = levels[level + 1] if level + 1 < ref_depth else []
+        for i in members:
+            properties = {"id": {"type": "string"}}
+            for k in rng.sample(range(40), rng.randint(3, 8)):
+                properties[f"field{k}"] = {"type": rng.choice(SCALAR_TYPES)}
+            for child in rng.sample(below, min(len(below), rng.randint(1, 2))):
+                if rng.random() < 0.3:
+                    properties[f"children{child}"] = {"type": "array", "items": _ref(child)}
+                else:
+                    properties[f"child{child}"] = _ref(child)
+            components[_schema_name(i)] = {"type": "object", "required": ["id"], "properties": properties}
+
+    def body_schema():
+        if rng.random() < 0.15:
+            return {"type": "object", "properties": {f"field{k}": {"type": rng.choice(SCALAR_TYPES)}
+                                                     for k in rng.sample(range(40), rng.randint(1, 5))}}
+        return _ref(rng.choice(levels[0]))
+
+    def operation(method, name):
+        op = {
+            "operationId": f"{method}{name}",
+            "responses": {
+                "200": {"description": "OK", "content": {"application/json": {"schema": body_schema()}}},
+                "404": {"description": "Not found"}
+            }
+        }
+        if method in ("post", "put"):
+            op["requestBody"] = {"content": {"application/json": {"schema": body_schema()}}}
+        return op
+
+    spec_paths = {}
+    counter = 0
+    while len(spec_paths) < paths:
+        noun = NOUNS[counter % len(NOUNS)]
+        base = f"/{noun}{counter}" if rng.random() < 0.8 else f"/v1/{noun}{counter}"
+        name = f"{noun.capitalize()}{counter}"
+        spec_paths[base] = {m: operation(m, name) for m in ("get", "post")}
+        if len(spec_paths) < paths:
+            spec_paths[f"{base}/{{id}}"] = {m: operation(m, name) for m in ("get", "put", "delete")}
+        counter += 1
+
+    return {
+        "openapi": "3.0.0",
+        "info": {"title": "Synthetic API", "version": "1.0.0"},
+        "paths": spec_paths,
+        "components": {"schemas": components}
+    }
+
+
+def mutate_spec(spec, change_rate=0.05, seed=1):
+    """A revised copy of spec with about change_rate of its paths and schemas changed.
+
+    Changes are the kinds the impact analysis reports on: removed paths,
+    paths moved under a /v2 prefix, new paths, and properties added to or
+    removed from component and inline schemas.
+    """
+    rng = random.Random(seed)
+    spec = copy.deepcopy(spec)
+    paths = spec["paths"]
+    schemas = spec["components"]["schemas"]
+
+    for name in rng.sample(sorted(schemas), int(len(schemas) * change_rate)):
+        properties = schemas[name]["properties"]
+        scalars = [p for p in properties if p.startswith("field")]
+        if scalars and rng.random() < 0.5:
+            del properties[rng.choice(scalars)]
+        else:
+            properties[f"added{rng.randint(0, 999)}"] = {"type": rng.choice(SCALAR_TYPES)}
+
+    for path in rng.sample(sorted(paths), int(len(paths) * change_rate)):
+        choice = rng.random()
+        if choice < 0.3:
+            del paths[path]
+        elif choice < 0.5 and not path.startswith("/v1/"):
+            paths[f"/v2{path}"] = paths.pop(path)
+        else:
+            for operation in paths[path].values():
+                schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+                if "properties" in schema:
+                    schema["properties"][f"added{rng.randint(0, 999)}"] = {"type": "string"}
+
+    for i in range(int(len(paths) * change_rate / 4)):
+        paths[f"/new{i}/{{id}}"] = {"get": {"responses": {"200": {"description": "OK"}}}}
+    return spec
+
+
+def generate_dependencies(spec, count=10000, service="userdataapi", seed=2):
+    """count dependency records in the api-dependencies format, calling operations of spec.
+
+    Most calls hit a spec operation, with path parameters filled in with
+    concrete ids or spelled differently; some call other services or paths
+    the spec doesn't have.
+    """
+    rng = random.Random(seed)
+    operations = [(path, method.upper()) for path, item in spec["paths"].items() for method in item]
+    records = []
+    for i in range(count):
+        path, method = rng.choice(operations)
+        choice = rng.random()
+        if choice < 0.4:
+            path = path.replace("{id}", str(rng.randint(1, 99999)))
+        elif choice < 0.5:
+            path = path.replace("{id}", "{userId}")
+        elif choice < 0.55:
+            path = f"/unknown{i}"
+        callee = service if rng.random() < 0.9 else "otherapi"
+        caller = f"service{rng.randint(0, max(count // 50, 1))}"
+        records.append({
+            "serviceName": caller,
+            "externalCall": {"service": callee, "path": path, "method": method},
+            "originatingEndpoints": [
+                {
+                    "path": f"/{caller}/endpoint{rng.randint(0, 20)}",
+                    "api": rng.choice(("GET", "POST")),
+                    "internalTrace": [f"com.example.{caller}.Class{rng.randint(0, 9)}.method{k}"
+                                      for k in range(rng.randint(1, 5))]
+                }
+                for _ in range(rng.randint(1, 3))
+            ]
+        })
+    return records
+
+
+def dump_spec(spec, path):
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(spec, f)
+        return
+    import yaml
+
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    with open(path, "w") as f:
+        yaml.dump(spec, f, Dumper=dumper, sort_keys=False)
+
+
+def write_dataset(directory, paths=1000, schemas=200, dependencies=10000, ref_depth=6, change_rate=0.05,
+                  seed=0, spec_format="yaml"):
+    """Write old/new specs and a dependency file into directory, returning their paths"""
+    os.makedirs(directory, exist_ok=True)
+    old_spec = generate_spec(paths, schemas, ref_depth, seed)
+    new_spec = mutate_spec(old_spec, change_rate, seed + 1)
+    files = {
+        "old_spec": os.path.join(directory, f"old_spec.{spec_format}"),
+        "new_spec": os.path.join(directory, f"new_spec.{spec_format}"),
+        "dependencies": os.path.join(directory, "dependencies.json")
+    }
+    dump_spec(old_spec, files["old_spec"])
+    dump_spec(new_spec, files["new_spec"])
+    with open(files["dependencies"], "w") as f:
+        json.dump(generate_dependencies(old_spec, dependencies, seed=seed + 2), f)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic old/new OpenAPI spec pair and dependency file")
+    parser.add_argument("directory")
+    parser.add_argument("--paths", type=int, default=1000, help="Path items per spec (default: 1000)")
+    parser.add_argument("--schemas", type=int, default=200, help="Component schemas per spec (default: 200)")
+    parser.add_argument("--ref-depth", type=int, default=6, help="Length of the $ref chains between schemas (default: 6)")
+    parser.add_argument("--dependencies", type=int, default=10000, help="Dependency records (default: 10000)")
+    parser.add_argument("--change-rate", type=float, default=0.05,
+                        help="Fraction of paths and schemas changed in the new spec (default: 0.05)")
+    parser.add_argument("--format", choices=["yaml", "json"], default="yaml", help="Spec file format (default: yaml)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    files = write_dataset(args.directory, args.paths, args.schemas, args.dependencies, args.ref_depth,
+                          args.change_rate, args.seed, args.format)
+    for name, path in files.items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
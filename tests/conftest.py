@@ -0,0 +1,124 @@
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+# The analysis scripts are flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USER_SPEC = {
+    "openapi": "3.0.0",
+    "paths": {
+        "/users/{id}": {
+            "get": {
+                "parameters": [{"name": "id", "in": "path", "required": True, "schema": {"type": "string"}}],
+                "responses": {"200": {"description": "ok", "content": {
+                    "application/json": {"schema": {"$ref": "#/components/schemas/User"}}}}}
+            }
+        },
+        "/users": {
+            "post": {
+                "requestBody": {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/User"}}}},
+                "responses": {"201": {"description": "created"}}
+            }
+        },
+        "/health": {"get": {"responses": {"200": {"description": "ok"}}}}
+    },
+    "components": {
+        "schemas": {
+            "User": {
+                "type": "object",
+                "required": ["id"],
+                "properties": {
+                    "id": {"type": "string"},
+                    "email": {"type": "string"},
+                    "friend": {"$ref": "#/components/schemas/User"}
+                }
+            }
+        }
+    }
+}
+
+DEPENDENCIES = [
+    {
+        "serviceName": "ShopperAPI",
+        "externalCall": {"service": "userdataapi", "path": "/users/123", "method": "GET"},
+        "originatingEndpoints": [{"path": "/cart/{id}", "api": "GET", "internalTrace": ["CartController.get"]}]
+    },
+    {
+        "serviceName": "SignupService",
+        "externalCall": {"service": "userdataapi", "path": "/users", "method": "post"},
+        "originatingEndpoints": []
+    },
+    {
+        "serviceName": "Monitor",
+        "externalCall": {"service": "userdataapi", "path": "/health", "method": "GET"},
+        "originatingEndpoints": []
+    },
+    {
+        "serviceName": "ShopperAPI",
+        "externalCall": {"service": "billing", "path": "/users/123", "method": "GET"},
+        "originatingEndpoints": []
+    }
+]
+
+
+@pytest.fixture
+def old_spec():
+    return copy.deepcopy(USER_SPEC)
+
+
+@pytest.fixture
+def new_spec():
+    # email dropped from User, /health removed: breaking for the GET /users/{id} and /health callers
+    spec = copy.deepcopy(USER_SPEC)
+    del spec["components"]["schemas"]["User"]["properties"]["email"]
+    del spec["paths"]["/health"]
+    return spec
+
+
+@pytest.fixture
+def dependencies():
+    return copy.deepcopy(DEPENDENCIES)
+
+
+@pytest.fixture
+def write_json(tmp_path):
+    def write(name, data):
+        path = tmp_path / name
+        path.write_text(json.dumps(data))
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def tracer():
+    from tracing import start_tracing, stop_tracing
+
+    tracer = start_tracing()
+    yield tracer
+    stop_tracing()
+
+
+@pytest.fixture
+def fake_openai():
+    # The real OpenAI SDK, talking to llm_stub's local server
+    openai = pytest.importorskip("openai")
+    from llm_stub import serve_fake_openai
+
+    server = serve_fake_openai(responder=lambda request: "Impact: " + str(request["messages"][-1]["content"])[:40])
+    try:
+        yield openai.OpenAI(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="test", max_retries=0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def analysis(old_spec, new_spec, dependencies, write_json):
+    from impact_analysis import run_analysis
+
+    return run_analysis(write_json("old.json", old_spec), write_json("new.json", new_spec),
+                        write_json("deps.json", dependencies))
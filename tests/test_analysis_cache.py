@@ -0,0 +1,63 @@
+import json
+import os
+
+from analysis_cache import AnalysisCache, PickleCache, cache_key
+from impact_analysis import run_analysis
+from impact_records import json_default
+
+
+def test_cache_key_depends_on_every_part_and_its_position():
+    assert cache_key("a", "b") == cache_key("a", "b")
+    assert cache_key("a", "b") != cache_key("b", "a")
+    assert cache_key("ab") != cache_key("a", "b")
+
+
+def test_put_get_and_unreadable_entries(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    assert cache.get("missing") is None
+
+    cache.put("key", {"impacted_services": [{"service": "ShopperAPI"}]})
+    assert cache.get("key") == {"impacted_services": [{"service": "ShopperAPI"}]}
+
+    (tmp_path / "cache" / "broken.json").write_text("{not json")
+    assert cache.get("broken") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    for i, key in enumerate(("old", "used", "new")):
+        cache.put(key, {"padding": "x" * 80})
+        os.utime(cache._entry_path(key), (1000 + i, 1000 + i))
+    cache.get("old")  # refreshes it
+
+    # Room for two of the three entries
+    cache.max_bytes = 250
+    cache.evict()
+    assert cache.get("used") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_pickle_cache_round_trips_python_values(tmp_path):
+    cache = PickleCache(str(tmp_path))
+    cache.put("key", {"moves": {("GET", "/users"): frozenset({"User"})}})
+    assert cache.get("key") == {"moves": {("GET", "/users"): frozenset({"User"})}}
+
+
+def test_repeated_analysis_is_answered_from_the_cache(tmp_path, tracer, old_spec, new_spec, dependencies,
+                                                      write_json):
+    paths = write_json("old.json", old_spec), write_json("new.json", new_spec), write_json("deps.json", dependencies)
+    cache = AnalysisCache(str(tmp_path / "cache"))
+
+    first = run_analysis(*paths, cache=cache)
+    second = run_analysis(*paths, cache=cache)
+    assert tracer.counters["analysis_cache_hits"] == 1
+    for field in ("diff", "api_changes", "impacted_services"):
+        assert json.dumps(second[field], sort_keys=True, default=json_default) == \
+            json.dumps(first[field], sort_keys=True, default=json_default)
+    assert [tuple(event) for event in second["events"]] == [tuple(event) for event in first["events"]]
+
+    # A different service filter is a different entry
+    run_analysis(*paths, cache=cache, service="billing")
+    assert tracer.counters["analysis_cache_hits"] == 1
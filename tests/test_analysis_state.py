@@ -0,0 +1,164 @@
+import copy
+import json
+import random
+
+import pytest
+
+from analysis_state import AnalysisState
+from dependency_index import build_index
+from impact_analysis import run_analysis
+from impact_records import json_default
+
+SCHEMAS = ["User", "Addr", "Order", "Item", "Err"]
+PATHS = ["/users", "/users/{id}", "/v1/users/{id}", "/orders/{oid}/items", "/items", "/users/{id}/addr"]
+CALL_PATHS = PATHS + ["/users/42", "/orders/1/items"]
+
+
+class SpecGenerator:
+    """Small random specs with shared $ref schemas, and random edits to them"""
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def schema(self, depth=0):
+        r = self.random
+        choice = r.random()
+        if choice < 0.35 and depth < 3:
+            return {"$ref": "#/components/schemas/" + r.choice(SCHEMAS)}
+        if choice < 0.5 and depth < 3:
+            return {"type": "array", "items": self.schema(depth + 1)}
+        properties = {}
+        for name in r.sample(["id", "name", "a", "b", "c", "zip"], r.randint(0, 4)):
+            nested = r.random() < 0.3 and depth < 3
+            properties[name] = self.schema(depth + 1) if nested else {"type": r.choice(["string", "integer"])}
+        return {"type": "object", "properties": properties, "required": r.sample(["id", "name"], r.randint(0, 1))}
+
+    def operation(self):
+        r = self.random
+        operation = {
+            "operationId": r.choice(["a", "b", "c"]),
+            "responses": {status: {"description": "d", "content": {"application/json": {"schema": self.schema()}}}
+                          for status in r.sample(["200", "404"], r.randint(1, 2))}
+        }
+        if r.random() < 0.5:
+            operation["parameters"] = [{"name": name, "in": "query", "required": r.random() < 0.5,
+                                        "schema": {"type": "string"}}
+                                       for name in r.sample(["q", "limit"], r.randint(0, 2))]
+        if r.random() < 0.4:
+            operation["requestBody"] = r.choice([
+                {"$ref": "#/components/requestBodies/B"},
+                {"content": {"application/json": {"schema": self.schema()}}}
+            ])
+        return operation
+
+    def spec(self):
+        r = self.random
+        return {
+            "openapi": "3.0.0",
+            "paths": {path: {method: self.operation() for method in r.sample(["get", "post", "delete"], r.randint(1, 2))}
+                      for path in r.sample(PATHS, r.randint(2, 5))},
+            "components": {
+                "schemas": {name: self.schema(1) for name in SCHEMAS if r.random() < 0.8},
+                "requestBodies": {"B": {"content": {"application/json": {"schema": self.schema(1)}}}}
+            }
+        }
+
+    def mutate(self, spec):
+        r = self.random
+        spec = copy.deepcopy(spec)
+        for _ in range(r.randint(0, 3)):
+            choice = r.random()
+            if choice < 0.25:
+                spec["components"]["schemas"][r.choice(SCHEMAS)] = self.schema(1)
+            elif choice < 0.5 and spec["paths"]:
+                spec["paths"][r.choice(list(spec["paths"]))][r.choice(["get", "post", "delete"])] = self.operation()
+            elif choice < 0.6 and spec["paths"]:
+                del spec["paths"][r.choice(list(spec["paths"]))]
+            elif choice < 0.7:
+                spec["paths"][r.choice(PATHS)] = {"get": self.operation()}
+            elif choice < 0.8:
+                spec["components"]["requestBodies"]["B"] = {
+                    "content": {"application/json": {"schema": self.schema(1)}}}
+            elif choice < 0.85 and spec["components"]["schemas"]:
+                del spec["components"]["schemas"][r.choice(list(spec["components"]["schemas"]))]
+        return spec
+
+    def dependencies(self):
+        r = self.random
+        records = []
+        for i in range(r.randint(1, 12)):
+            method = r.choice(["GET", "post", "DELETE"])
+            records.append({
+                "serviceName": f"S{i}",
+                "externalCall": {"service": r.choice(["userdataapi", "x"]), "path": r.choice(CALL_PATHS),
+                                 "method": method.upper() if r.random() < 0.5 else method},
+                "originatingEndpoints": ([{"path": "/o", "api": "GET", "internalTrace": ["A.b", "C.d"]}]
+                                         if r.random() < 0.7 else [])
+            })
+        return records
+
+
+def _outcome(result):
+    return json.dumps([result["diff"], result["impacted_services"]], sort_keys=True, default=json_default)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_incremental_runs_match_the_stateless_run(tmp_path, seed):
+    """A commit sequence analyzed with a state, an index, or both gives the stateless answer at every step"""
+    generator = SpecGenerator(seed)
+    r = generator.random
+    old_path, new_path = str(tmp_path / "old.json"), str(tmp_path / "new.json")
+    deps_path, index_path = str(tmp_path / "deps.json"), str(tmp_path / "deps.sqlite")
+    state_path, index_state_path = str(tmp_path / "state.gz"), str(tmp_path / "index-state.gz")
+
+    base = current = generator.spec()
+    dependencies = generator.dependencies()
+    for _ in range(6):
+        new = generator.mutate(current if r.random() < 0.7 else base)
+        if r.random() < 0.2:
+            dependencies = generator.dependencies()
+        old = current if r.random() < 0.7 else base
+        for path, data in ((old_path, old), (new_path, new), (deps_path, dependencies)):
+            with open(path, "w") as f:
+                json.dump(data, f)
+        build_index([deps_path], index_path)
+        service = r.choice([None, "userdataapi", "nope"])
+
+        expected = run_analysis(old_path, new_path, deps_path, service=service)
+        runs = {
+            "state": run_analysis(old_path, new_path, deps_path, service=service, state=AnalysisState(state_path),
+                                  stream_dependencies=r.random() < 0.3),
+            "index": run_analysis(old_path, new_path, index_path, service=service),
+            "index+state": run_analysis(old_path, new_path, index_path, service=service,
+                                        state=AnalysisState(index_state_path))
+        }
+        for name, result in runs.items():
+            assert _outcome(result) == _outcome(expected), name
+        current = new
+
+
+def test_state_reuses_unchanged_work(tmp_path, old_spec, new_spec, dependencies, write_json):
+    old_path, new_path = write_json("old.json", old_spec), write_json("new.json", new_spec)
+    deps_path = write_json("deps.json", dependencies)
+    state_path = str(tmp_path / "state.gz")
+
+    first = run_analysis(old_path, new_path, deps_path, state=AnalysisState(state_path))
+    state = AnalysisState(state_path)
+    second = run_analysis(old_path, new_path, deps_path, state=state)
+
+    assert _outcome(second) == _outcome(first)
+    assert first["impacted_services"]
+    assert state.stats["units_reused"] > 0
+    assert state.stats["units_diffed"] == 0
+    assert state.stats["impacts_reused"] > 0
+    assert state.stats["impacts_evaluated"] == 0
+
+
+def test_state_file_from_another_version_is_ignored(tmp_path, old_spec, new_spec, dependencies, write_json):
+    old_path, new_path = write_json("old.json", old_spec), write_json("new.json", new_spec)
+    deps_path = write_json("deps.json", dependencies)
+    state_path = tmp_path / "state.gz"
+    state_path.write_bytes(b"not a state file")
+
+    result = run_analysis(old_path, new_path, deps_path, state=AnalysisState(str(state_path)))
+    assert _outcome(result) == _outcome(run_analysis(old_path, new_path, deps_path))
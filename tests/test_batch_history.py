@@ -0,0 +1,103 @@
+import json
+import subprocess
+
+import pytest
+
+from batch_history import build_timeline, list_commits, read_blobs, spec_blobs
+from impact_analysis import main
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path, old_spec, new_spec):
+    """main: README, then openapi.yaml's old spec, a breaking change, an unrelated commit and a revert"""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    _git(repo, "config", "user.email", "dev@example.com")
+    _git(repo, "config", "user.name", "dev")
+
+    def commit(message, files):
+        for name, content in files.items():
+            (repo / name).write_text(content)
+        _git(repo, "add", "-A")
+        _git(repo, "commit", "-q", "-m", message)
+        return _git(repo, "rev-parse", "HEAD")
+
+    # JSON is valid YAML, so the spec can be written either way
+    shas = [
+        commit("Add README", {"README.md": "userdata\n"}),
+        commit("Add spec", {"openapi.yaml": json.dumps(old_spec)}),
+        commit("Drop email and /health", {"openapi.yaml": json.dumps(new_spec)}),
+        commit("Docs", {"README.md": "userdata api\n"}),
+        commit("Revert", {"openapi.yaml": json.dumps(old_spec)})
+    ]
+    return repo, shas
+
+
+def test_git_helpers(repo):
+    repo, shas = repo
+    commits = list_commits(str(repo), f"{shas[0]}..HEAD")
+    assert [sha for sha, _, _ in commits] == shas[1:]
+    assert [subject for _, _, subject in commits] == ["Add spec", "Drop email and /health", "Docs", "Revert"]
+
+    blobs = spec_blobs(str(repo), shas, ["openapi-spec.json", "openapi.yaml"])
+    assert shas[0] not in blobs
+    assert blobs[shas[1]][0] == "openapi.yaml"
+    assert blobs[shas[1]] == blobs[shas[4]] != blobs[shas[2]]
+
+    contents = read_blobs(str(repo), [blobs[shas[1]][1], blobs[shas[2]][1], blobs[shas[1]][1]])
+    assert len(contents) == 2
+    assert b"email" in contents[blobs[shas[1]][1]]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_timeline(repo, dependencies, jobs):
+    repo, shas = repo
+    timeline = build_timeline(str(repo), f"{shas[0]}..HEAD", dependencies, jobs=jobs)
+
+    assert (timeline["commits"], timeline["revisions"], timeline["pairs_analyzed"]) == (4, 2, 3)
+    added, breaking, docs, revert = timeline["timeline"]
+    assert added["spec_changed"] and added["previous_blob"] is None
+    assert added["summary"]["paths_added"] == 3 and not added["summary"]["breaking"]
+
+    assert breaking["summary"]["breaking"]
+    assert breaking["summary"]["paths_deleted"] == 1
+    assert {call["service"] for call in breaking["impacted"] if call["breaking"]} == \
+        {"ShopperAPI", "SignupService", "Monitor"}
+
+    assert not docs["spec_changed"] and "summary" not in docs
+    assert revert["summary"]["paths_added"] == 1 and not revert["summary"]["breaking"]
+
+
+def test_deleting_the_spec_removes_every_endpoint(repo, dependencies):
+    repo, shas = repo
+    _git(repo, "rm", "-q", "openapi.yaml")
+    _git(repo, "commit", "-q", "-m", "Remove spec")
+    timeline = build_timeline(str(repo), f"{shas[-1]}..HEAD", dependencies, jobs=1)
+
+    (removed,) = timeline["timeline"]
+    assert removed["spec_changed"] and removed["spec_removed"]
+    assert removed["spec_blob"] is None and removed["previous_blob"] is not None
+    assert removed["summary"]["paths_deleted"] == 3
+    assert removed["summary"]["breaking"]
+    assert {call["service"] for call in removed["impacted"] if call["breaking"]} == \
+        {"ShopperAPI", "SignupService", "Monitor"}
+    assert all(call["changes"] == ["path_removed"] for call in removed["impacted"])
+
+
+def test_history_command(repo, dependencies, write_json, tmp_path, capsys):
+    repo, shas = repo
+    output = tmp_path / "timeline.json"
+    main(["history", f"{shas[0]}..HEAD", write_json("deps.json", dependencies), "--repo", str(repo), "--jobs", "1",
+          "--details", "-o", str(output)])
+    assert "4 commits, 3 spec changes, 1 with breaking impact" in capsys.readouterr().out
+    assert "impacted_services" in json.loads(output.read_text())["timeline"][1]
+
+
+def test_empty_range(repo, dependencies):
+    repo, shas = repo
+    assert build_timeline(str(repo), "HEAD..HEAD", dependencies)["timeline"] == []
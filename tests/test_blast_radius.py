@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+from blast_radius import DependencyGraph, blast_radius, load_graph
+from impact_analysis import main
+from impact_records import IMPACT_BREAKING, IMPACT_NON_BREAKING
+from org_impact import analyze_organization
+
+CART = ("shopperapi", "GET", "/cart/{}")
+CHECKOUT = ("webapp", "GET", "/checkout")
+HOME = ("mobile", "GET", "/home")
+
+# ShopperAPI's GET /cart/{id} calls userdataapi; WebApp calls the cart, Mobile calls WebApp
+CALL_CHAIN = [
+    {
+        "serviceName": "WebApp",
+        "externalCall": {"service": "shopper-api", "path": "/cart/42", "method": "get"},
+        "originatingEndpoints": [{"path": "/checkout", "api": "GET", "internalTrace": ["CheckoutController.load"]}]
+    },
+    {
+        "serviceName": "Mobile",
+        "externalCall": {"service": "webapp", "path": "/checkout", "method": "GET"},
+        "originatingEndpoints": [{"path": "/home", "api": "GET", "internalTrace": ["HomeScreen.render"]}]
+    }
+]
+
+
+def cart_impact(impact_type=IMPACT_BREAKING):
+    return {
+        "service": "ShopperAPI",
+        "affected_endpoint": {"path": "/users/123", "method": "GET"},
+        "originatingEndpoints": [{"path": "/cart/{id}", "api": "GET", "internalTrace": ["CartController.get"]}],
+        "impact_details": [{"impact_type": impact_type}]
+    }
+
+
+@pytest.fixture
+def graph(dependencies):
+    return DependencyGraph.from_records(dependencies + CALL_CHAIN)
+
+
+def test_calls_are_routed_onto_exposed_endpoints(graph):
+    # shopper-api is ShopperAPI, and /cart/42 is its /cart/{id}
+    assert graph.callers[CART] == {CHECKOUT: ["CheckoutController.load"]}
+    assert graph.callers[CHECKOUT] == {HOME: ["HomeScreen.render"]}
+    assert graph.label(CART) == {"service": "ShopperAPI", "method": "GET", "path": "/cart/{id}"}
+    # Records without originating endpoints add no edges
+    assert graph.edges == 3
+
+
+def test_blast_radius_follows_callers_with_hop_distances(graph):
+    result = blast_radius(graph, [cart_impact()], "userdataapi")
+
+    assert [(entry["service"], entry["path"], entry["hops"]) for entry in result["endpoints"]] == \
+        [("ShopperAPI", "/cart/{id}", 1), ("WebApp", "/checkout", 2), ("Mobile", "/home", 3)]
+    cart, checkout, home = result["endpoints"]
+    assert cart["via"] == {"service": "userdataapi", "method": "GET", "path": "/users/123"}
+    assert cart["trace"] == ["CartController.get"]
+    assert checkout["via"] == {"service": "ShopperAPI", "method": "GET", "path": "/cart/{id}"}
+    assert home["via"] == {"service": "WebApp", "method": "GET", "path": "/checkout"}
+    assert result["services"] == {"ShopperAPI": 1, "WebApp": 2, "Mobile": 3}
+    assert result["max_hops"] == 3
+    assert result["cycles"] == []
+
+
+def test_max_hops_and_non_breaking_impacts(graph):
+    result = blast_radius(graph, [cart_impact()], "userdataapi", max_hops=2)
+    assert result["services"] == {"ShopperAPI": 1, "WebApp": 2}
+
+    assert blast_radius(graph, [cart_impact(IMPACT_NON_BREAKING)], "userdataapi") == \
+        {"endpoints": [], "services": {}, "max_hops": 0, "cycles": []}
+
+
+def test_called_service_comes_from_the_records_without_a_provider(dependencies):
+    # Nothing in the impact output names the called service; the graph's records do
+    assert "service" not in cart_impact()["affected_endpoint"]
+    graph = DependencyGraph.from_records(dependencies + CALL_CHAIN)
+    cart = blast_radius(graph, [cart_impact()])["endpoints"][0]
+    assert cart["via"] == {"service": "userdataapi", "method": "GET", "path": "/users/123"}
+
+    # The same call made to two services can't tell which one changed
+    twin = {
+        "serviceName": "ShopperAPI",
+        "externalCall": {"service": "billing", "path": "/users/123", "method": "GET"},
+        "originatingEndpoints": [{"path": "/cart/{id}", "api": "GET"}]
+    }
+    graph = DependencyGraph.from_records(dependencies + [twin])
+    assert blast_radius(graph, [cart_impact()])["endpoints"][0]["via"]["service"] is None
+    assert blast_radius(graph, [cart_impact()], "userdataapi")["endpoints"][0]["via"]["service"] == "userdataapi"
+
+
+def test_endpoints_are_reached_on_the_shortest_route(dependencies):
+    shortcut = {
+        "serviceName": "Mobile",
+        "externalCall": {"service": "ShopperAPI", "path": "/cart/7", "method": "GET"},
+        "originatingEndpoints": [{"path": "/home", "api": "GET"}]
+    }
+    graph = DependencyGraph.from_records(dependencies + CALL_CHAIN + [shortcut])
+    result = blast_radius(graph, [cart_impact()], "userdataapi")
+    assert result["services"] == {"ShopperAPI": 1, "WebApp": 2, "Mobile": 2}
+    home = [entry for entry in result["endpoints"] if entry["service"] == "Mobile"][0]
+    assert home["via"] == {"service": "ShopperAPI", "method": "GET", "path": "/cart/{id}"}
+
+
+def test_call_cycles_end_the_walk(dependencies):
+    loop = {
+        "serviceName": "ShopperAPI",
+        "externalCall": {"service": "webapp", "path": "/checkout", "method": "GET"},
+        "originatingEndpoints": [{"path": "/cart/{id}", "api": "GET"}]
+    }
+    graph = DependencyGraph.from_records(dependencies + CALL_CHAIN + [loop])
+    result = blast_radius(graph, [cart_impact()], "userdataapi")
+
+    assert result["services"] == {"ShopperAPI": 1, "WebApp": 2, "Mobile": 3}
+    assert [sorted((node["service"], node["path"]) for node in cycle) for cycle in result["cycles"]] == \
+        [[("ShopperAPI", "/cart/{id}"), ("WebApp", "/checkout")]]
+
+
+def test_load_graph_reads_every_dependency_file(dependencies, write_json):
+    graph = load_graph([write_json("deps.json", dependencies), write_json("chain.json", CALL_CHAIN)])
+    assert set(graph.callers) == {("userdataapi", "GET", "/users/123"), CART, CHECKOUT}
+
+
+def test_transitive_impact_command(old_spec, new_spec, dependencies, write_json, capsys):
+    old_path, new_path = write_json("old.json", old_spec), write_json("new.json", new_spec)
+    deps_path = write_json("deps.json", dependencies)
+
+    main(["impact", old_path, new_path, deps_path, "--service", "userdataapi", "--transitive",
+          "--graph", deps_path, "--graph", write_json("chain.json", CALL_CHAIN)])
+    output = json.loads(capsys.readouterr().out)
+    assert output["blast_radius"]["services"] == {"ShopperAPI": 1, "WebApp": 2, "Mobile": 3}
+    assert {impacted["service"] for impacted in output["impacted_services"]} == \
+        {"ShopperAPI", "SignupService", "Monitor"}
+
+    # Without --service the called service still comes from the records, and impacted_services is unchanged
+    main(["impact", old_path, new_path, deps_path, "--transitive", "--graph", deps_path])
+    output = json.loads(capsys.readouterr().out)
+    assert output["blast_radius"]["endpoints"][0]["via"]["service"] == "userdataapi"
+    assert all(set(impacted["affected_endpoint"]) <= {"path", "method", "spec_path"}
+               for impacted in output["impacted_services"])
+
+    # Without --graph only the dependencies file is walked
+    main(["impact", old_path, new_path, deps_path, "--service", "userdataapi", "--transitive"])
+    assert json.loads(capsys.readouterr().out)["blast_radius"]["services"] == {"ShopperAPI": 1}
+
+
+def test_transitive_organization_report(tmp_path, old_spec, new_spec, dependencies, write_json):
+    providers = [{"service": "userdataapi", "old_spec": write_json("old.json", old_spec),
+                  "new_spec": write_json("new.json", new_spec)}]
+    consumers = [write_json("deps.json", dependencies), write_json("chain.json", CALL_CHAIN)]
+    report = analyze_organization(providers, consumers, str(tmp_path / "indexes"), jobs=1, transitive=True)
+
+    radius = report["providers"][0]["blast_radius"]
+    assert radius["services"] == {"ShopperAPI": 1, "WebApp": 2, "Mobile": 3}
+    assert radius["endpoints"][0]["via"] == {"service": "userdataapi", "method": "GET", "path": "/users/123"}
@@ -0,0 +1,42 @@
+import copy
+
+from compare_openapi_specs import changes_for_operation, compare_spec_changes, compare_specs, index_changes
+from impact_analysis import extract_changed_paths
+from merkle_diff import tree_changes
+
+
+def _changed_spec(old_spec):
+    new_spec = copy.deepcopy(old_spec)
+    new_spec["paths"]["/users/{id}"]["get"]["summary"] = "Fetch a user"
+    new_spec["paths"]["/users/{id}"]["parameters"] = [{"name": "id", "in": "path", "required": True}]
+    del new_spec["paths"]["/health"]
+    new_spec["paths"]["/it's"] = {"get": {"responses": {}}}
+    return new_spec
+
+
+def test_index_changes_groups_by_operation(tmp_path, old_spec, write_json):
+    changes = compare_spec_changes(write_json("old.json", old_spec), write_json("new.json", _changed_spec(old_spec)))
+    index = index_changes(changes)
+
+    assert set(index) == {("/users/{id}", "GET"), ("/users/{id}", None), ("/health", None), ("/it's", None)}
+    assert [change.location for change in index[("/users/{id}", "GET")]] == \
+        [("paths", "/users/{id}", "get", "summary")]
+    # Path-level changes apply to every method of the path
+    assert len(changes_for_operation(index, "/users/{id}", "get")) == 2
+    assert len(changes_for_operation(index, "/users/{id}")) == 1
+    assert changes_for_operation(index, "/orders", "GET") == []
+
+
+def test_index_changes_when_the_paths_object_appears():
+    index = index_changes(tree_changes({"openapi": "3.0.0"}, {"openapi": "3.0.0", "paths": {"/a": {}, "/b": {}}}))
+    assert set(index) == {("/a", None), ("/b", None)}
+
+
+def test_extract_changed_paths_accepts_every_shape(tmp_path, old_spec, write_json):
+    paths = write_json("old.json", old_spec), write_json("new.json", _changed_spec(old_spec))
+    expected = {"/users/{id}", "/health", "/it's"}
+
+    assert extract_changed_paths(compare_specs(*paths)) == expected
+    assert extract_changed_paths(compare_spec_changes(*paths)) == expected
+    assert extract_changed_paths(index_changes(compare_spec_changes(*paths))) == expected
+    assert extract_changed_paths({}) == set()
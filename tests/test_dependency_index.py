@@ -0,0 +1,88 @@
+import json
+
+from dependency_index import DependencyIndex, build_index, is_dependency_index
+from impact_analysis import (
+    analyze_impact, analyze_impact_indexed, analyze_oasdiff_changes, collect_change_events
+)
+from impact_records import json_default
+from path_router import PathRouter
+from ref_index import build_ref_index
+from spec_diff import diff_specs
+
+
+def test_records_round_trip(tmp_path, dependencies, write_json):
+    source = write_json("deps.json", dependencies)
+    output = str(tmp_path / "deps.sqlite")
+
+    assert build_index([source], output) == (len(dependencies), True)
+    assert is_dependency_index(output)
+    assert not is_dependency_index(source)
+    with DependencyIndex(output) as index:
+        assert list(index.records()) == dependencies
+        assert list(index.records("billing")) == [dependencies[3]]
+        assert list(index.records("unknown")) == []
+
+
+def test_up_to_date_index_is_not_rebuilt(tmp_path, dependencies, write_json):
+    source = write_json("deps.json", dependencies)
+    output = str(tmp_path / "deps.sqlite")
+    build_index([source], output)
+
+    assert build_index([source], output) == (len(dependencies), False)
+    assert build_index([source], output, force=True) == (len(dependencies), True)
+
+    write_json("deps.json", dependencies[:2])
+    assert build_index([source], output) == (2, True)
+
+
+def test_lookup_and_callers(tmp_path, dependencies, write_json):
+    dependencies.append({"serviceName": "Admin", "externalCall": {"service": "userdataapi", "path": "/users/{userId}",
+                                                                  "method": "delete"}})
+    output = str(tmp_path / "deps.sqlite")
+    build_index([write_json("deps.json", dependencies)], output)
+
+    with DependencyIndex(output) as index:
+        assert index.lookup("userdataapi", "/users/123/") == [dependencies[0]]
+        assert index.lookup("userdataapi", "/users", "POST") == [dependencies[1]]
+        assert index.lookup("userdataapi", "/users", "GET") == []
+        # Parameter names don't matter
+        assert index.lookup("userdataapi", "/users/{id}", "DELETE") == [dependencies[4]]
+        assert index.callers("userdataapi") == ["ShopperAPI", "SignupService", "Monitor", "Admin"]
+        assert sorted(index.call_keys("userdataapi")) == [("DELETE", "/users/{userId}"), ("GET", "/health"),
+                                                          ("GET", "/users/123"), ("POST", "/users")]
+
+
+def test_indexed_matching_equals_full_matching(tmp_path, old_spec, new_spec, dependencies, write_json):
+    output = str(tmp_path / "deps.sqlite")
+    build_index([write_json("deps.json", dependencies)], output)
+    diff = diff_specs(old_spec, new_spec)
+    api_changes = analyze_oasdiff_changes(diff, collect_change_events(diff))
+    router = PathRouter.from_spec(old_spec)
+    ref_index = build_ref_index(old_spec)
+
+    expected = analyze_impact(api_changes, dependencies, router, ref_index)
+    with DependencyIndex(output) as index:
+        indexed = analyze_impact_indexed(api_changes, index, router, ref_index)
+
+    assert {impacted["service"] for impacted in expected} == {"ShopperAPI", "SignupService", "Monitor"}
+    assert json.dumps(indexed, sort_keys=True, default=json_default) == \
+        json.dumps(expected, sort_keys=True, default=json_default)
+
+
+def test_state_does_not_copy_an_indexed_dependency_file(tmp_path, old_spec, new_spec, dependencies, write_json):
+    import gzip
+    import pickle
+
+    from analysis_state import AnalysisState
+    from impact_analysis import run_analysis
+
+    output = str(tmp_path / "deps.sqlite")
+    build_index([write_json("deps.json", dependencies)], output)
+    state_path = str(tmp_path / "state.gz")
+    paths = write_json("old.json", old_spec), write_json("new.json", new_spec)
+
+    indexed = run_analysis(*paths, output, state=AnalysisState(state_path))
+    with gzip.open(state_path, "rb") as f:
+        assert pickle.load(f)["dependencies"] is None
+    assert json.dumps(indexed["impacted_services"], sort_keys=True, default=json_default) == \
+        json.dumps(run_analysis(*paths, output)["impacted_services"], sort_keys=True, default=json_default)
@@ -0,0 +1,63 @@
+import io
+import json
+
+import pytest
+
+from dependency_stream import iter_dependencies, iter_json_values
+
+
+def _write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+def test_json_array_streams_across_chunk_boundaries(dependencies):
+    text = json.dumps(dependencies, indent=2)
+    for chunk_size in (1, 7, 64, 1 << 20):
+        assert list(iter_json_values(io.StringIO(text), chunk_size)) == dependencies
+
+
+def test_concatenated_values_and_empty_input():
+    values = iter_json_values(io.StringIO('{"a": 1}\n{"b": [1, 2]} 3 "x]"'), 2)
+    assert list(values) == [{"a": 1}, {"b": [1, 2]}, 3, "x]"]
+    assert list(iter_json_values(io.StringIO("   \n"))) == []
+    assert list(iter_json_values(io.StringIO("[]"))) == []
+
+
+def test_broken_input_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_values(io.StringIO('[{"a": 1}, {"b": '), 4))
+
+
+def test_service_filter_on_arrays_and_json_lines(tmp_path, dependencies, write_json):
+    userdata = [record for record in dependencies if record["externalCall"]["service"] == "userdataapi"]
+    array = write_json("deps.json", dependencies)
+    lines = _write_lines(tmp_path / "deps.jsonl", dependencies)
+
+    for path in (array, lines):
+        assert list(iter_dependencies(path)) == dependencies
+        assert list(iter_dependencies(path, "userdataapi")) == userdata
+        assert list(iter_dependencies(path, ["billing", "nope"])) == [dependencies[3]]
+        assert list(iter_dependencies(path, "nope")) == []
+
+
+def test_json_lines_prefilter_does_not_trust_the_substring(tmp_path):
+    # The service name shows up in the line, but not as the externalCall.service
+    records = [
+        {"serviceName": "userdataapi", "externalCall": {"service": "billing", "path": "/x", "method": "GET"}},
+        {"serviceName": "ShopperAPI", "externalCall": {"service": "userdataapi", "path": "/x", "method": "GET"}}
+    ]
+    path = _write_lines(tmp_path / "deps.jsonl", records)
+    assert list(iter_dependencies(path, "userdataapi")) == records[1:]
+
+
+def test_json_lines_prefilter_finds_non_ascii_services(tmp_path):
+    records = [
+        {"serviceName": "Menu", "externalCall": {"service": "café", "path": "/x", "method": "GET"}},
+        {"serviceName": "Orders", "externalCall": {"service": "café", "path": "/y", "method": "GET"}}
+    ]
+    path = tmp_path / "deps.jsonl"
+    # One line written raw, one escaped; both spell the same service
+    path.write_text(json.dumps(records[0], ensure_ascii=False) + "\n" + json.dumps(records[1]) + "\n",
+                    encoding="utf-8")
+    assert list(iter_dependencies(str(path), "café")) == records
@@ -0,0 +1,38 @@
+import copy
+
+from impact_analysis import (
+    analyze_impact, analyze_oasdiff_changes, collect_change_events, detect_path_moves, normalize_path
+)
+from impact_records import CHANGE_PATH_REMOVED, CHANGE_PATH_VERSIONED
+from path_router import PathRouter
+from spec_diff import diff_specs
+
+
+def test_normalize_path_ignores_versions_and_parameter_names():
+    assert normalize_path("/v1/users/{id}") == normalize_path("/users/{userId}") == "/users/{param}"
+    assert normalize_path("/users/{id}/v2/orders") == "/users/{param}/orders"
+
+
+def test_detect_path_moves():
+    moves = detect_path_moves(["/users/{id}", "/health", "/orders"],
+                              ["/v2/users/{userId}", "/v1/users/{id}", "/status"])
+    assert moves == {"/users/{id}": ["/v1/users/{id}", "/v2/users/{userId}"]}
+    assert detect_path_moves(["/users"], []) == {}
+
+
+def _impacts(old_spec, new_spec, dependencies):
+    diff = diff_specs(old_spec, new_spec)
+    api_changes = analyze_oasdiff_changes(diff, collect_change_events(diff))
+    return analyze_impact(api_changes, dependencies, PathRouter.from_spec(old_spec))
+
+
+def test_moved_endpoint_is_reported_with_its_new_path(old_spec, dependencies):
+    new_spec = copy.deepcopy(old_spec)
+    new_spec["paths"]["/v1/users/{id}"] = new_spec["paths"].pop("/users/{id}")
+    del new_spec["paths"]["/health"]
+
+    details = {impacted["service"]: impacted["impact_details"][0]
+               for impacted in _impacts(old_spec, new_spec, dependencies)}
+    assert details["ShopperAPI"]["change_type"] == CHANGE_PATH_VERSIONED
+    assert details["ShopperAPI"]["after"] == "/v1/users/{id}"
+    assert details["Monitor"]["change_type"] == CHANGE_PATH_REMOVED
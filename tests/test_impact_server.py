@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import urllib.request
+
+import pytest
+
+from impact_analysis import run_analysis
+from impact_records import json_default
+from impact_server import AnalysisServer, make_server, parse_address, query_server, remote_analysis
+
+
+def _dump(value):
+    return json.dumps(value, sort_keys=True, default=json_default)
+
+
+@pytest.fixture
+def inputs(old_spec, new_spec, dependencies, write_json):
+    return write_json("old.json", old_spec), write_json("new.json", new_spec), write_json("deps.json", dependencies)
+
+
+@pytest.fixture
+def running_server(tmp_path):
+    def start(address):
+        server = make_server(address, max_contexts=2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(server)
+        kind, target = parse_address(address)
+        return address if kind == "unix" else f"127.0.0.1:{server.server_address[1]}"
+
+    started = []
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def test_parse_address():
+    assert parse_address("unix:/tmp/impact.sock") == ("unix", "/tmp/impact.sock")
+    assert parse_address("0.0.0.0:8765") == ("tcp", ("0.0.0.0", 8765))
+    assert parse_address(":9000") == ("tcp", ("127.0.0.1", 9000))
+
+
+def test_repeated_queries_reuse_the_warm_state(inputs):
+    server = AnalysisServer()
+    query = dict(zip(("old_spec", "new_spec", "dependencies"), inputs))
+
+    first = server.analyze(query)
+    second = server.analyze(query)
+    expected = run_analysis(*inputs)
+    assert _dump(first["impacted_services"]) == _dump(second["impacted_services"]) == \
+        _dump(expected["impacted_services"])
+    assert first["breaking"]
+    assert first["stats"]["units_diffed"] > 0
+    assert second["stats"]["units_diffed"] == 0 and second["stats"]["impacts_evaluated"] == 0
+    assert server.health()["queries"] == 2
+
+
+def test_least_recently_queried_contexts_are_dropped(inputs):
+    server = AnalysisServer(max_contexts=2)
+    query = dict(zip(("old_spec", "new_spec", "dependencies"), inputs))
+    for service in ("userdataapi", "billing", None):
+        server.analyze(dict(query, service=service))
+    assert [key[3] for key in server.contexts] == ["billing", None]
+
+
+def test_bad_queries(inputs):
+    server = AnalysisServer()
+    with pytest.raises(ValueError, match="missing 'dependencies'"):
+        server.analyze({"old_spec": inputs[0], "new_spec": inputs[1]})
+    with pytest.raises(ValueError, match="python differ"):
+        server.analyze(dict(zip(("old_spec", "new_spec", "dependencies"), inputs), differ="oasdiff"))
+
+
+def test_http_round_trip(running_server, inputs):
+    address = running_server("127.0.0.1:0")
+
+    answer = remote_analysis(address, *inputs, service="userdataapi")
+    expected = run_analysis(*inputs, service="userdataapi")
+    assert _dump(answer["impacted_services"]) == _dump(expected["impacted_services"])
+    assert answer["events"] == expected["events"]
+
+    with urllib.request.urlopen(f"http://{address}/health") as response:
+        assert json.load(response)["queries"] == 1
+    with pytest.raises(RuntimeError, match=r"\(400\).*missing 'old_spec'"):
+        query_server(address, {})
+    with pytest.raises(RuntimeError, match=r"\(400\).*No such file"):
+        query_server(address, {"old_spec": "/nonexistent.yaml", "new_spec": inputs[1], "dependencies": inputs[2]})
+
+
+def test_unix_socket(running_server, inputs, tmp_path):
+    socket_path = str(tmp_path / "impact.sock")
+    address = running_server(f"unix:{socket_path}")
+    assert os.path.exists(socket_path)
+    answer = remote_analysis(address, *inputs)
+    assert answer["breaking"]
+
+
+def test_cli_queries_the_server(running_server, inputs, tmp_path, monkeypatch, capsys):
+    from impact_analysis import main
+
+    address = running_server("127.0.0.1:0")
+    monkeypatch.chdir(tmp_path)
+    main(["impact", *inputs])
+    local = capsys.readouterr().out
+    assert "ShopperAPI" in local
+    main(["impact", *inputs, "--server", address])
+    assert capsys.readouterr().out == local
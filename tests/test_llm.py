@@ -0,0 +1,72 @@
+import copy
+
+from analysis_cache import AnalysisCache, llm_client_id, llm_request_key
+from impact_analysis import complete_chat, main
+from llm_stub import StubOpenAIClient
+
+REQUEST = {"model": "gpt-4", "messages": [{"role": "user", "content": "What breaks?"}]}
+
+
+def answer(request):
+    # Compact prompts send the content as a list of parts
+    return "Impact: " + str(request["messages"][-1]["content"])[:40]
+
+
+def test_complete_chat_caches_answers(tmp_path):
+    client = StubOpenAIClient(answer)
+    cache = AnalysisCache(str(tmp_path / "cache"))
+
+    assert complete_chat(REQUEST, client, cache) == "Impact: What breaks?"
+    assert complete_chat(REQUEST, client, cache) == "Impact: What breaks?"
+    assert len(client.chat.completions.calls) == 1
+
+
+def test_failed_completions_are_not_cached(tmp_path):
+    def fail(request):
+        raise RuntimeError("boom")
+
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    assert complete_chat(REQUEST, StubOpenAIClient(fail), cache) is None
+    assert complete_chat(REQUEST, StubOpenAIClient(answer), cache) == "Impact: What breaks?"
+
+
+def test_cache_keys_depend_on_the_client(monkeypatch):
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    assert llm_client_id() == "openai:https://api.openai.com/v1"
+    assert llm_client_id(StubOpenAIClient()) == "llm_stub.StubOpenAIClient"
+    assert llm_request_key(REQUEST, StubOpenAIClient()) != llm_request_key(REQUEST)
+    # Key order doesn't split the cache
+    assert llm_request_key(dict(reversed(list(REQUEST.items())))) == llm_request_key(REQUEST)
+
+    monkeypatch.setenv("OPENAI_BASE_URL", "https://api.openai.com/v1/")
+    assert llm_client_id() == "openai:https://api.openai.com/v1"
+
+
+def test_sdk_client_against_the_fake_server(tmp_path, fake_openai):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    assert llm_client_id(fake_openai) == f"openai:{str(fake_openai.base_url).rstrip('/')}"
+    assert complete_chat(REQUEST, fake_openai, cache) == "Impact: What breaks?"
+    # What the fake server answered is never served for the stub, or the other way round
+    assert llm_request_key(REQUEST, fake_openai) != llm_request_key(REQUEST, StubOpenAIClient())
+
+
+def test_cli_writes_the_stub_report(tmp_path, monkeypatch, old_spec, new_spec, dependencies, write_json):
+    monkeypatch.chdir(tmp_path)
+    report = tmp_path / "llm_analysis.txt"
+    main([write_json("old.json", old_spec), write_json("new.json", new_spec), write_json("deps.json", dependencies),
+          "--llm-client", "stub", "--report", str(report)])
+    assert report.read_text().startswith("Stub analysis for ")
+
+
+def test_cli_skips_the_llm_for_non_breaking_changes(tmp_path, monkeypatch, old_spec, dependencies, write_json):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    new_spec = copy.deepcopy(old_spec)
+    new_spec["components"]["schemas"]["User"]["properties"]["nickname"] = {"type": "string"}
+    report = tmp_path / "llm_analysis.txt"
+
+    main([write_json("old.json", old_spec), write_json("new.json", new_spec), write_json("deps.json", dependencies),
+          "--report", str(report)])
+    text = report.read_text()
+    assert "No breaking changes affect dependent services, so LLM analysis was skipped." in text
+    assert "Non-breaking impacts:" in text
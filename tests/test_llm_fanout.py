@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from impact_analysis import ChangeEvent, main
+from llm_fanout import TokenBucket, group_by_service, is_retryable, run_fanout
+from llm_stub import AsyncStubOpenAIClient, StubAPIError, serve_fake_openai
+from prompt_builder import build_compact_mcp_requests, request_tokens
+
+
+def answer(request):
+    return "Impact: " + str(request["messages"][-1]["content"])[:40]
+
+
+def test_group_by_service_keeps_first_appearance_order(analysis):
+    grouped = group_by_service(analysis["impacted_services"])
+    assert list(grouped) == ["ShopperAPI", "SignupService", "Monitor"]
+    # ShopperAPI calls /users/123 on both userdataapi and billing
+    assert [len(impacts) for impacts in grouped.values()] == [2, 1, 1]
+
+
+def test_token_bucket_limits_the_rate():
+    async def take(bucket, count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    asyncio.run(take(bucket, 6))
+    # One token up front, then five refills at 50 per second
+    assert time.monotonic() - start >= 0.09
+
+
+def test_fanout_retries_and_merges_per_service(analysis):
+    client = AsyncStubOpenAIClient(answer, failures=1)
+    report = run_fanout(analysis["events"], analysis["impacted_services"], client, requests_per_minute=None,
+                        base_delay=0)
+
+    services = group_by_service(analysis["impacted_services"])
+    for service in services:
+        assert f"### **{service}**" in report
+    assert "unavailable" not in report
+    # One failed attempt, then one request per service
+    assert len(client.chat.completions.calls) == len(services) + 1
+
+
+def test_each_service_prompt_carries_only_its_own_events(analysis):
+    # Changes to paths nobody calls stay out of every per-service request
+    events = analysis["events"] + [ChangeEvent("path_deleted", f"/unused{i}", None, None, None, None, None)
+                                   for i in range(200)]
+    client = AsyncStubOpenAIClient(answer)
+    run_fanout(events, analysis["impacted_services"], client, requests_per_minute=None)
+
+    prompts = {json.dumps(call["messages"]) for call in client.chat.completions.calls}
+    assert len(prompts) == 3
+    assert not any("/unused" in prompt for prompt in prompts)
+    (single,) = build_compact_mcp_requests(events, analysis["impacted_services"], token_budget=100000)
+    for call in client.chat.completions.calls:
+        assert request_tokens(call) < request_tokens(single) / 2
+
+
+def test_fanout_reports_services_whose_retries_ran_out(analysis):
+    client = AsyncStubOpenAIClient(answer, failures=100)
+    report = run_fanout(analysis["events"], analysis["impacted_services"], client, requests_per_minute=None,
+                        max_retries=1, base_delay=0)
+
+    services = group_by_service(analysis["impacted_services"])
+    # Each service still lists its affected calls
+    assert report.count("_LLM analysis unavailable (") == len(services)
+    assert "Affected calls: `GET /health`" in report
+    assert len(client.chat.completions.calls) == 2 * len(services)
+
+
+def test_client_errors_are_not_retried(analysis):
+    client = AsyncStubOpenAIClient(answer, failures=100, failure_status=401)
+    report = run_fanout(analysis["events"], analysis["impacted_services"], client, requests_per_minute=None,
+                        base_delay=0)
+
+    services = group_by_service(analysis["impacted_services"])
+    assert report.count("(StubAPIError: stub failure (HTTP 401))") == len(services)
+    assert len(client.chat.completions.calls) == len(services)
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(StubAPIError(429))
+    assert is_retryable(StubAPIError(502))
+    assert not is_retryable(StubAPIError(400))
+    assert not is_retryable(StubAPIError(401))
+    assert not is_retryable(TypeError("bad request argument"))
+
+
+def test_sdk_errors_are_classified():
+    openai = pytest.importorskip("openai")
+    server = serve_fake_openai(delay=1.0)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    request = {"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}]}
+    try:
+        slow = openai.OpenAI(base_url=base_url + "/v1", api_key="test", max_retries=0, timeout=0.05)
+        with pytest.raises(openai.APITimeoutError) as timed_out:
+            slow.chat.completions.create(**request)
+    finally:
+        server.shutdown()
+        server.server_close()
+    # Nothing listens there any more
+    refused = openai.OpenAI(base_url=base_url + "/v1", api_key="test", max_retries=0)
+    with pytest.raises(openai.APIConnectionError) as not_connected:
+        refused.chat.completions.create(**request)
+
+    assert is_retryable(timed_out.value)
+    assert not is_retryable(not_connected.value)
+
+
+def test_concurrency_limit(analysis):
+    client = AsyncStubOpenAIClient(answer, delay=0.05)
+    start = time.monotonic()
+    run_fanout(analysis["events"], analysis["impacted_services"], client, requests_per_minute=None, concurrency=1)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_cli_fanout_without_api_key_writes_the_findings(tmp_path, monkeypatch, old_spec, new_spec, dependencies,
+                                                        write_json):
+    pytest.importorskip("openai")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    report = tmp_path / "llm_analysis.txt"
+    main([write_json("old.json", old_spec), write_json("new.json", new_spec), write_json("deps.json", dependencies),
+          "--llm-mode", "fanout", "--report", str(report)])
+    text = report.read_text()
+    assert text.startswith("LLM analysis is unavailable for this run")
+    assert "Monitor" in text
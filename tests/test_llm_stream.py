@@ -0,0 +1,75 @@
+import io
+
+from analysis_cache import AnalysisCache
+from impact_analysis import main
+from llm_stream import stream_requests
+from llm_stub import StubOpenAIClient
+
+REQUEST = {"model": "gpt-4", "messages": [{"role": "user", "content": "What breaks?"}]}
+
+
+def answer(request):
+    return "Impact: " + str(request["messages"][-1]["content"])[:40]
+
+
+class FailingClient:
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+
+    def create(self, **request):
+        raise ConnectionError("connection refused")
+
+
+def test_stream_from_the_fake_server(tmp_path, fake_openai):
+    report = tmp_path / "report.txt"
+    out = io.StringIO()
+    text, metrics = stream_requests([REQUEST], str(report), fake_openai, out=out)
+
+    assert text == "Impact: What breaks?"
+    assert report.read_text() == text + "\n"
+    assert out.getvalue() == text + "\n"
+    assert metrics["completed"]
+    assert metrics["time_to_first_token"] is not None
+    # Counted by the server's usage block (prompt words, streamed pieces), not estimated
+    assert (metrics["prompt_tokens"], metrics["completion_tokens"]) == (2, 3)
+
+
+def test_stream_from_the_stub_is_cached(tmp_path):
+    client = StubOpenAIClient(answer)
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    requests = [REQUEST, dict(REQUEST, messages=[{"role": "user", "content": "And now?"}])]
+
+    text, metrics = stream_requests(requests, str(tmp_path / "first.txt"), client, cache=cache, out=io.StringIO())
+    assert text == "### Part 1 of 2\n\nImpact: What breaks?\n\n### Part 2 of 2\n\nImpact: And now?"
+    assert metrics["completed"]
+    # The stub's usage block counts one token per streamed piece
+    assert metrics["completion_tokens"] == 6
+
+    again, metrics = stream_requests(requests, str(tmp_path / "second.txt"), client, cache=cache, out=io.StringIO())
+    assert again == text
+    assert all(part["cached"] for part in metrics["parts"])
+    assert len(client.chat.completions.calls) == 2
+    # stream_options is for the OpenAI SDK only
+    assert "stream_options" not in client.chat.completions.calls[0]
+
+
+def test_failed_stream_falls_back_to_the_findings(tmp_path):
+    report = tmp_path / "report.txt"
+    text, metrics = stream_requests([REQUEST], str(report), FailingClient(), out=io.StringIO(),
+                                    fallback="- Monitor: GET /health was removed")
+
+    assert not metrics["completed"]
+    assert "ConnectionError" in metrics["parts"][0]["error"]
+    assert text.endswith("the rule-based findings follow.\n\n- Monitor: GET /health was removed")
+    assert "- Monitor: GET /health was removed" in report.read_text()
+
+
+def test_cli_streams_into_the_report(tmp_path, monkeypatch, old_spec, new_spec, dependencies, write_json):
+    monkeypatch.chdir(tmp_path)
+    report = tmp_path / "llm_analysis.txt"
+    metrics = tmp_path / "metrics.json"
+    main([write_json("old.json", old_spec), write_json("new.json", new_spec), write_json("deps.json", dependencies),
+          "--llm-client", "stub", "--stream", "--report", str(report), "--llm-metrics", str(metrics)])
+    assert report.read_text().startswith("Stub analysis for ")
+    assert '"completed": true' in metrics.read_text()
@@ -0,0 +1,43 @@
+from merkle_diff import TreeChange, diff_trees, format_location, subtree_hashes, tree_changes
+
+
+def test_equal_documents_have_no_changes(old_spec):
+    reordered = dict(reversed(list(old_spec.items())))
+    assert tree_changes(old_spec, reordered) == []
+    assert subtree_hashes(old_spec)[id(old_spec)] == subtree_hashes(reordered)[id(reordered)]
+
+
+def test_hashes_keep_scalar_types_apart():
+    documents = [[1], [1.0], [True], ["1"]]
+    assert len({subtree_hashes(document)[id(document)] for document in documents}) == 4
+
+
+def test_dict_changes():
+    old = {"a": 1, "b": {"c": [1, 2]}, "d": "x", "e": 1}
+    new = {"a": 2, "b": {"c": [1, 2]}, "f": None, "e": "1"}
+    assert sorted(tree_changes(old, new)) == [
+        TreeChange("dictionary_item_added", ("f",), None, None),
+        TreeChange("dictionary_item_removed", ("d",), "x", None),
+        TreeChange("type_changes", ("e",), 1, "1"),
+        TreeChange("values_changed", ("a",), 1, 2),
+    ]
+
+
+def test_list_items_are_aligned_by_content():
+    old = {"tags": [{"name": "a"}, {"name": "b"}, {"name": "c"}]}
+    new = {"tags": [{"name": "z"}, {"name": "a"}, {"name": "b"}, {"name": "c", "x": 1}]}
+    assert tree_changes(old, new) == [
+        TreeChange("iterable_item_added", ("tags", 0), None, {"name": "z"}),
+        TreeChange("dictionary_item_added", ("tags", 2, "x"), None, 1),
+    ]
+
+
+def test_deepdiff_shaped_report():
+    old = {"paths": {"/users": {"get": {"summary": "old"}}, "/gone": {}}}
+    new = {"paths": {"/users": {"get": {"summary": "new"}}, "/it's": {}}}
+    assert diff_trees(old, new) == {
+        "dictionary_item_removed": {"root['paths']['/gone']": {}},
+        "values_changed": {"root['paths']['/users']['get']['summary']": {"new_value": "new", "old_value": "old"}},
+        "dictionary_item_added": {"root['paths'][\"/it's\"]": {}},
+    }
+    assert format_location(("tags", 0)) == "root['tags'][0]"
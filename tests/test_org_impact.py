@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+from impact_analysis import main, run_analysis
+from impact_records import json_default
+from org_impact import analyze_organization, index_path, load_manifest
+
+
+@pytest.fixture
+def organization(tmp_path, old_spec, new_spec, dependencies, write_json):
+    """userdataapi drops /health and User.email; billing's spec is unchanged"""
+    write_json("userdata-base.json", old_spec)
+    write_json("userdata-new.json", new_spec)
+    write_json("billing.json", old_spec)
+    write_json("shopper-deps.json", dependencies[:1] + dependencies[3:])
+    write_json("platform-deps.json", dependencies[1:3])
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(
+        "providers:\n"
+        "  - service: userdataapi\n"
+        "    old_spec: userdata-base.json\n"
+        "    new_spec: userdata-new.json\n"
+        "  - service: billing\n"
+        "    old_spec: billing.json\n"
+        "    new_spec: billing.json\n"
+        "consumers:\n"
+        "  - shopper-deps.json\n"
+        "  - platform-deps.json\n"
+        "  - ./shopper-deps.json\n")
+    return str(manifest)
+
+
+def test_load_manifest_resolves_paths(organization, tmp_path):
+    providers, consumers = load_manifest(organization)
+    assert providers[0] == {"service": "userdataapi", "old_spec": str(tmp_path / "userdata-base.json"),
+                            "new_spec": str(tmp_path / "userdata-new.json")}
+    # Listed twice, indexed once
+    assert consumers == [str(tmp_path / "shopper-deps.json"), str(tmp_path / "platform-deps.json")]
+
+
+def test_load_manifest_errors(tmp_path):
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text("providers:\n  - service: a\n    old_spec: a.yaml\nconsumers: [deps.json]\n")
+    with pytest.raises(ValueError, match="provider 0 is missing new_spec"):
+        load_manifest(str(manifest))
+    manifest.write_text("providers: []\nconsumers: [deps.json]\n")
+    with pytest.raises(ValueError, match="at least one provider"):
+        load_manifest(str(manifest))
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_organization_report_matches_per_pair_analysis(organization, tmp_path, jobs):
+    providers, consumers = load_manifest(organization)
+    index_dir = str(tmp_path / "indexes")
+    report = analyze_organization(providers, consumers, index_dir, jobs=jobs)
+
+    assert report["summary"] == {"providers": 2, "providers_changed": 1, "providers_breaking": 1,
+                                 "dependency_files": 2, "impacted_services": 3, "impacted_calls": 3,
+                                 "breaking": True}
+    assert [entry["impacted_services"] for entry in report["providers"]] == \
+        [["Monitor", "ShopperAPI", "SignupService"], []]
+    assert report["consumers"]["ShopperAPI"] == {"providers": ["userdataapi"], "calls": 1, "breaking_calls": 1}
+
+    expected = []
+    for consumer in consumers:
+        result = run_analysis(providers[0]["old_spec"], providers[0]["new_spec"], consumer, service="userdataapi")
+        expected += [{"provider": "userdataapi", "dependencies": consumer, **impacted}
+                     for impacted in result["impacted_services"]]
+    assert json.dumps(report["impacts"], sort_keys=True, default=json_default) == \
+        json.dumps(expected, sort_keys=True, default=json_default)
+    for consumer in consumers:
+        assert os.path.exists(index_path(index_dir, consumer))
+
+
+def test_duplicate_providers_are_rejected(organization, tmp_path):
+    providers, consumers = load_manifest(organization)
+    with pytest.raises(ValueError, match="only be listed once"):
+        analyze_organization(providers + providers[:1], consumers, str(tmp_path / "indexes"), jobs=1)
+
+
+def test_org_impact_command(organization, tmp_path, capsys):
+    output = tmp_path / "report.json"
+    main(["org-impact", organization, "--index-dir", str(tmp_path / "indexes"), "--jobs", "1", "-o", str(output)])
+    assert "1 of 2 providers changed, 1 breaking; 3 services impacted (3 calls)" in capsys.readouterr().out
+    assert json.loads(output.read_text())["summary"]["breaking"]
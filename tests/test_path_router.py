@@ -0,0 +1,64 @@
+from path_router import PathRouter, split_path
+
+SPEC = {
+    "paths": {
+        "/users": {"get": {}, "post": {}},
+        "/users/{id}": {"get": {}, "delete": {}},
+        "/users/me": {"get": {}},
+        "/users/{id}/orders/{orderId}": {"get": {}},
+        "/users/me/orders/latest": {"get": {}}
+    }
+}
+
+
+def test_split_path():
+    assert split_path("/users/123/?expand=true") == ["users", "123"]
+    assert split_path("/") == []
+
+
+def test_concrete_and_renamed_parameters_resolve_to_the_template():
+    router = PathRouter.from_spec(SPEC)
+    assert router.resolve("/users/123") == "/users/{id}"
+    assert router.resolve("/users/{userId}") == "/users/{id}"
+    assert router.resolve("/users/123/orders/9?x=1") == "/users/{id}/orders/{orderId}"
+    assert router.resolve("/users/") == "/users"
+    assert router.resolve("/orders") is None
+    assert router.resolve(None) is None
+
+
+def test_literal_segments_win_and_fall_back_to_the_wildcard():
+    router = PathRouter.from_spec(SPEC)
+    assert router.resolve("/users/me") == "/users/me"
+    assert router.resolve("/users/me/orders/latest") == "/users/me/orders/latest"
+    # /users/me/orders/7 dead-ends on the literal branch and matches through {id}
+    assert router.resolve("/users/me/orders/7") == "/users/{id}/orders/{orderId}"
+
+
+def test_method_must_be_declared():
+    router = PathRouter.from_spec(SPEC)
+    assert router.resolve("/users/1", "delete") == "/users/{id}"
+    assert router.resolve("/users/1", "PUT") is None
+    # Templates added without a path item accept any method
+    router.add("/health")
+    assert router.resolve("/health", "HEAD") == "/health"
+
+
+def test_resolve_dependencies():
+    router = PathRouter.from_spec(SPEC)
+    dependencies = [
+        {"externalCall": {"method": "GET", "path": "/users/42"}},
+        {"externalCall": {"method": "POST", "path": "/users/42"}},
+        {}
+    ]
+    assert router.resolve_dependencies(dependencies) == ["/users/{id}", None, None]
+
+
+def test_resolve_cache_is_bounded():
+    router = PathRouter(SPEC["paths"], cache_size=3)
+    for user in range(100):
+        assert router.resolve(f"/users/{user}") == "/users/{id}"
+    assert len(router._cache) == 3
+    # Adding a template drops what the cache remembered
+    router.add("/users/{id}/avatar")
+    assert len(router._cache) == 0
+    assert router.resolve("/users/7/avatar") == "/users/{id}/avatar"
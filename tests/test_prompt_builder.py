@@ -0,0 +1,79 @@
+import json
+
+from impact_analysis import ChangeEvent
+from prompt_builder import (
+    build_compact_mcp_requests, build_prompt_chunks, estimate_tokens, prompt_overhead_tokens, request_tokens
+)
+
+
+def _events(count):
+    return [ChangeEvent("properties_removed", f"/things{i}", "GET", "response", "200", None, [f"field{i}"])
+            for i in range(count)]
+
+
+def _payload_text(request):
+    return request["messages"][1]["content"][2]["text"]
+
+
+def _decoded_paths(payload):
+    return {payload["strings"][row[1]] for row in payload["changes"] if len(row) > 1 and row[1] is not None}
+
+
+def test_token_estimates():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) > 0
+    request = {"messages": [{"role": "system", "content": "x" * 40},
+                            {"role": "user", "content": [{"type": "text", "text": "y" * 40}, "z" * 40]}]}
+    assert request_tokens(request) == estimate_tokens("x" * 40) + estimate_tokens("y" * 40) + estimate_tokens("z" * 40)
+
+
+def test_services_travel_with_their_events(analysis):
+    events = analysis["events"] + _events(3)
+    (payload,) = build_prompt_chunks(events, analysis["impacted_services"])
+
+    assert [impact["service"] for impact in payload["impacts"]] == \
+        [impacted["service"] for impacted in analysis["impacted_services"]]
+    assert len(payload["changes"]) == len(events)
+    # Strings are shared through the table instead of repeated
+    assert len(payload["strings"]) == len(set(payload["strings"]))
+    shopper = payload["impacts"][0]
+    assert payload["strings"][shopper["call"][1]] == "/users/123"
+    assert {"/users/{id}", "/health", "/things0", "/things2"} <= _decoded_paths(payload)
+
+
+def test_small_budgets_split_into_chunks_that_cover_everything(analysis):
+    events = analysis["events"] + _events(60)
+    chunks = build_prompt_chunks(events, analysis["impacted_services"], token_budget=120)
+
+    assert len(chunks) > 1
+    assert sum(len(chunk["impacts"]) for chunk in chunks) == len(analysis["impacted_services"])
+    covered = set().union(*(_decoded_paths(chunk) for chunk in chunks))
+    assert covered == {event.path for event in events if event.path is not None}
+    for chunk in chunks:
+        text = json.dumps(chunk, separators=(",", ":"))
+        # Budgets are estimates; allow for the JSON punctuation around rows
+        assert estimate_tokens(text) <= 120 * 1.5
+
+
+def test_requests_stay_within_the_budget(analysis):
+    events = analysis["events"] + _events(200)
+    budget = prompt_overhead_tokens() + 400
+    requests = build_compact_mcp_requests(events, analysis["impacted_services"], budget)
+
+    assert len(requests) > 1
+    assert "This is part 1 of" in requests[0]["messages"][1]["content"][0]["text"]
+    for request in requests:
+        assert request_tokens(request) <= budget * 1.2
+    assert all(_payload_text(request).startswith("Changes and impacted services: {") for request in requests)
+
+    (single,) = build_compact_mcp_requests(analysis["events"], analysis["impacted_services"])
+    assert "part" not in single["messages"][1]["content"][0]["text"]
+
+
+def test_unclaimed_events_can_be_left_out(analysis):
+    events = analysis["events"] + _events(20)
+    monitor = [impacted for impacted in analysis["impacted_services"] if impacted["service"] == "Monitor"]
+    (payload,) = build_prompt_chunks(events, monitor, include_unclaimed=False)
+
+    assert [impact["service"] for impact in payload["impacts"]] == ["Monitor"]
+    assert _decoded_paths(payload) == {"/health"}
@@ -0,0 +1,60 @@
+from ref_index import build_ref_index, direct_schema_refs, operations_by_schema, schema_closures
+
+SPEC = {
+    "paths": {
+        "/users/{id}": {
+            "parameters": [{"$ref": "#/components/parameters/Filter"}],
+            "get": {"responses": {"200": {"$ref": "#/components/responses/UserResponse"}}},
+            "delete": {"responses": {"204": {"description": "gone"}}}
+        },
+        "/orders": {
+            "post": {"requestBody": {"content": {"application/json": {"schema": {
+                "type": "array", "items": {"$ref": "#/components/schemas/Order"}}}}}}
+        }
+    },
+    "components": {
+        "parameters": {"Filter": {"name": "f", "in": "query", "schema": {"$ref": "#/components/schemas/Filter"}}},
+        "responses": {"UserResponse": {"description": "ok", "content": {
+            "application/json": {"schema": {"$ref": "#/components/schemas/User"}}}}},
+        "schemas": {
+            "User": {"properties": {"address": {"$ref": "#/components/schemas/Address"},
+                                    "manager": {"$ref": "#/components/schemas/User"}}},
+            "Address": {"properties": {"zip": {"type": "string"}}},
+            # Order and Item refer to each other
+            "Order": {"properties": {"items": {"items": {"$ref": "#/components/schemas/Item"}}}},
+            "Item": {"properties": {"order": {"$ref": "#/components/schemas/Order"}}},
+            "Filter": {"type": "string"},
+            "a/b": {"type": "string"}
+        }
+    }
+}
+
+
+def test_direct_refs_follow_other_components():
+    get = SPEC["paths"]["/users/{id}"]["get"]
+    assert direct_schema_refs(SPEC, get) == {"User"}
+    assert direct_schema_refs(SPEC, {"$ref": "#/components/schemas/a~1b"}) == {"a/b"}
+
+
+def test_closures_include_cycles_and_descendants():
+    closures = schema_closures(SPEC)
+    assert closures["User"] == {"User", "Address"}
+    assert closures["Address"] == {"Address"}
+    assert closures["Order"] == closures["Item"] == {"Order", "Item"}
+
+
+def test_ref_index_and_its_inverse():
+    ref_index = build_ref_index(SPEC)
+    # Path-level parameters count for every operation of the path
+    assert ref_index[("GET", "/users/{id}")] == {"User", "Address", "Filter"}
+    assert ref_index[("DELETE", "/users/{id}")] == {"Filter"}
+    assert ref_index[("POST", "/orders")] == {"Order", "Item"}
+
+    operations = operations_by_schema(ref_index)
+    assert operations["Address"] == [("GET", "/users/{id}")]
+    assert operations["Filter"] == [("DELETE", "/users/{id}"), ("GET", "/users/{id}")]
+
+
+def test_empty_spec():
+    assert build_ref_index(None) == {}
+    assert schema_closures({}) == {}
@@ -0,0 +1,58 @@
+import copy
+
+from impact_analysis import collect_change_events
+from spec_diff import diff_schema, diff_specs
+
+
+def test_identical_specs_have_no_diff(old_spec):
+    assert diff_specs(old_spec, copy.deepcopy(old_spec)) == {}
+
+
+def test_added_and_deleted_paths(old_spec):
+    new_spec = copy.deepcopy(old_spec)
+    del new_spec["paths"]["/health"]
+    new_spec["paths"]["/orders"] = {"get": {"responses": {"200": {"description": "ok"}}}}
+
+    diff = diff_specs(old_spec, new_spec)
+    assert diff["paths"]["added"] == ["/orders"]
+    assert diff["paths"]["deleted"] == ["/health"]
+    assert "modified" not in diff["paths"]
+
+
+def test_removed_property_is_reported_through_refs(old_spec, new_spec):
+    diff = diff_specs(old_spec, new_spec)
+
+    schema = diff["components"]["schemas"]["modified"]["User"]
+    assert schema["properties"]["removed"] == ["email"]
+    # The self-reference is followed once, not forever
+    assert schema["properties"]["modified"]["friend"]["properties"]["removed"] == ["email"]
+
+    kinds = {(event.kind, event.path, event.method) for event in collect_change_events(diff)}
+    assert ("properties_removed", "/users/{id}", "GET") in kinds
+    assert ("path_deleted", "/health", None) in kinds
+    assert ("schema_properties_removed", None, None) in kinds
+
+
+def test_operation_and_parameter_changes(old_spec):
+    new_spec = copy.deepcopy(old_spec)
+    new_spec["paths"]["/users/{id}"]["delete"] = {"responses": {"204": {"description": "gone"}}}
+    new_spec["paths"]["/users/{id}"]["get"]["parameters"].append(
+        {"name": "fields", "in": "query", "required": True, "schema": {"type": "string"}})
+
+    diff = diff_specs(old_spec, new_spec)
+    operations = diff["paths"]["modified"]["/users/{id}"]["operations"]
+    assert operations["added"] == ["DELETE"]
+    assert operations["modified"]["GET"] == {"parameters": {"added": {"query": ["fields"]}}}
+
+    events = collect_change_events(diff)
+    assert [(event.kind, event.method) for event in events] == [("path_modified", None), ("operation_modified", "GET")]
+
+
+def test_memo_does_not_change_the_result(old_spec, new_spec):
+    old_ref = {"$ref": "#/components/schemas/User"}
+    new_ref = {"$ref": "#/components/schemas/User"}
+    memo = {}
+    first = diff_schema(old_spec, new_spec, old_ref, new_ref, memo=memo)
+    assert memo
+    assert diff_schema(old_spec, new_spec, old_ref, new_ref, memo=memo) == first
+    assert diff_schema(old_spec, new_spec, old_ref, new_ref) == first
@@ -0,0 +1,127 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The tracer spans and counters go to; None (the default) makes span() and count() no-ops
+_active = None
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Tracer:
+    """Collects nested timing spans and named counters for one run.
+
+    Every span records its wall time and the process's peak RSS when it
+    ended. With memory=True, tracemalloc also runs and each span records the
+    peak of Python allocations while it was open, at the cost of a much
+    slower run.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.started = time.perf_counter()
+        self.root = {"name": "run", "children": []}
+        self.stack = [self.root]
+        self.counters = {}
+        if memory:
+            tracemalloc.start()
+        # Peak traced memory seen so far by each open span, children included
+        self._peaks = [0]
+
+    @contextmanager
+    def span(self, name, attributes=None):
+        entry = {"name": name, "start_ms": round((time.perf_counter() - self.started) * 1000, 3)}
+        if attributes:
+            entry["attributes"] = attributes
+        # Filled in on exit; set now so they come before any children in the output
+        entry["duration_ms"] = entry["max_rss_mb"] = None
+        self.stack[-1].setdefault("children", []).append(entry)
+        self.stack.append(entry)
+        if self.memory:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            entry["max_rss_mb"] = _max_rss_mb()
+            if self.memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                entry["peak_mb"] = round(peak / 1e6, 3)
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self.stack.pop()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def close(self):
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def to_dict(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "max_rss_mb": _max_rss_mb(),
+            "spans": self.root.get("children", []),
+            "counters": self.counters
+        }
+
+
+def start_tracing(memory=False):
+    global _active
+    _active = Tracer(memory)
+    return _active
+
+
+def stop_tracing():
+    global _active
+    tracer, _active = _active, None
+    if tracer is not None:
+        tracer.close()
+    return tracer
+
+
+def span(name, **attributes):
+    """Time the enclosed block as a span of the active tracer, if there is one"""
+    if _active is None:
+        return nullcontext()
+    return _active.span(name, attributes)
+
+
+def count(name, value=1):
+    if _active is not None:
+        _active.count(name, value)
+
+
+def write_trace(tracer, path):
+    # "-" sends the trace to stderr, keeping stdout for the command's own output
+    data = json.dumps(tracer.to_dict(), indent=2)
+    if path == "-":
+        print(data, file=sys.stderr)
+        return
+    with open(path, "w") as f:
+        f.write(data + "\n")
+
+
+def write_profile(profiler, path, limit=30):
+    """Save cProfile stats to path (pstats format) and print the hottest functions to stderr"""
+    import pstats
+
+    profiler.dump_stats(path)
+    stats = pstats.Stats(profiler, stream=sys.stderr)
+    stats.sort_stats("cumulative").print_stats(limit)